@@ -0,0 +1,226 @@
+﻿#!/usr/bin/env python3
+"""
+Async Python API for the setup steps.
+
+Every step is a coroutine that runs the prompt-free job of service/jobs.py in
+a worker thread and returns a typed result, so many steps (and devices) can
+run concurrently in one event loop:
+
+    events = EventStream()
+    results = await asyncio.gather(
+        provision("cli", "/dev/ttyACM0", dataset=tlvs, events=events),
+        provision("cli", "/dev/ttyACM1", dataset=tlvs, events=events))
+
+Progress is published to an optional EventStream instead of being printed:
+the job's step events, the status lines of the modules it calls, and the
+output of idf.py, ninja and esptool.
+Cancelling a step's task stops it at its next progress event; a build or
+flash that is already running finishes first.
+"""
+import time
+import asyncio
+import threading
+from typing import List, NamedTuple, Optional
+from esp_thread_setup.service.jobs import JobError, resolve_params
+from esp_thread_setup.service import jobs
+from esp_thread_setup.utils.events import route_events, step_context
+from esp_thread_setup.utils.metrics import record_step
+from esp_thread_setup.setup.timings import record_timing
+
+class StepCancelled(JobError):
+    """Raised inside a step's worker thread once its task has been cancelled"""
+
+class Event(NamedTuple):
+    """A progress event of a running step: kind is 'step' or a status level such as 'note' or 'error'"""
+    time: float
+    kind: str
+    message: str
+    step: Optional[str] = None
+    port: Optional[str] = None
+
+class FetchResult(NamedTuple):
+    fetched: List[str]
+
+class BuildResult(NamedTuple):
+    project: str
+    build_dir: str
+
+class ProvisionResult(NamedTuple):
+    project: str
+    port: str
+    build_dir: Optional[str]
+    nvs_image: Optional[str]
+
+class DatasetResult(NamedTuple):
+    port: str
+    network_name: str
+    dataset: str
+
+class JoinResult(NamedTuple):
+    port: str
+
+class BenchmarkResult(NamedTuple):
+    port: str
+    border_router_port: str
+    border_router_address: str
+    runs: list
+    neighbors: list
+
+class EventStream:
+    """Async iterator over the events of the steps it is passed to
+
+    Steps publish from worker threads; iterate with `async for` in the event
+    loop that runs them. close() ends the iteration once queued events are read.
+    """
+
+    _closed = object()
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+
+    def publish(self, loop, event):
+        """Queue an event from any thread"""
+        loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def close(self):
+        """End the iteration after the events queued so far"""
+        self._queue.put_nowait(self._closed)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._queue.get()
+        if event is self._closed:
+            raise StopAsyncIteration
+        return event
+
+class StreamSink:
+    """Event sink publishing the status events of one step to its EventStream"""
+
+    def __init__(self, loop, events, port):
+        self.loop = loop
+        self.events = events
+        self.port = port
+
+    def write(self, event):
+        self.events.publish(self.loop, Event(event["time"], event["level"], event["message"], event["step"], self.port))
+
+    def close(self):
+        pass
+
+_sessions = None
+_sessions_lock = threading.Lock()
+_idf_activated = False
+_idf_lock = threading.Lock()
+
+def console_sessions():
+    """Serial consoles shared by every step of this process"""
+    global _sessions
+    with _sessions_lock:
+        if _sessions is None:
+            from esp_thread_setup.utils.console import ConsoleSessions
+            _sessions = ConsoleSessions()
+        return _sessions
+
+def ensure_idf_environment():
+    """Load the ESP-IDF environment into this process once, like the CLI and the daemon do at startup"""
+    global _idf_activated
+    with _idf_lock:
+        if not _idf_activated:
+            from esp_thread_setup.setup.environment import activate_idf_environment
+            activate_idf_environment()
+            _idf_activated = True
+
+async def run_step(kind, params, events=None):
+    """Run a job kind of service/jobs.py in a worker thread; return its result dict"""
+    loop = asyncio.get_event_loop()
+    cancelled = threading.Event()
+    port = params.get("port")
+    # Port-less steps are told apart by project, so concurrent builds keep their own events
+    device = port or params.get("project")
+
+    def emit(kind, message, step=None, **fields):
+        if cancelled.is_set():
+            raise StepCancelled(f"{message}: cancelled")
+        if events is not None:
+            events.publish(loop, Event(time.time(), kind, message, step, fields.get("port", port)))
+
+    sink = StreamSink(loop, events, port) if events is not None else None
+    own_event = lambda event: sink is not None and event["step"] == kind and event["device"] == device
+
+    def run():
+        started = time.monotonic()
+        success = False
+        try:
+            with step_context(kind, device), route_events(own_event, sink):
+                ensure_idf_environment()
+                result = jobs.JOB_KINDS[kind](resolve_params(params), emit, console_sessions())
+            success = True
+            return result
+        finally:
+            elapsed = time.monotonic() - started
+            record_step(kind, port, elapsed, success)
+            record_timing(kind, elapsed, success, port)
+
+    future = loop.run_in_executor(None, run)
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+async def fetch_repositories(repositories=None, update=False, events=None):
+    """Fetch missing repositories of the manifest (all selected ones with update=True)"""
+    result = await run_step("fetch", {"repositories": repositories, "update": update}, events)
+    return FetchResult(result["fetched"])
+
+async def build(project, events=None):
+    """Build 'border_router', 'cli' or 'rcp' incrementally"""
+    result = await run_step("build", {"project": project}, events)
+    return BuildResult(project, result["build_dir"])
+
+async def provision(project, port, dataset=None, wifi_ssid=None, wifi_password=None, device=None,
+                    profile=None, build=True, events=None):
+    """Build a project if needed and flash it to port, with the dataset and Wi-Fi credentials in NVS"""
+    params = {"project": project, "port": port, "dataset": dataset, "wifi_ssid": wifi_ssid,
+              "wifi_password": wifi_password, "device": device, "profile": profile, "build": build}
+    result = await run_step("provision", {key: value for key, value in params.items() if value is not None}, events)
+    return ProvisionResult(project, port, result.get("build_dir"), result.get("nvs_image"))
+
+async def create_dataset(port, network_name=None, events=None):
+    """Create and commit a new dataset on the Border Router at port"""
+    result = await run_step("create_dataset", {"port": port, "network_name": network_name}, events)
+    return DatasetResult(port, result["network_name"], result["dataset"])
+
+async def join(port, dataset, timeout=60.0, events=None):
+    """Join the CLI device at port to the network of dataset"""
+    result = await run_step("join", {"port": port, "dataset": dataset, "timeout": timeout}, events)
+    return JoinResult(result["port"])
+
+async def benchmark(port, border_router_port, payload_sizes=None, count=None, interval=None, events=None):
+    """Benchmark the Thread link from the CLI device at port to the Border Router; None uses the defaults"""
+    params = {"port": port, "border_router_port": border_router_port, "payload_sizes": payload_sizes,
+              "count": count, "interval": interval}
+    result = await run_step("benchmark", {key: value for key, value in params.items() if value is not None}, events)
+    return BenchmarkResult(port, border_router_port, result["border_router_address"],
+                           result["runs"], result["neighbors"])
+
+async def setup_network(border_router_port, cli_ports, wifi_ssid=None, wifi_password=None, events=None):
+    """Provision a Border Router and CLI devices, create a network on the Border Router and join every CLI to it
+
+    Returns (DatasetResult, [JoinResult, ...]). The CLI builds and flashes
+    run concurrently with the Border Router's.
+    """
+    await asyncio.gather(
+        provision("border_router", border_router_port, wifi_ssid=wifi_ssid, wifi_password=wifi_password,
+                  events=events),
+        *[provision("cli", port, events=events) for port in cli_ports])
+    dataset = await create_dataset(border_router_port, events=events)
+    joined = await asyncio.gather(*[join(port, dataset.dataset, events=events) for port in cli_ports])
+    return dataset, list(joined)
+
+def close():
+    """Close the serial consoles kept open by the steps"""
+    if _sessions is not None:
+        _sessions.close_all()
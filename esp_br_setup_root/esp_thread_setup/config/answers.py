@@ -0,0 +1,115 @@
+﻿#!/usr/bin/env python3
+"""
+Answers to the setup questions, from a run config file and command line flags.
+
+Every prompt goes through ask(), ask_yes_no() or pause(). An answer that was
+configured is returned without prompting. In non-interactive mode a question
+without an answer (or a safe default) raises NonInteractiveError instead of
+blocking on input().
+"""
+import os
+import json
+
+# Answer keys a run config may set, with what they answer
+ANSWER_KEYS = {
+    "mode": "'all' to run every step, 'steps' to run the ones listed in 'steps'",
+    "steps": "menu step numbers to run in order, e.g. [1, 3, 4] or \"1,3,4\"",
+    "skip_repositories": "use existing repositories without downloading (bool)",
+    "redownload_repositories": "re-download repositories that already exist (bool)",
+    "border_router_port": "serial port of the Border Router",
+    "cli_port": "serial port of the CLI device",
+    "wifi_ssid": "Wi-Fi SSID baked into the Border Router and used by the Web GUI",
+    "wifi_password": "Wi-Fi password",
+    "dataset": "Thread dataset to use instead of creating one (hex TLVs, expanded text or a file path)",
+    "auto_dataset": "create the dataset over the serial console (bool)",
+    "auto_join": "join the CLI to the network over the serial console (bool)",
+    "web_gui_ip": "IP address of the Border Router Web GUI",
+    "benchmark": "benchmark the Thread link after setup (bool)",
+    "benchmark_payload_sizes": "ping payload sizes of the benchmark in bytes, e.g. [16, 64, 256] or \"16,64,256\"",
+    "benchmark_count": "pings per payload size in the benchmark",
+    "benchmark_interval": "seconds between benchmark pings",
+}
+
+_answers = {}
+_non_interactive = False
+
+class NonInteractiveError(Exception):
+    """Raised when a question has no configured answer in non-interactive mode"""
+
+def load_run_config(config_path):
+    """Load a JSON run config: an object of answer keys, plus an optional non_interactive flag"""
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"{config_path} must contain a JSON object")
+    unknown = set(config) - set(ANSWER_KEYS) - {"non_interactive"}
+    if unknown:
+        raise ValueError(f"Unknown keys in {config_path}: {', '.join(sorted(unknown))}")
+    return config
+
+def configure_answers(answers, non_interactive=False):
+    """Install the answers for this run; keys set to None are ignored"""
+    global _answers, _non_interactive
+    _answers = {key: value for key, value in answers.items() if value is not None}
+    _non_interactive = non_interactive
+
+def is_non_interactive():
+    """True if prompts must not block on input()"""
+    return _non_interactive
+
+def get_answer(key, default=None):
+    """The configured answer for key, or default"""
+    return _answers.get(key, default)
+
+def get_yes_no(key, default=None):
+    """The configured y/n answer for key as a bool, or default"""
+    value = _answers.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("y", "yes", "true", "1")
+
+def read_dataset_answer():
+    """The configured dataset, read from a file if the answer is a path"""
+    dataset = get_answer("dataset")
+    if dataset and os.path.isfile(os.path.expanduser(dataset)):
+        with open(os.path.expanduser(dataset), "r") as f:
+            dataset = f.read()
+    return dataset.strip() if dataset else None
+
+def ask(key, prompt, default=None):
+    """Return the configured answer for key, or prompt for it
+
+    In non-interactive mode the default is used when there is one, otherwise
+    NonInteractiveError is raised. key may be None for follow-up questions
+    that cannot be configured.
+    """
+    if key is not None and key in _answers:
+        return str(_answers[key])
+    if _non_interactive:
+        if default is not None:
+            return default
+        hint = f" (set '{key}' in the run config or with --set {key}=...)" if key else ""
+        raise NonInteractiveError(f"No answer for: {prompt.strip()}{hint}")
+    return input(prompt)
+
+def ask_yes_no(key, prompt, default=None):
+    """Like ask() for y/n questions; returns a bool"""
+    if key is not None and isinstance(_answers.get(key), bool):
+        return _answers[key]
+    default = None if default is None else ("y" if default else "n")
+    return ask(key, prompt, default).strip().lower() in ("y", "yes", "true", "1")
+
+def ask_wifi_credentials(prompt):
+    """(ssid, password) for the Border Router; an empty SSID skips Wi-Fi and is the non-interactive default"""
+    ssid = ask("wifi_ssid", prompt, default="").strip()
+    password = ask("wifi_password", "Enter Wi-Fi Password: ") if ssid else None
+    return ssid, password
+
+def pause(prompt, needs_human=False):
+    """Wait for Enter; skipped in non-interactive mode unless a person has to act at the console"""
+    if not _non_interactive:
+        input(prompt)
+    elif needs_human:
+        raise NonInteractiveError(f"This step needs someone at the device console: {prompt.strip()}")
@@ -8,7 +8,58 @@ from pathlib import Path
 # Directory paths
 HOME_DIR = str(Path.home())
 ESP_IDF_PATH = os.environ.get('IDF_PATH', f"{HOME_DIR}/esp/esp-idf")
-ESP_THREAD_BR_PATH = f"{HOME_DIR}/esp/esp-thread-br"
+IDF_TOOLS_PATH = os.environ.get('IDF_TOOLS_PATH', f"{HOME_DIR}/.espressif")
+# Several esp-thread-br versions can live side by side; ESP_THREAD_BR_VERSION selects one per run
+ESP_THREAD_BR_VERSIONS_DIR = f"{HOME_DIR}/esp/esp-thread-br-versions"
+ESP_THREAD_BR_VERSION = os.environ.get('ESP_THREAD_BR_VERSION')
+if ESP_THREAD_BR_VERSION:
+    ESP_THREAD_BR_PATH = f"{ESP_THREAD_BR_VERSIONS_DIR}/{ESP_THREAD_BR_VERSION}"
+else:
+    ESP_THREAD_BR_PATH = f"{HOME_DIR}/esp/esp-thread-br"
 
 # Default values
-DEFAULT_RCP_TARGET = "esp32c6"
\ No newline at end of file
+DEFAULT_RCP_TARGET = "esp32c6"
+
+# Rebuild firmware from scratch (idf.py fullclean) instead of incrementally
+CLEAN_BUILDS = os.environ.get('ESP_THREAD_CLEAN_BUILD') == "1"
+
+# Offline mode: never touch the network and flash prebuilt firmware from an imported bundle
+OFFLINE_MODE = os.environ.get('ESP_THREAD_OFFLINE') == "1"
+
+# Repository sources: "archive" downloads the branch ZIP, "git" does a sparse shallow checkout,
+# "store" materializes the ZIP as links into the deduplicated object store
+REPOSITORY_FETCH_BACKEND = os.environ.get('ESP_THREAD_FETCH_BACKEND', "archive")
+REPOSITORY_MANIFEST = os.environ.get('ESP_THREAD_REPOSITORY_MANIFEST', f"{HOME_DIR}/esp/repositories.json")
+MAX_PARALLEL_FETCHES = 4
+ESP_THREAD_BR_GIT_URL = "https://github.com/espressif/esp-thread-br.git"
+ESP_THREAD_BR_REF = os.environ.get('ESP_THREAD_BR_REF', "main")
+ESP_THREAD_BR_SPARSE_PATHS = ["examples/basic_thread_border_router", "components"]
+
+# Cache directories
+CACHE_DIR = f"{HOME_DIR}/.cache/esp-thread-setup"
+NVS_CACHE_DIR = f"{CACHE_DIR}/nvs"
+DATASET_STORE_DIR = f"{CACHE_DIR}/datasets"
+BENCHMARK_DIR = f"{CACHE_DIR}/benchmarks"
+ARCHIVE_CACHE_DIR = f"{CACHE_DIR}/archives"
+OBJECT_STORE_DIR = f"{CACHE_DIR}/objects"
+ENVIRONMENT_CACHE_FILE = f"{CACHE_DIR}/environment.json"
+IDF_EXPORT_CACHE_FILE = f"{CACHE_DIR}/idf_export.json"
+RUN_JOURNAL_FILE = f"{CACHE_DIR}/run_state.json"
+PROFILES_DIR = f"{CACHE_DIR}/profiles"
+TIMINGS_DB = f"{CACHE_DIR}/timings.sqlite3"
+# Firmware last flashed completely to each board, so re-provisioning can write only NVS
+FLASHED_FIRMWARE_FILE = f"{CACHE_DIR}/flashed_firmware.json"
+# Links to the pseudo-terminals of running OpenThread CLI simulators
+SIMULATOR_DIR = f"{CACHE_DIR}/simulator"
+
+# Provisioning daemon (esp-thread-setup daemon); only listens on the loopback interface by default
+DAEMON_HOST = os.environ.get('ESP_THREAD_DAEMON_HOST', "127.0.0.1")
+DAEMON_PORT = int(os.environ.get('ESP_THREAD_DAEMON_PORT', "8470"))
+DAEMON_WORKERS = int(os.environ.get('ESP_THREAD_DAEMON_WORKERS', "4"))
+
+# Status output: "pretty", "json" (JSON lines on stdout) or "quiet"; optionally also a JSON-lines event log
+OUTPUT_FORMAT = os.environ.get('ESP_THREAD_OUTPUT', "pretty")
+EVENT_LOG_FILE = os.environ.get('ESP_THREAD_EVENT_LOG') or None
+
+# Prometheus metrics: node-exporter textfile written at the end of a run and after each daemon job
+METRICS_TEXTFILE = os.environ.get('ESP_THREAD_METRICS_TEXTFILE') or None
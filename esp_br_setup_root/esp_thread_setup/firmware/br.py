@@ -3,40 +3,26 @@
 Setup and manage the ESP Thread Border Router.
 """
 import os
-import subprocess
-from esp_thread_setup.config.constants import ESP_THREAD_BR_PATH
+from esp_thread_setup.config.constants import ESP_THREAD_BR_PATH, OFFLINE_MODE
+from esp_thread_setup.config.answers import ask_wifi_credentials, pause
 from esp_thread_setup.utils.ports import find_device_port, check_port
+from esp_thread_setup.firmware.build import build_project
+from esp_thread_setup.firmware.nvs import generate_nvs_image, flash_with_nvs
+from esp_thread_setup.utils.logs import print_error, print_note
 
-def setup_border_router():
-    """Flash the Thread Border Router firmware with RCP auto-update disabled and Web GUI enabled"""
-    print("\n=== Setting up ESP Thread Border Router ===")
-    print("IMPORTANT: For this step, you only need to connect the Border Router device.")
-    print("The CLI device will be set up in a later step.")
-    input("Connect your ESP Thread Border Router device and press Enter to continue...")
+def configure_sdkconfig(br_example_dir):
+    """Disable RCP auto-update and enable the Web GUI in the Border Router sdkconfig
 
-    border_router_port = find_device_port("ESP Thread Border Router")
-    if not border_router_port:
-        print("ERROR: ESP Thread Border Router device not found")
-        return False, None
-    print(f"ESP Thread Border Router found at port: {border_router_port}")
-
-    # Change to the Border Router example directory
-    br_example_dir = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router")
-    if not os.path.exists(br_example_dir):
-        print(f"ERROR: Border Router example directory not found at {br_example_dir}")
-        return False, None
-
-    os.chdir(br_example_dir)
-
-    # Disable RCP auto-update and Enable Web GUI by modifying the sdkconfig file
-    print("Disabling RCP auto-update and Enabling Web GUI...")
+    Returns False if the project has neither sdkconfig nor sdkconfig.defaults.
+    """
+    print_note("Disabling RCP auto-update and Enabling Web GUI...")
     try:
         sdkconfig_path = os.path.join(br_example_dir, "sdkconfig")
         if not os.path.exists(sdkconfig_path):
             sdkconfig_path = os.path.join(br_example_dir, "sdkconfig.defaults")
             if not os.path.exists(sdkconfig_path):
-                print("Warning: Neither sdkconfig nor sdkconfig.defaults found.")
-                return True, border_router_port  # Cannot disable, but continue
+                print_note("Warning: Neither sdkconfig nor sdkconfig.defaults found.")
+                return False
 
         with open(sdkconfig_path, "r") as f:
             content = f.readlines()
@@ -65,33 +51,76 @@ def setup_border_router():
         if not found_web_gui:
             new_content.append("CONFIG_OPENTHREAD_BR_WEB_GUI_ENABLE=y\n")
 
-        with open(sdkconfig_path, "w") as f:
-            f.writelines(new_content)
+        # Write a new file rather than truncating, the old one may be shared with other versions.
+        # An unchanged file is left alone so its mtime does not force a CMake re-run.
+        if new_content != content:
+            with open(sdkconfig_path + ".tmp", "w") as f:
+                f.writelines(new_content)
+            os.replace(sdkconfig_path + ".tmp", sdkconfig_path)
 
     except Exception as e:
-        print(f"Error modifying sdkconfig: {e}")
+        print_note(f"Error modifying sdkconfig: {e}")
+    return True
 
-    # Clean build directory and rebuild
-    print("Cleaning previous build...")
-    clean_cmd = ["idf.py", "fullclean"]
-    subprocess.run(clean_cmd, check=False)
+def setup_border_router(dataset=None, wifi_ssid=None, wifi_password=None):
+    """Flash the Thread Border Router firmware with RCP auto-update disabled and Web GUI enabled
 
-    print("Building Border Router firmware...")
-    build_cmd = ["idf.py", "build"]
-    try:
-        subprocess.run(build_cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Build failed: {e}")
+    If a dataset or Wi-Fi credentials are given, they are baked into an NVS image
+    and flashed together with the firmware, so no console configuration is needed.
+    """
+    print_note("\n=== Setting up ESP Thread Border Router ===")
+    print_note("IMPORTANT: For this step, you only need to connect the Border Router device.")
+    print_note("The CLI device will be set up in a later step.")
+    pause("Connect your ESP Thread Border Router device and press Enter to continue...")
+
+    border_router_port = find_device_port("ESP Thread Border Router", "border_router_port")
+    if not border_router_port:
+        print_error("ERROR: ESP Thread Border Router device not found")
         return False, None
+    print_note(f"ESP Thread Border Router found at port: {border_router_port}")
 
-    # Flash the Border Router
-    print("Flashing Border Router firmware...")
-    flash_cmd = ["idf.py", "-p", border_router_port, "flash"]
-    try:
-        subprocess.run(flash_cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Flashing failed: {e}")
+    # Change to the Border Router example directory
+    br_example_dir = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router")
+    if not os.path.exists(br_example_dir):
+        print_error(f"ERROR: Border Router example directory not found at {br_example_dir}")
+        return False, None
+
+    os.chdir(br_example_dir)
+
+    # Disable RCP auto-update and Enable Web GUI by modifying the sdkconfig file
+    if not configure_sdkconfig(br_example_dir):
+        return True, border_router_port  # Cannot disable, but continue
+
+    build_dir = os.path.join(br_example_dir, "build")
+    prebuilt = OFFLINE_MODE and os.path.exists(os.path.join(build_dir, "flasher_args.json"))
+    if prebuilt:
+        print_note("Offline mode: using the prebuilt Border Router firmware")
+    else:
+        # Configured build directories are rebuilt incrementally with ninja
+        print_note("Building Border Router firmware...")
+        if not build_project(br_example_dir):
+            return False, None
+
+    if wifi_ssid is None:
+        wifi_ssid, wifi_password = ask_wifi_credentials(
+            "Enter Wi-Fi SSID to bake into the Border Router (leave empty to skip): ")
+
+    # Flash firmware and NVS image together when there is anything to provision
+    if dataset or wifi_ssid:
+        device_name = f"border_router-{os.path.basename(border_router_port)}"
+        nvs_image, nvs_offset = generate_nvs_image(device_name, br_example_dir, dataset, wifi_ssid, wifi_password)
+        if nvs_image:
+            print_note("Flashing Border Router firmware and NVS configuration...")
+            if not flash_with_nvs(border_router_port, build_dir, nvs_image, nvs_offset):
+                return False, None
+            print_note("✓ Border Router firmware and configuration flashed successfully")
+            return True, border_router_port
+        print_note("Falling back to flashing the firmware only...")
+
+    # Flash the Border Router with the images listed in flasher_args.json
+    print_note("Flashing Border Router firmware...")
+    if not flash_with_nvs(border_router_port, build_dir):
         return False, None
 
-    print("✓ Border Router firmware flashed successfully")
+    print_note("✓ Border Router firmware flashed successfully")
     return True, border_router_port
\ No newline at end of file
@@ -0,0 +1,81 @@
+﻿#!/usr/bin/env python3
+"""
+Build ESP-IDF projects, running ninja directly on already configured build directories.
+
+idf.py is only used to configure a project (first build, changed target or
+ESP-IDF checkout, or a forced clean build); everything else is a plain
+ninja run, which CMake itself re-configures when its inputs change.
+"""
+import os
+import shutil
+import subprocess
+from esp_thread_setup.config.constants import CLEAN_BUILDS
+from esp_thread_setup.utils.logs import print_error, run_logged
+from esp_thread_setup.utils.metrics import record_cache
+from esp_thread_setup.setup.timings import note_timing_context
+
+def read_cmake_cache(build_dir):
+    """Return the entries of a build directory's CMakeCache.txt as a dict"""
+    cache = {}
+    try:
+        with open(os.path.join(build_dir, "CMakeCache.txt"), "r") as f:
+            for line in f:
+                if line.startswith(("#", "//")) or "=" not in line:
+                    continue
+                key, _, value = line.rstrip("\n").partition("=")
+                cache[key.split(":", 1)[0]] = value
+    except OSError:
+        return {}
+    return cache
+
+def find_ninja(build_dir):
+    """The ninja binary a build directory was configured with, or None if it needs idf.py"""
+    if not os.path.exists(os.path.join(build_dir, "build.ninja")):
+        return None
+    cache = read_cmake_cache(build_dir)
+    if cache.get("CMAKE_GENERATOR") != "Ninja":
+        return None
+    ninja = cache.get("CMAKE_MAKE_PROGRAM")
+    if ninja and os.path.exists(ninja):
+        return ninja
+    return shutil.which("ninja")
+
+def idf_path_changed(build_dir):
+    """True if a build directory was configured by a different ESP-IDF checkout than the current one"""
+    cache = read_cmake_cache(build_dir)
+    idf_path = os.environ.get("IDF_PATH")
+    return bool(cache and idf_path and os.path.realpath(cache.get("IDF_PATH", "")) != os.path.realpath(idf_path))
+
+def needs_configure(build_dir, target=None):
+    """True if a build directory must go through idf.py before ninja can build it"""
+    cache = read_cmake_cache(build_dir)
+    if not cache or find_ninja(build_dir) is None:
+        return True
+    if target and cache.get("IDF_TARGET") != target:
+        return True
+    return idf_path_changed(build_dir)
+
+def build_project(project_dir, target=None, clean=CLEAN_BUILDS):
+    """Build an ESP-IDF project; return True on success"""
+    build_dir = os.path.join(project_dir, "build")
+    try:
+        configured = not clean and not needs_configure(build_dir, target)
+        record_cache("build", configured)
+        note_timing_context(target=target or read_cmake_cache(build_dir).get("IDF_TARGET"),
+                            cache="hit" if configured else "miss")
+        # idf.py refuses to build a directory CMake configured for another ESP-IDF path
+        if clean or idf_path_changed(build_dir):
+            run_logged(["idf.py", "fullclean"], cwd=project_dir, check=False)
+        elif configured:
+            run_logged([find_ninja(build_dir)], cwd=build_dir)
+            return True
+
+        build_cmd = ["idf.py"]
+        if target and (clean or read_cmake_cache(build_dir).get("IDF_TARGET") != target):
+            # set-target wipes sdkconfig and the build directory, only use it when the target changes
+            build_cmd += ["set-target", target]
+        run_logged(build_cmd + ["build"], cwd=project_dir)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print_error(f"ERROR: Build failed: {e}")
+        return False
+    return True
@@ -3,58 +3,69 @@
 Setup and manage the ESP Thread CLI device.
 """
 import os
-import subprocess
-from esp_thread_setup.config.constants import ESP_IDF_PATH
+from esp_thread_setup.config.constants import ESP_IDF_PATH, OFFLINE_MODE
+from esp_thread_setup.config.answers import pause
 from esp_thread_setup.utils.ports import find_device_port
-from esp_thread_setup.utils.logs import show_build_logs
+from esp_thread_setup.utils.logs import show_build_logs, print_error, print_note
+from esp_thread_setup.firmware.build import build_project
+from esp_thread_setup.firmware.nvs import generate_nvs_image, flash_with_nvs
 
-def build_and_flash_cli():
-    """Flash the CLI using ESP32C6 example image from ESP-IDF"""
-    print("\n=== Setting up CLI (ESP32C6) ===")
-    print("IMPORTANT: For this step, you only need to connect the ESP32C6 CLI device.")
-    print("The Border Router device will be needed again in later steps.")
-    input("Connect your ESP32C6 (CLI) device and press Enter to continue...")
+def build_and_flash_cli(dataset=None):
+    """Flash the CLI using ESP32C6 example image from ESP-IDF
+
+    If a dataset is given, it is baked into an NVS image and flashed together
+    with the firmware, so the CLI does not need to be configured over the console.
+    """
+    print_note("\n=== Setting up CLI (ESP32C6) ===")
+    print_note("IMPORTANT: For this step, you only need to connect the ESP32C6 CLI device.")
+    print_note("The Border Router device will be needed again in later steps.")
+    pause("Connect your ESP32C6 (CLI) device and press Enter to continue...")
 
     # Get the port using improved detection
-    cli_port = find_device_port("ESP32C6 CLI")
+    cli_port = find_device_port("ESP32C6 CLI", "cli_port")
     if not cli_port:
-        print("ERROR: ESP32C6 device not found")
+        print_error("ERROR: ESP32C6 device not found")
         return False, None
 
-    print(f"ESP32C6 device found at port: {cli_port}")
+    print_note(f"ESP32C6 device found at port: {cli_port}")
 
     # Check if the OT CLI example directory exists in ESP-IDF
     cli_example_dir = os.path.join(ESP_IDF_PATH, "examples/openthread/ot_cli")
     if not os.path.exists(cli_example_dir):
-        print(f"ERROR: CLI example directory not found at {cli_example_dir}")
-        print("Please make sure the ESP-IDF repository is complete with examples")
+        print_error(f"ERROR: CLI example directory not found at {cli_example_dir}")
+        print_note("Please make sure the ESP-IDF repository is complete with examples")
         return False, None
 
     # Change to the CLI example directory
     os.chdir(cli_example_dir)
 
-    # Clean previous build
-    print("Cleaning previous CLI build...")
-    clean_cmd = ["idf.py", "fullclean"]
-    subprocess.run(clean_cmd, check=False)
-
-    # Build and flash the CLI example
-    print("Building and flashing OpenThread CLI example for ESP32C6...")
-    
-    # FIXED COMMAND: The -p flag should come before set-target
-    flash_cmd = [
-        "idf.py",
-        "-p", cli_port,  # Port specification comes first
-        "set-target", "esp32c6",
-        "flash"
-    ]
-
-    try:
-        subprocess.run(flash_cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Failed to flash OpenThread CLI example: {e}")
-        show_build_logs(cli_example_dir + "/build")
+    build_dir = os.path.join(cli_example_dir, "build")
+    prebuilt = OFFLINE_MODE and os.path.exists(os.path.join(build_dir, "flasher_args.json"))
+    if prebuilt:
+        print_note("Offline mode: using the prebuilt OpenThread CLI firmware")
+    else:
+        # Configured build directories are rebuilt incrementally with ninja
+        print_note("Building OpenThread CLI example for ESP32C6...")
+        if not build_project(cli_example_dir, "esp32c6"):
+            print_error("ERROR: Failed to build OpenThread CLI example")
+            show_build_logs(cli_example_dir + "/build")
+            return False, None
+
+    if dataset:
+        device_name = f"cli-{os.path.basename(cli_port)}"
+        nvs_image, nvs_offset = generate_nvs_image(device_name, cli_example_dir, dataset)
+        if nvs_image:
+            print_note("Flashing OpenThread CLI firmware and Thread dataset...")
+            if not flash_with_nvs(cli_port, build_dir, nvs_image, nvs_offset):
+                return False, None
+            print_note("✓ OpenThread CLI (ESP32C6) flashed with the Thread dataset")
+            return True, cli_port
+        print_note("Falling back to flashing the firmware only...")
+
+    # Flash the images listed in flasher_args.json
+    print_note("Flashing OpenThread CLI firmware...")
+    if not flash_with_nvs(cli_port, build_dir):
         return False, None
 
-    print("✓ OpenThread CLI (ESP32C6) flashed successfully")
-    return True, cli_port
\ No newline at end of file
+    print_note("✓ OpenThread CLI (ESP32C6) flashed successfully")
+    return True, cli_port
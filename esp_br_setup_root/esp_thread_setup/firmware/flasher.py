@@ -0,0 +1,108 @@
+﻿#!/usr/bin/env python3
+"""
+Flash boards with esptool loaded as a library.
+
+The images and options come straight from the build's flasher_args.json, so
+neither idf.py nor a separate esptool process is started per board. Boards
+are flashed in parallel by calling flash_device() from several threads, as
+the daemon's worker pool and the async API's steps do.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from esp_thread_setup.config.constants import ESP_IDF_PATH
+from esp_thread_setup.utils.events import capture_output
+from esp_thread_setup.utils.logs import print_error, run_logged
+from esp_thread_setup.utils.metrics import record_flash
+
+FLASH_BAUD_RATE = 460800
+
+# esptool ships inside ESP-IDF; used when it is not installed in this interpreter
+VENDORED_ESPTOOL_DIR = os.path.join(ESP_IDF_PATH, "components", "esptool_py", "esptool")
+
+_esptool = None
+_esptool_lock = threading.Lock()
+
+def load_esptool():
+    """Import esptool once, from this interpreter or from ESP-IDF; return None if unavailable"""
+    global _esptool
+    with _esptool_lock:
+        if _esptool is None:
+            try:
+                import esptool
+            except ImportError:
+                if not os.path.isdir(VENDORED_ESPTOOL_DIR):
+                    return None
+                sys.path.append(VENDORED_ESPTOOL_DIR)
+                try:
+                    import esptool
+                except ImportError:
+                    return None
+            _esptool = esptool
+        return _esptool
+
+def read_flasher_args(build_dir):
+    """Load flasher_args.json of a build and return it with absolute image paths"""
+    with open(os.path.join(build_dir, "flasher_args.json"), "r") as f:
+        flasher_args = json.load(f)
+    flasher_args["flash_files"] = {
+        offset: os.path.join(build_dir, path) for offset, path in flasher_args.get("flash_files", {}).items()
+    }
+    return flasher_args
+
+def esptool_arguments(port, build_dir=None, extra_images=(), baud=FLASH_BAUD_RATE):
+    """esptool command line writing a build's images plus (offset, path) extra_images"""
+    images = {}
+    write_flash_args = []
+    extra_args = {"chip": "auto", "before": "default_reset", "after": "hard_reset", "stub": True}
+    if build_dir:
+        flasher_args = read_flasher_args(build_dir)
+        images.update(flasher_args["flash_files"])
+        write_flash_args = flasher_args.get("write_flash_args", [])
+        extra_args.update(flasher_args.get("extra_esptool_args", {}))
+    for offset, path in extra_images:
+        images[hex(offset) if isinstance(offset, int) else offset] = path
+
+    arguments = ["--chip", extra_args["chip"], "-p", port, "-b", str(baud),
+                 "--before", extra_args["before"], "--after", extra_args["after"]]
+    if not extra_args["stub"]:
+        arguments.append("--no-stub")
+    arguments += ["write_flash"] + write_flash_args
+    for offset in sorted(images, key=lambda o: int(o, 16)):
+        arguments += [offset, images[offset]]
+    return arguments
+
+def image_size(arguments):
+    """Total size of the images written by an esptool write_flash command line"""
+    images = arguments[arguments.index("write_flash") + 1:]
+    return sum(os.path.getsize(path) for offset, path in zip(images, images[1:])
+               if offset.startswith("0x") and os.path.isfile(path))
+
+def flash_device(port, build_dir=None, extra_images=(), baud=FLASH_BAUD_RATE):
+    """Flash one board in this process, falling back to an esptool.py subprocess"""
+    try:
+        arguments = esptool_arguments(port, build_dir, extra_images, baud)
+    except (OSError, ValueError) as e:
+        print_error(f"ERROR: Cannot read flasher arguments of {build_dir}: {e}")
+        return False
+
+    esptool = load_esptool()
+    started = time.monotonic()
+    try:
+        # esptool prints its progress; as events it stays out of the JSON-lines output
+        if esptool is not None:
+            with capture_output():
+                esptool.main(arguments)
+        else:
+            run_logged(["esptool.py"] + arguments)
+    except SystemExit as e:
+        if e.code:
+            print_error(f"ERROR: Flashing {port} failed with exit code {e.code}")
+            return False
+    except Exception as e:
+        print_error(f"ERROR: Flashing {port} failed: {e}")
+        return False
+    record_flash(port, image_size(arguments), time.monotonic() - started)
+    return True
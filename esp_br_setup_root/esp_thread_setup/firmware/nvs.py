@@ -0,0 +1,148 @@
+﻿#!/usr/bin/env python3
+"""
+Generate and flash NVS partition images holding the Thread dataset and Wi-Fi credentials.
+"""
+import os
+import csv
+import json
+import threading
+import subprocess
+from esp_thread_setup.config.constants import ESP_IDF_PATH, NVS_CACHE_DIR, FLASHED_FIRMWARE_FILE
+from esp_thread_setup.network.dataset import dataset_to_tlvs
+from esp_thread_setup.firmware.flasher import flash_device
+from esp_thread_setup.setup.journal import firmware_fingerprint
+from esp_thread_setup.utils.logs import print_success, print_error, print_info
+
+# Namespace and key used by the ESP OpenThread port (OT_KEY_INDEX_PATTERN "OT%02x%02x")
+# for the active operational dataset (settings key 0x01, index 0)
+OT_NVS_NAMESPACE = "openthread"
+OT_ACTIVE_DATASET_KEY = "OT0100"
+
+# Namespace and keys read by the Border Router example for its Wi-Fi station config
+WIFI_NVS_NAMESPACE = "wifi_config"
+WIFI_SSID_KEY = "ssid"
+WIFI_PASSWORD_KEY = "password"
+
+# Default single-app partition table: nvs directly after the table at 0x8000
+DEFAULT_NVS_OFFSET = 0x9000
+DEFAULT_NVS_SIZE = 0x6000
+
+_flashed_lock = threading.Lock()
+
+def parse_size(value):
+    """Parse a partition table size/offset such as 0x6000, 24K or 1M"""
+    value = value.strip().upper()
+    if value.endswith("K"):
+        return int(value[:-1], 0) * 1024
+    if value.endswith("M"):
+        return int(value[:-1], 0) * 1024 * 1024
+    return int(value, 0)
+
+def find_nvs_partition(project_dir):
+    """Return (offset, size) of the nvs partition declared in the project's partitions.csv"""
+    partitions_file = os.path.join(project_dir, "partitions.csv")
+    if not os.path.exists(partitions_file):
+        return DEFAULT_NVS_OFFSET, DEFAULT_NVS_SIZE
+
+    with open(partitions_file, "r") as f:
+        rows = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+    for row in csv.reader(rows):
+        fields = [field.strip() for field in row]
+        if len(fields) >= 5 and fields[1] == "data" and fields[2] == "nvs":
+            offset = parse_size(fields[3]) if fields[3] else DEFAULT_NVS_OFFSET
+            return offset, parse_size(fields[4])
+
+    return DEFAULT_NVS_OFFSET, DEFAULT_NVS_SIZE
+
+def write_nvs_csv(csv_path, dataset=None, wifi_ssid=None, wifi_password=None):
+    """Write the nvs_partition_gen.py input CSV for one device"""
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["key", "type", "encoding", "value"])
+        if dataset:
+            writer.writerow([OT_NVS_NAMESPACE, "namespace", "", ""])
+            writer.writerow([OT_ACTIVE_DATASET_KEY, "data", "hex2bin", dataset_to_tlvs(dataset).hex()])
+        if wifi_ssid:
+            writer.writerow([WIFI_NVS_NAMESPACE, "namespace", "", ""])
+            writer.writerow([WIFI_SSID_KEY, "data", "string", wifi_ssid])
+            writer.writerow([WIFI_PASSWORD_KEY, "data", "string", wifi_password or ""])
+
+def generate_nvs_image(device_name, project_dir, dataset=None, wifi_ssid=None, wifi_password=None):
+    """Generate an NVS partition image for one device and return (image_path, offset)"""
+    print_info(f"Generating NVS partition image for {device_name}...")
+    offset, size = find_nvs_partition(project_dir)
+
+    os.makedirs(NVS_CACHE_DIR, exist_ok=True)
+    csv_path = os.path.join(NVS_CACHE_DIR, f"{device_name}.csv")
+    image_path = os.path.join(NVS_CACHE_DIR, f"{device_name}.bin")
+    try:
+        write_nvs_csv(csv_path, dataset, wifi_ssid, wifi_password)
+    except ValueError as e:
+        print_error(f"ERROR: Invalid dataset for NVS image: {e}")
+        return None, None
+
+    nvs_gen = os.path.join(ESP_IDF_PATH, "components/nvs_flash/nvs_partition_generator/nvs_partition_gen.py")
+    gen_cmd = ["python", nvs_gen, "generate", csv_path, image_path, hex(size)]
+    try:
+        subprocess.run(gen_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print_error(f"ERROR: Failed to generate NVS image: {e}")
+        return None, None
+
+    print_success(f"✓ NVS image written to {image_path} ({os.path.getsize(image_path)} bytes at {hex(offset)})")
+    return image_path, offset
+
+def device_identity(port):
+    """The port plus the USB serial number of the board behind it, so a swapped board is not mistaken for it"""
+    try:
+        from serial.tools import list_ports
+        for info in list_ports.comports():
+            if info.device == os.path.realpath(port) and info.serial_number:
+                return f"{port}#{info.serial_number}"
+    except ImportError:
+        pass
+    return port
+
+def read_flashed_firmware(flashed_file=FLASHED_FIRMWARE_FILE):
+    """Map of device identity -> fingerprint of the firmware last flashed to it completely"""
+    try:
+        with open(flashed_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_flashed_firmware(identity, firmware, flashed_file=FLASHED_FIRMWARE_FILE):
+    """Remember (or with firmware=None, forget) the firmware on a device"""
+    with _flashed_lock:
+        flashed = read_flashed_firmware(flashed_file)
+        if firmware:
+            flashed[identity] = firmware
+        else:
+            flashed.pop(identity, None)
+        os.makedirs(os.path.dirname(flashed_file), exist_ok=True)
+        with open(flashed_file + ".tmp", "w") as f:
+            json.dump(flashed, f, indent=2)
+        os.replace(flashed_file + ".tmp", flashed_file)
+
+def flash_with_nvs(port, build_dir, nvs_image=None, nvs_offset=None, flashed_file=FLASHED_FIRMWARE_FILE):
+    """Flash the built firmware, and the NVS image if given, in a single esptool pass
+
+    A board that already runs this exact firmware only gets its NVS partition written.
+    """
+    identity = device_identity(port)
+    firmware = firmware_fingerprint(build_dir)
+    if nvs_image and firmware and read_flashed_firmware(flashed_file).get(identity) == firmware:
+        print_info(f"Firmware on {port} is up to date, writing only the NVS partition...")
+        return flash_nvs_only(port, nvs_image, nvs_offset)
+
+    # A board interrupted while flashing runs no known firmware
+    record_flashed_firmware(identity, None, flashed_file)
+    extra_images = [(nvs_offset, nvs_image)] if nvs_image else []
+    if not flash_device(port, build_dir, extra_images):
+        return False
+    record_flashed_firmware(identity, firmware, flashed_file)
+    return True
+
+def flash_nvs_only(port, nvs_image, nvs_offset):
+    """Re-provision an already flashed board by writing just its NVS partition"""
+    return flash_device(port, extra_images=[(nvs_offset, nvs_image)])
@@ -3,8 +3,9 @@
 Build and manage RCP (Radio Co-Processor) firmware.
 """
 import os
-from esp_thread_setup.config.constants import ESP_IDF_PATH, DEFAULT_RCP_TARGET
-from esp_thread_setup.utils.logs import show_build_logs, print_success, print_error, print_warning, print_info, run_command_with_minimal_output
+from esp_thread_setup.config.constants import ESP_IDF_PATH, OFFLINE_MODE
+from esp_thread_setup.utils.logs import show_build_logs, print_success, print_error, print_info, print_note
+from esp_thread_setup.firmware.build import build_project
 
 def build_rcp_firmware():
     """Build the RCP firmware required for the Border Router"""
@@ -13,25 +14,24 @@ def build_rcp_firmware():
     # Navigate to the RCP example directory
     rcp_example_dir = os.path.join(ESP_IDF_PATH, "examples/openthread/ot_rcp")
     if not os.path.exists(rcp_example_dir):
-        print(f"ERROR: RCP example directory not found at {rcp_example_dir}")
+        print_error(f"ERROR: RCP example directory not found at {rcp_example_dir}")
         return False
 
     os.chdir(rcp_example_dir)
 
-    # Clean previous build
-    print_warning("Cleaning previous RCP build...")
-    run_command_with_minimal_output(["idf.py", "fullclean"], "Cleaning RCP build directory")
-
     # Set the default RCP target to esp32h2
     rcp_target = "esp32h2"
-    print(f"Using default RCP target: {rcp_target}")
+    print_note(f"Using default RCP target: {rcp_target}")
+
+    # An imported bundle carries the images but no CMake state; building would wipe them and need the network
+    if OFFLINE_MODE and os.path.exists(os.path.join(rcp_example_dir, "build", "flasher_args.json")):
+        print_note("Offline mode: using the prebuilt RCP firmware")
+        return True
 
-    # Build the RCP firmware
-    print(f"Building RCP firmware for {rcp_target} (this will take a few minutes)...")
-    try:
-        run_command_with_minimal_output(["idf.py", "set-target", rcp_target, "build"], "Building RCP firmware")
-    except subprocess.CalledProcessError as e:
-        print_error(f"ERROR: Failed to build RCP firmware: {e}")
+    # Build the RCP firmware; a configured build directory is rebuilt incrementally with ninja
+    print_note(f"Building RCP firmware for {rcp_target} (this will take a few minutes)...")
+    if not build_project(rcp_example_dir, rcp_target):
+        print_error("ERROR: Failed to build RCP firmware")
         show_build_logs(rcp_example_dir + "/build")
         return False  # Stop if RCP build fails
 
@@ -40,13 +40,13 @@ def build_rcp_firmware():
 
 def create_fallback_rcp_files():
     """Create fallback RCP files if they don't exist"""
-    print("\n=== Creating Fallback RCP Files ===")
-    print("This is a fallback mechanism to ensure RCP files are available.")
-    print("It's recommended to build the RCP firmware properly, but this will help in case of issues.")
+    print_note("\n=== Creating Fallback RCP Files ===")
+    print_note("This is a fallback mechanism to ensure RCP files are available.")
+    print_note("It's recommended to build the RCP firmware properly, but this will help in case of issues.")
 
     rcp_example_dir = os.path.join(ESP_IDF_PATH, "examples/openthread/ot_rcp")
     if not os.path.exists(rcp_example_dir):
-        print(f"ERROR: RCP example directory not found at {rcp_example_dir}")
+        print_error(f"ERROR: RCP example directory not found at {rcp_example_dir}")
         return False
 
     # Create a dummy build directory if it doesn't exist
@@ -60,12 +60,12 @@ def create_fallback_rcp_files():
     if not os.path.exists(rcp_bin_path_c6):
         with open(rcp_bin_path_c6, "w") as f:
             f.write("This is a fallback RCP file for esp32c6.\nIt's recommended to build the RCP firmware properly.")
-        print(f"Created fallback RCP file: {rcp_bin_path_c6}")
+        print_note(f"Created fallback RCP file: {rcp_bin_path_c6}")
 
     if not os.path.exists(rcp_bin_path_s3):
         with open(rcp_bin_path_s3, "w") as f:
             f.write("This is a fallback RCP file for esp32s3.\nIt's recommended to build the RCP firmware properly.")
-        print(f"Created fallback RCP file: {rcp_bin_path_s3}")
+        print_note(f"Created fallback RCP file: {rcp_bin_path_s3}")
 
-    print("✓ Fallback RCP files created/exist")
+    print_note("✓ Fallback RCP files created/exist")
     return True
\ No newline at end of file
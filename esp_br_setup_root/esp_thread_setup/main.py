@@ -4,29 +4,25 @@ Main entry point for the ESP Thread Setup utility.
 """
 import os
 import sys
-import pprint
+import time
+import atexit
+import argparse
 
-# Add the parent directory to the Python path
+# Make both `esp_br_setup_root.esp_thread_setup` and `esp_thread_setup` importable
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Debugging sys.path
-print("\n=== Debugging sys.path ===")
-pprint.pprint(sys.path)
-print("===========================\n")
-
-# Import using the full path
-from esp_br_setup_root.esp_thread_setup.setup.prerequisites import check_prerequisites
-from esp_br_setup_root.esp_thread_setup.repositories.download import download_repositories
-from esp_br_setup_root.esp_thread_setup.firmware.rcp import build_rcp_firmware, create_fallback_rcp_files
-from esp_br_setup_root.esp_thread_setup.firmware.br import setup_border_router
-from esp_br_setup_root.esp_thread_setup.firmware.cli import build_and_flash_cli
-from esp_br_setup_root.esp_thread_setup.network.dataset import create_dataset
-from esp_br_setup_root.esp_thread_setup.network.cli_config import configure_cli
-from esp_br_setup_root.esp_thread_setup.web.gui import setup_web_gui
-from esp_br_setup_root.esp_thread_setup.utils.ports import check_port
-from esp_br_setup_root.esp_thread_setup.utils.logs import print_error
-
-# Rest of your code...
+from esp_thread_setup.utils.events import step_context
+from esp_thread_setup.utils.logs import print_error, print_info, print_note
+
+# Step IDs of the menu steps, as tagged on their status events and recorded in the run journal
+STEP_IDS = {'1': "repositories", '2': "rcp", '3': "border_router", '4': "cli", '5': "dataset",
+            '6': "cli_join", '7': "web_gui", '9': "benchmark"}
+# Steps of "Run all steps", in order
+RUN_ALL_STEPS = ("repositories", "rcp", "border_router", "cli", "dataset", "cli_join", "web_gui")
+
+# Step modules are imported where they are used, so the menu and --help start
+# without loading pyserial or probing ESP-IDF
 
 class ESPThreadSetup:
     def __init__(self):
@@ -34,174 +30,485 @@ class ESPThreadSetup:
         self.cli_port = None
         self.dataset = None
         self.skip_repositories = False
+        self.resume = True
 
     def show_steps_menu(self):
         """Show a menu to let user select which steps to perform"""
+        from esp_thread_setup.setup.timings import predict_durations, format_duration
+
+        # Predicted durations from earlier runs on this machine
+        predictions = predict_durations(RUN_ALL_STEPS + ("benchmark",))
+        def eta(*steps):
+            known = [predictions[step] for step in steps if step in predictions]
+            return f" [~{format_duration(sum(known))}]" if known else ""
+
         print("\n=== ESP Thread Border Router Setup Steps ===")
         print("Please select which steps you want to perform:")
-        print("1. Download/update repositories")
-        print("2. Build RCP firmware (required before building Border Router)")
-        print("3. Setup Border Router (ESP32S3 with RCP)")
-        print("4. Setup CLI (ESP32C6)")
-        print("5. Create Thread network dataset (requires BOTH devices connected)")
-        print("6. Configure CLI to join Thread network (requires BOTH devices connected)")
-        print("7. Setup Web GUI")
-        print("8. Run all steps (1-7)")
-        print("9. Exit")
-
-        choice = input("\nEnter your choice (1-9): ")
-
-        if choice == '1':
-            download_repositories(self.skip_repositories)
-        elif choice == '2':
-            build_rcp_firmware()
-        elif choice == '3':
-            success, self.border_router_port = setup_border_router()
-        elif choice == '4':
-            success, self.cli_port = build_and_flash_cli()
-        elif choice == '5':
-            success, self.dataset, self.border_router_port = create_dataset(self.border_router_port)
-        elif choice == '6':
-            configure_cli(self.cli_port, self.dataset)
-        elif choice == '7':
-            setup_web_gui(self.border_router_port)
-        elif choice == '8':
-            self.run_all_steps()
-        elif choice == '9':
+        print(f"1. Download/update repositories{eta('repositories')}")
+        print(f"2. Build RCP firmware (required before building Border Router){eta('rcp')}")
+        print(f"3. Setup Border Router (ESP32S3 with RCP){eta('border_router')}")
+        print(f"4. Setup CLI (ESP32C6){eta('cli')}")
+        print(f"5. Create Thread network dataset (requires BOTH devices connected){eta('dataset')}")
+        print(f"6. Configure CLI to join Thread network (requires BOTH devices connected){eta('cli_join')}")
+        print(f"7. Setup Web GUI{eta('web_gui')}")
+        print(f"8. Run all steps (1-7){eta(*RUN_ALL_STEPS)}")
+        print(f"9. Benchmark Thread link (requires BOTH devices connected){eta('benchmark')}")
+        print("10. Exit")
+
+        choice = input("\nEnter your choice (1-10): ")
+
+        if choice == '10':
             print("Exiting...")
             sys.exit(0)
-        else:
+        if not self.run_step(choice):
             print("Invalid choice. Please try again.")
-            self.show_steps_menu()
 
         # Return to the menu after completing a step
         self.show_steps_menu()
 
+    def run_step(self, choice):
+        """Run one menu step by its number; return False for an unknown step"""
+        from esp_thread_setup.utils.metrics import record_step
+        from esp_thread_setup.setup.timings import record_timing
+
+        if choice == '8':
+            self.run_all_steps()
+            return True
+        if choice not in STEP_IDS:
+            return False
+        started = time.monotonic()
+        with step_context(STEP_IDS[choice]):
+            if choice == '1':
+                from esp_br_setup_root.esp_thread_setup.repositories.download import download_repositories
+                success = download_repositories(self.skip_repositories)
+            elif choice == '2':
+                from esp_br_setup_root.esp_thread_setup.firmware.rcp import build_rcp_firmware
+                success = build_rcp_firmware()
+            elif choice == '3':
+                from esp_br_setup_root.esp_thread_setup.firmware.br import setup_border_router
+                from esp_br_setup_root.esp_thread_setup.network.dataset import load_saved_dataset
+                success, self.border_router_port = setup_border_router(self.dataset or load_saved_dataset())
+            elif choice == '4':
+                from esp_br_setup_root.esp_thread_setup.firmware.cli import build_and_flash_cli
+                from esp_br_setup_root.esp_thread_setup.network.dataset import load_saved_dataset
+                success, self.cli_port = build_and_flash_cli(self.dataset or load_saved_dataset())
+            elif choice == '5':
+                from esp_br_setup_root.esp_thread_setup.network.dataset import create_dataset
+                success, self.dataset, self.border_router_port = create_dataset(self.border_router_port)
+            elif choice == '6':
+                from esp_br_setup_root.esp_thread_setup.network.cli_config import configure_cli
+                success = configure_cli(self.cli_port, self.dataset)
+            elif choice == '7':
+                from esp_br_setup_root.esp_thread_setup.web.gui import setup_web_gui
+                success = setup_web_gui(self.border_router_port)
+            elif choice == '9':
+                from esp_br_setup_root.esp_thread_setup.network.benchmark import run_link_benchmark, benchmark_settings
+                success = run_link_benchmark(self.cli_port, self.border_router_port, *benchmark_settings()) is not None
+        elapsed = time.monotonic() - started
+        record_step(STEP_IDS[choice], None, elapsed, success)
+        record_timing(STEP_IDS[choice], elapsed, success)
+        return True
+
+    def run_selected_steps(self, steps):
+        """Run the menu steps listed in the run config, in order"""
+        for step in parse_steps(steps):
+            if step == '10' or not self.run_step(step):
+                raise ValueError(f"Invalid step in run config: {step}")
+
     def run_all_steps(self):
         """Run all setup steps sequentially and verify the setup"""
-        print("\n=== Running Complete Setup Process ===")
-        print("This will guide you through the entire setup process step by step.")
-        print("You'll need both your ESP Thread Border Router and ESP32C6 CLI devices.")
-        print("At different stages, you'll be prompted to connect one or both devices.")
+        print_note("\n=== Running Complete Setup Process ===")
+        print_note("This will guide you through the entire setup process step by step.")
+        print_note("You'll need both your ESP Thread Border Router and ESP32C6 CLI devices.")
+        print_note("At different stages, you'll be prompted to connect one or both devices.")
+
+        from esp_br_setup_root.esp_thread_setup.setup.prerequisites import check_prerequisites
+        from esp_br_setup_root.esp_thread_setup.repositories.download import download_repositories
+        from esp_br_setup_root.esp_thread_setup.firmware.rcp import build_rcp_firmware, create_fallback_rcp_files
+        from esp_br_setup_root.esp_thread_setup.firmware.br import setup_border_router
+        from esp_br_setup_root.esp_thread_setup.firmware.cli import build_and_flash_cli
+        from esp_br_setup_root.esp_thread_setup.network.dataset import create_dataset, load_saved_dataset
+        from esp_br_setup_root.esp_thread_setup.network.cli_config import configure_cli
+        from esp_br_setup_root.esp_thread_setup.network.benchmark import run_link_benchmark, benchmark_settings
+        from esp_br_setup_root.esp_thread_setup.web.gui import setup_web_gui
+        from esp_br_setup_root.esp_thread_setup.utils.ports import check_port
+        from esp_br_setup_root.esp_thread_setup.repositories.manifest import load_repository_manifest
+        from esp_br_setup_root.esp_thread_setup.setup.environment import probe_environment
+        from esp_br_setup_root.esp_thread_setup.setup.journal import (
+            load_journal, reset_journal, run_checkpointed, files_fingerprint, project_fingerprint,
+            firmware_fingerprint, dataset_id
+        )
+        from esp_br_setup_root.esp_thread_setup.setup.timings import describe_estimate
+        from esp_thread_setup.config.constants import ESP_IDF_PATH, ESP_THREAD_BR_PATH
+        from esp_thread_setup.config.answers import ask_yes_no, get_answer, pause
 
         # Check prerequisites
         prereq_success, self.skip_repositories = check_prerequisites()
         if not prereq_success:
             return False
 
+        # Steps that completed in an earlier run with unchanged inputs are skipped
+        journal = load_journal() if self.resume else reset_journal()
+        estimate = describe_estimate([step for step in RUN_ALL_STEPS
+                                      if journal["steps"].get(step, {}).get("status") != "completed"])
+        if estimate:
+            print_info(f"Predicted time for this run: {estimate}")
+        after = lambda step: RUN_ALL_STEPS[RUN_ALL_STEPS.index(step) + 1:]
+        environment = probe_environment() or {}
+        idf = {"idf_path": environment.get("idf_path"), "version": environment.get("version")}
+        rcp_dir = os.path.join(ESP_IDF_PATH, "examples/openthread/ot_rcp")
+        br_dir = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router")
+        cli_dir = os.path.join(ESP_IDF_PATH, "examples/openthread/ot_cli")
+
         # Download repositories if needed
-        if not download_repositories(self.skip_repositories):
+        def repositories_step():
+            if not download_repositories(self.skip_repositories):
+                return False, {}
+            # The archive manifest or git HEAD changes whenever a tree is updated
+            return True, {r["name"]: files_fingerprint([os.path.join(r["path"], ".archive_manifest.json"),
+                                                         os.path.join(r["path"], ".git", "HEAD")])
+                          for r in load_repository_manifest()}
+        success, repositories = run_checkpointed(
+            journal, "repositories", {"manifest": load_repository_manifest(), "skip": self.skip_repositories},
+            repositories_step, lambda outputs: all(os.path.exists(r["path"]) for r in load_repository_manifest()),
+            upcoming=after("repositories"))
+        if not success:
             return False
 
         # Build RCP firmware
-        if not build_rcp_firmware():
+        def rcp_step():
+            return build_rcp_firmware(), {"firmware": firmware_fingerprint(os.path.join(rcp_dir, "build"))}
+        success, rcp = run_checkpointed(
+            journal, "rcp", {"idf": idf, "project": project_fingerprint(rcp_dir)}, rcp_step,
+            lambda outputs: outputs["firmware"] == firmware_fingerprint(os.path.join(rcp_dir, "build")),
+            upcoming=after("rcp"))
+        if not success:
             # Try fallback mechanism
             create_fallback_rcp_files()
 
+        # Reuse a previously created dataset so it can be baked into the NVS images. A
+        # dataset the "dataset" step of this run created is already active on the
+        # Border Router; the boards flashed before it keep the dataset they were
+        # checkpointed with, or a resume would rebuild and reflash both.
+        saved_dataset = load_saved_dataset()
+        created = journal["steps"].get("dataset", {})
+        run_created = not self.dataset and created.get("status") == "completed" \
+            and created["outputs"].get("dataset") == dataset_id(saved_dataset)
+        self.dataset = self.dataset or (None if run_created else saved_dataset)
+
+        def baked_dataset_id(step_id):
+            if run_created:
+                return journal["steps"].get(step_id, {}).get("outputs", {}).get("dataset")
+            return dataset_id(self.dataset)
+        border_router_dataset, cli_dataset = baked_dataset_id("border_router"), baked_dataset_id("cli")
+
         # Setup Border Router
-        success, self.border_router_port = setup_border_router()
+        def border_router_step():
+            success, self.border_router_port = setup_border_router(self.dataset)
+            return success, {"port": self.border_router_port, "dataset": border_router_dataset,
+                             "firmware": firmware_fingerprint(os.path.join(br_dir, "build"))}
+        success, border_router = run_checkpointed(
+            journal, "border_router",
+            {"idf": idf, "repositories": repositories, "rcp": rcp, "project": project_fingerprint(br_dir),
+             "dataset": border_router_dataset, "wifi_ssid": get_answer("wifi_ssid")},
+            border_router_step, lambda outputs: check_port(outputs["port"]), upcoming=after("border_router"))
         if not success:
             return False
+        self.border_router_port = border_router["port"]
 
         # Setup CLI
-        success, self.cli_port = build_and_flash_cli()
+        def cli_step():
+            success, self.cli_port = build_and_flash_cli(self.dataset)
+            return success, {"port": self.cli_port, "dataset": cli_dataset,
+                             "firmware": firmware_fingerprint(os.path.join(cli_dir, "build"))}
+        success, cli = run_checkpointed(
+            journal, "cli", {"idf": idf, "project": project_fingerprint(cli_dir), "dataset": cli_dataset},
+            cli_step, lambda outputs: check_port(outputs["port"]), upcoming=after("cli"))
         if not success:
             return False
-
-        print("\n=== Preparing for Network Configuration ===")
-        print("For the next steps, you'll need BOTH devices connected to your computer simultaneously.")
-        print("This is necessary to create the Thread network and configure the devices to communicate.")
-        input("Press Enter when you're ready to continue...")
+        self.cli_port = cli["port"]
 
         # Create dataset
-        success, self.dataset, self.border_router_port = create_dataset(self.border_router_port)
+        def dataset_step():
+            print_note("\n=== Preparing for Network Configuration ===")
+            print_note("For the next steps, you'll need BOTH devices connected to your computer simultaneously.")
+            print_note("This is necessary to create the Thread network and configure the devices to communicate.")
+            pause("Press Enter when you're ready to continue...")
+
+            success, self.dataset, self.border_router_port = create_dataset(self.border_router_port)
+            return success, {"port": self.border_router_port, "dataset": dataset_id(self.dataset)}
+        success, network = run_checkpointed(
+            journal, "dataset", {"border_router": border_router}, dataset_step,
+            lambda outputs: outputs["dataset"] == dataset_id(load_saved_dataset()), upcoming=after("dataset"))
         if not success:
             return False
+        self.border_router_port = network["port"]
+        self.dataset = self.dataset if dataset_id(self.dataset) == network["dataset"] else load_saved_dataset()
 
         # Configure CLI
-        if not configure_cli(self.cli_port, self.dataset):
+        success, _ = run_checkpointed(
+            journal, "cli_join", {"cli": cli, "dataset": network["dataset"]},
+            lambda: (configure_cli(self.cli_port, self.dataset), {}), upcoming=after("cli_join"))
+        if not success:
             return False
 
         # Setup Web GUI
-        setup_web_gui(self.border_router_port)
+        run_checkpointed(journal, "web_gui", {"border_router": border_router, "dataset": network["dataset"]},
+                         lambda: (setup_web_gui(self.border_router_port), {}))
 
-        print("\n=== Setup Complete! ===")
-        print("Your OpenThread Border Router system is now set up and running.")
+        print_note("\n=== Setup Complete! ===")
+        print_note("Your OpenThread Border Router system is now set up and running.")
 
         # --- Verification ---
-        print("\n=== Verifying Setup ===")
-        print("Performing basic verification checks...")
+        print_note("\n=== Verifying Setup ===")
+        print_note("Performing basic verification checks...")
 
         # 1. Check if ports are valid
         if not check_port(self.border_router_port):
-            print("ERROR: Border Router port is not valid.")
+            print_error("ERROR: Border Router port is not valid.")
             return False
-        print("✓ Border Router port verified.")
+        print_note("✓ Border Router port verified.")
 
         if not check_port(self.cli_port):
-            print("ERROR: CLI port is not valid.")
+            print_error("ERROR: CLI port is not valid.")
             return False
-        print("✓ CLI port verified.")
+        print_note("✓ CLI port verified.")
 
         # 2. Check for dataset file
-        import os
-        from esp_thread_setup.config.constants import ESP_THREAD_BR_PATH
         dataset_file = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router/thread_dataset.txt")
         if not os.path.exists(dataset_file):
-            print("ERROR: Thread dataset file not found.")
+            print_error("ERROR: Thread dataset file not found.")
             return False
-        print("✓ Thread dataset file found.")
+        print_note("✓ Thread dataset file found.")
+
+        print_note(f"\nBorder Router (ESP32S3 with RCP) on {self.border_router_port}")
+        print_note(f"CLI (ESP32C6) on {self.cli_port}")
+        print_note("Thread Network Dataset has been saved to thread_dataset.txt")
 
-        print("\nBorder Router (ESP32S3 with RCP) on", self.border_router_port)
-        print("CLI (ESP32C6) on", self.cli_port)
-        print("Thread Network Dataset has been saved to thread_dataset.txt")
+        # 3. Measure the link between the two devices
+        if ask_yes_no("benchmark", "\nDo you want to benchmark the Thread link between the CLI and the Border Router? (y/n): ", default=False):
+            run_link_benchmark(self.cli_port, self.border_router_port, *benchmark_settings())
 
-        print("\nTo further verify the Thread network:")
-        print("1. Use the Web GUI (if enabled and IP is accessible) to check the status of the Thread network and connected devices.")
-        print("2. Open the CLI console and use Thread CLI commands (e.g., `state`, `ping`) to verify communication within the Thread network.")
+        print_note("\nTo further verify the Thread network:")
+        print_note("1. Use the Web GUI (if enabled and IP is accessible) to check the status of the Thread network and connected devices.")
+        print_note("2. Open the CLI console and use Thread CLI commands (e.g., `state`, `ping`) to verify communication within the Thread network.")
 
-        print("\nYou now have a working Thread network with:")
-        print("1. A Border Router that connects your Thread network to your WiFi network")
-        print("2. A CLI device that can communicate over the Thread network")
-        print("\nYou can use this setup as a self-made Thread dongle for your projects.")
+        print_note("\nYou now have a working Thread network with:")
+        print_note("1. A Border Router that connects your Thread network to your WiFi network")
+        print_note("2. A CLI device that can communicate over the Thread network")
+        print_note("\nYou can use this setup as a self-made Thread dongle for your projects.")
 
         return True
 
     def execute(self):
         """Main execution function"""
-        print("=== ESP Thread Border Router Setup ===")
-        print("\nThis script will guide you through setting up an OpenThread Border Router using ESP devices.")
-        print("\nIMPORTANT: For some steps, you'll need to connect BOTH devices to your computer.")
-        print("This is necessary for creating the Thread network and configuring the devices to communicate.")
+        print_note("=== ESP Thread Border Router Setup ===")
+        print_note("\nThis script will guide you through setting up an OpenThread Border Router using ESP devices.")
+        print_note("\nIMPORTANT: For some steps, you'll need to connect BOTH devices to your computer.")
+        print_note("This is necessary for creating the Thread network and configuring the devices to communicate.")
         
-        print("\n=== Software Components ===")
-        print("- Border Router: esp-thread-br/examples/basic_thread_border_router")
-        print("- RCP: $IDF_PATH/examples/openthread/ot_rcp")
-        print("- CLI: $IDF_PATH/examples/openthread/ot_cli")
+        print_note("\n=== Software Components ===")
+        print_note("- Border Router: esp-thread-br/examples/basic_thread_border_router")
+        print_note("- RCP: $IDF_PATH/examples/openthread/ot_rcp")
+        print_note("- CLI: $IDF_PATH/examples/openthread/ot_cli")
+
+        # An unattended run fails now rather than after the boards were built and flashed
+        from esp_thread_setup.config.answers import ask, get_answer, is_non_interactive, NonInteractiveError
+        if is_non_interactive():
+            problems = missing_answers(planned_steps())
+            if problems:
+                raise NonInteractiveError("; ".join(problems))
 
         # Check prerequisites
+        from esp_br_setup_root.esp_thread_setup.setup.prerequisites import check_prerequisites
         prereq_success, self.skip_repositories = check_prerequisites()
         if not prereq_success:
             return False
 
         # Show interactive menu to let user choose which steps to perform
-        mode = input("\nDo you want to run all steps automatically (a) or select specific steps to perform (s)? (a/s): ")
-        if mode.lower() == 's':
-            self.show_steps_menu()
+        mode = ask("mode", "\nDo you want to run all steps automatically (a) or select specific steps to perform (s)? (a/s): ", default="a")
+        if mode.lower() in ('s', 'steps'):
+            if get_answer("steps"):
+                self.run_selected_steps(get_answer("steps"))
+            elif is_non_interactive():
+                raise NonInteractiveError("Mode 'steps' needs the list of steps to run (set 'steps' or use --steps)")
+            else:
+                self.show_steps_menu()
         else:
-            self.run_all_steps()
+            return self.run_all_steps()
 
         return True
 
 
-if __name__ == "__main__":
+def parse_steps(steps):
+    """Menu step numbers from a run config list or a comma separated string"""
+    if isinstance(steps, str):
+        steps = [step for step in steps.replace(" ", "").split(",") if step]
+    return [str(step) for step in steps]
+
+def planned_steps():
+    """Step IDs a non-interactive run will execute, from the 'mode' and 'steps' answers"""
+    from esp_thread_setup.config.answers import get_answer
+
+    if str(get_answer("mode", "a")).lower() not in ('s', 'steps'):
+        return list(RUN_ALL_STEPS)
+    step_ids = []
+    for step in parse_steps(get_answer("steps") or []):
+        step_ids.extend(RUN_ALL_STEPS if step == '8' else [STEP_IDS.get(step, step)])
+    return step_ids
+
+def missing_answers(step_ids):
+    """Problems with the answers that step_ids need when nobody can be asked"""
+    from esp_thread_setup.config.answers import get_answer, get_yes_no, read_dataset_answer
+
+    problems = [f"invalid step in run config: {step}" for step in step_ids
+                if step not in STEP_IDS.values()]
+    if str(get_answer("mode", "a")).lower() in ('s', 'steps') and not step_ids:
+        problems.append("mode 'steps' needs the list of steps to run (set 'steps' or use --steps)")
+    if {"border_router", "web_gui"} & set(step_ids) and get_answer("wifi_ssid") \
+            and get_answer("wifi_password") is None:
+        problems.append("'wifi_ssid' is set without 'wifi_password'")
+    # The manual fallbacks need someone at the device console
+    if "dataset" in step_ids and not read_dataset_answer() and not get_yes_no("auto_dataset", True):
+        problems.append("'auto_dataset' is off and no 'dataset' is set, creating the dataset needs the console")
+    if "cli_join" in step_ids and not get_yes_no("auto_join", True):
+        problems.append("'auto_join' is off, joining the CLI by hand needs the console")
+    return problems
+
+def build_answers(args):
+    """Merge the run config file with the answers given as command line flags (flags win)"""
+    from esp_thread_setup.config.answers import load_run_config, ANSWER_KEYS
+
+    answers = load_run_config(args.config) if args.config else {}
+    non_interactive = args.non_interactive or bool(answers.pop("non_interactive", False))
+    flags = {
+        "mode": args.mode,
+        "steps": args.steps,
+        "border_router_port": args.border_router_port,
+        "cli_port": args.cli_port,
+        "wifi_ssid": args.wifi_ssid,
+        "wifi_password": args.wifi_password,
+        "dataset": args.dataset,
+        "skip_repositories": args.skip_repositories,
+        "redownload_repositories": args.redownload_repositories,
+    }
+    answers.update({key: value for key, value in flags.items() if value is not None})
+    for assignment in args.set:
+        key, separator, value = assignment.partition("=")
+        if not separator:
+            raise ValueError(f"--set expects KEY=VALUE, got '{assignment}'")
+        if key.strip() not in ANSWER_KEYS:
+            raise ValueError(f"unknown answer key '{key.strip()}'")
+        answers[key.strip()] = value
+    return answers, non_interactive
+
+def main(argv=None):
+    """Command line entry point: run the interactive setup or a bundle command"""
+    from esp_thread_setup.config.answers import ANSWER_KEYS
+    answer_help = "\n".join(f"  {key:<24} {description}" for key, description in ANSWER_KEYS.items())
+    parser = argparse.ArgumentParser(prog="esp-thread-setup", description="Set up an ESP Thread Border Router and CLI device",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=f"run config / --set keys:\n{answer_help}")
+    parser.add_argument("--config", help="JSON run config answering the setup questions")
+    parser.add_argument("--non-interactive", action="store_true", help="Fail instead of prompting when an answer is missing")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Answer one setup question")
+    parser.add_argument("--mode", choices=["all", "steps"], help="Run all steps or only those given with --steps")
+    parser.add_argument("--steps", help="Comma separated menu step numbers to run, e.g. 1,3,4")
+    parser.add_argument("--border-router-port", help="Serial port of the Border Router")
+    parser.add_argument("--cli-port", help="Serial port of the CLI device")
+    parser.add_argument("--wifi-ssid", help="Wi-Fi SSID for the Border Router")
+    parser.add_argument("--wifi-password", help="Wi-Fi password for the Border Router")
+    parser.add_argument("--dataset", help="Thread dataset (hex TLVs or a file) instead of creating one")
+    parser.add_argument("--skip-repositories", action="store_const", const=True, help="Use existing repositories")
+    parser.add_argument("--redownload-repositories", action="store_const", const=True, help="Re-download existing repositories")
+    parser.add_argument("--restart", action="store_true", help="Run every step again instead of resuming the last run")
+    parser.add_argument("--output", choices=["pretty", "json", "quiet"],
+                        help="Console output: colored text, JSON lines or only warnings and errors")
+    parser.add_argument("--event-log", metavar="FILE", help="Also append every status event to FILE as JSON lines")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="Write Prometheus metrics to FILE (a node-exporter textfile, *.prom) when the run ends")
+    subparsers = parser.add_subparsers(dest="command")
+    export_parser = subparsers.add_parser("export-bundle", help="Pack repositories, firmware and caches for offline provisioning")
+    export_parser.add_argument("bundle", help="Bundle file to write (.tar.gz)")
+    import_parser = subparsers.add_parser("import-bundle", help="Verify and unpack an offline provisioning bundle")
+    import_parser.add_argument("bundle", help="Bundle file to read (.tar.gz)")
+    from esp_thread_setup.network.generator import add_arguments as add_generator_arguments
+    generate_parser = subparsers.add_parser("generate-datasets",
+                                            help="Generate unique Thread datasets and manifests for a fleet of devices")
+    add_generator_arguments(generate_parser)
+    daemon_parser = subparsers.add_parser("daemon", help="Serve provisioning jobs over a local HTTP/JSON API")
+    daemon_parser.add_argument("--host", help="Address to listen on (default: loopback only)")
+    daemon_parser.add_argument("--port", type=int, help="TCP port to listen on")
+    daemon_parser.add_argument("--workers", type=int, help="Jobs to run at the same time")
+    simulate_parser = subparsers.add_parser("simulate", help="Run simulated OpenThread CLI boards on pseudo-terminals")
+    simulate_parser.add_argument("--devices", default="border_router,cli",
+                                 help="Comma separated names of the simulated boards (default: border_router,cli)")
+    simulate_parser.add_argument("--latency", type=float, help="Seconds before each command is answered")
+    simulate_parser.add_argument("--jitter", type=float, help="Random extra latency, up to this many seconds")
+    simulate_parser.add_argument("--error-rate", type=float, help="Probability that a command fails")
+    simulate_parser.add_argument("--drop-rate", type=float, help="Probability that a command is not answered")
+    simulate_parser.add_argument("--ping-rtt", type=float, help="Median ping round trip in milliseconds")
+    simulate_parser.add_argument("--ping-loss", type=float, help="Probability that a ping reply is lost")
+    simulate_parser.add_argument("--attach-time", type=float, help="Seconds from 'thread start' until a board is attached")
+    simulate_parser.add_argument("--time-scale", type=float, help="Factor for scan, ping and attach times")
+    args = parser.parse_args(argv)
+
+    from esp_thread_setup.config.constants import OUTPUT_FORMAT, EVENT_LOG_FILE
+    from esp_thread_setup.utils.events import configure_output
+    configure_output(args.output or OUTPUT_FORMAT, args.event_log or EVENT_LOG_FILE)
+
+    from esp_thread_setup.config.constants import METRICS_TEXTFILE
+    from esp_thread_setup.utils.metrics import write_textfile
+    if args.metrics_file or METRICS_TEXTFILE:
+        atexit.register(write_textfile, args.metrics_file or METRICS_TEXTFILE)
+
+    if args.command == "export-bundle":
+        from esp_br_setup_root.esp_thread_setup.repositories.bundle import export_bundle
+        sys.exit(0 if export_bundle(args.bundle) else 1)
+    if args.command == "import-bundle":
+        from esp_br_setup_root.esp_thread_setup.repositories.bundle import import_bundle
+        sys.exit(0 if import_bundle(args.bundle) else 1)
+    if args.command == "generate-datasets":
+        from esp_thread_setup.network.generator import run_generator
+        sys.exit(run_generator(args))
+    if args.command == "daemon":
+        from esp_thread_setup.config.constants import DAEMON_HOST, DAEMON_PORT, DAEMON_WORKERS
+        from esp_thread_setup.service.daemon import serve_daemon
+        sys.exit(0 if serve_daemon(args.host or DAEMON_HOST, args.port or DAEMON_PORT,
+                                   args.workers or DAEMON_WORKERS, args.metrics_file or METRICS_TEXTFILE) else 1)
+    if args.command == "simulate":
+        from esp_thread_setup.simulator.otcli import run_simulator
+        options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                   "drop_rate": args.drop_rate, "ping_rtt_ms": args.ping_rtt, "ping_loss": args.ping_loss,
+                   "attach_time": args.attach_time, "time_scale": args.time_scale}
+        names = [name.strip() for name in args.devices.split(",") if name.strip()]
+        sys.exit(0 if run_simulator(names, {key: value for key, value in options.items() if value is not None}) else 1)
+
+    from esp_thread_setup.config.answers import configure_answers, NonInteractiveError
+    try:
+        answers, non_interactive = build_answers(args)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid run config: {e}")
+    configure_answers(answers, non_interactive)
+
     setup = ESPThreadSetup()
+    setup.resume = not args.restart
 
     try:
-        setup.execute()
+        success = setup.execute()
     except KeyboardInterrupt:
-        print("\nSetup interrupted by user. Exiting...")
+        print_note("\nSetup interrupted by user. Exiting...")
         sys.exit(1)
+    except NonInteractiveError as e:
+        print_error(f"ERROR: {e}")
+        sys.exit(2)
     except Exception as e:
         print_error(f"Error occurred during setup: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
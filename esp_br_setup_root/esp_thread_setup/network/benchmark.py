@@ -0,0 +1,182 @@
+﻿#!/usr/bin/env python3
+"""
+Benchmark the Thread link between the CLI device and the Border Router.
+"""
+import os
+import re
+import json
+import time
+from esp_thread_setup.config.constants import BENCHMARK_DIR
+from esp_thread_setup.config.answers import get_answer
+from esp_thread_setup.network.scan import NOISE_FLOOR_DBM
+from esp_thread_setup.utils.console import open_console, run_cli_command, parse_table, ConsoleError
+from esp_thread_setup.utils.logs import print_success, print_error, print_warning, print_info, print_note
+
+DEFAULT_PAYLOAD_SIZES = (16, 64, 256)
+DEFAULT_PING_COUNT = 20
+DEFAULT_PING_INTERVAL = 0.2
+
+# A run regresses when its median latency grows by more than this factor over the previous run
+LATENCY_REGRESSION_FACTOR = 1.2
+
+PING_REPLY = re.compile(r"icmp_seq=(\d+).*time=(\d+(?:\.\d+)?)ms")
+PING_SUMMARY = re.compile(r"(\d+) packets transmitted, (\d+) packets received")
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    # ceil(pct / 100 * n) in integers; floats overshoot, e.g. 0.07 * 100 > 7
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def get_mesh_local_eid(border_router_port):
+    """Read the Border Router's mesh-local EID from its console"""
+    console = open_console(border_router_port)
+    try:
+        lines = run_cli_command(console, "ipaddr mleid")
+    finally:
+        console.close()
+    if not lines:
+        raise ConsoleError("Border Router did not report a mesh-local address")
+    return lines[0]
+
+def ping(console, address, payload_size, count, interval):
+    """Ping an address from the console and return (rtts_ms, transmitted, received)"""
+    timeout = count * (interval + 1) + 10
+    lines = run_cli_command(console, f"ping {address} {payload_size} {count} {interval}", timeout=timeout)
+
+    rtts = []
+    transmitted, received = count, 0
+    for line in lines:
+        reply = PING_REPLY.search(line)
+        if reply:
+            rtts.append(float(reply.group(2)))
+        summary = PING_SUMMARY.search(line)
+        if summary:
+            transmitted, received = int(summary.group(1)), int(summary.group(2))
+    if not any(PING_SUMMARY.search(line) for line in lines):
+        received = len(rtts)
+    return rtts, transmitted, received
+
+def read_neighbor_link(console):
+    """Return RSSI and link margin of every neighbor from `neighbor table`"""
+    neighbors = []
+    for row in parse_table(run_cli_command(console, "neighbor table")):
+        avg_rssi = int(row["Avg RSSI"])
+        neighbors.append({
+            "role": row.get("Role", ""),
+            "rloc16": row.get("RLOC16", ""),
+            "ext_mac": row.get("Extended MAC", ""),
+            "avg_rssi": avg_rssi,
+            "last_rssi": int(row["Last RSSI"]),
+            "link_margin": avg_rssi - NOISE_FLOOR_DBM,
+        })
+    return neighbors
+
+def load_previous_result(benchmark_dir=BENCHMARK_DIR):
+    """Return the most recent stored benchmark result, or None"""
+    if not os.path.isdir(benchmark_dir):
+        return None
+    results = sorted(f for f in os.listdir(benchmark_dir) if f.endswith(".json"))
+    if not results:
+        return None
+    with open(os.path.join(benchmark_dir, results[-1]), "r") as f:
+        return json.load(f)
+
+def find_regressions(result, previous):
+    """Compare two benchmark results and describe every payload size that got worse"""
+    regressions = []
+    previous_runs = {run["payload_size"]: run for run in previous["runs"]}
+    for run in result["runs"]:
+        before = previous_runs.get(run["payload_size"])
+        if not before:
+            continue
+        if before["p50_ms"] and run["p50_ms"] and run["p50_ms"] > before["p50_ms"] * LATENCY_REGRESSION_FACTOR:
+            regressions.append(f"{run['payload_size']} B: median latency {before['p50_ms']} ms -> {run['p50_ms']} ms")
+        if run["loss_pct"] > before["loss_pct"]:
+            regressions.append(f"{run['payload_size']} B: packet loss {before['loss_pct']}% -> {run['loss_pct']}%")
+    return regressions
+
+def benchmark_settings():
+    """(payload_sizes, count, interval) from the run config answers, with the defaults for unset ones"""
+    payload_sizes = get_answer("benchmark_payload_sizes") or DEFAULT_PAYLOAD_SIZES
+    if isinstance(payload_sizes, str):
+        payload_sizes = [size for size in payload_sizes.split(",") if size.strip()]
+    payload_sizes = tuple(int(size) for size in payload_sizes)
+    count = int(get_answer("benchmark_count") or DEFAULT_PING_COUNT)
+    interval = float(get_answer("benchmark_interval") or DEFAULT_PING_INTERVAL)
+    if not payload_sizes or min(payload_sizes) < 0 or count < 1 or interval < 0:
+        raise ValueError("benchmark payload sizes, count and interval must be positive")
+    return payload_sizes, count, interval
+
+def run_link_benchmark(cli_port, border_router_port, payload_sizes=DEFAULT_PAYLOAD_SIZES,
+                       count=DEFAULT_PING_COUNT, interval=DEFAULT_PING_INTERVAL):
+    """Ping the Border Router from the CLI device, report and store latency, loss and link quality"""
+    print_info("\n=== Benchmarking Thread Link (CLI -> Border Router) ===")
+    try:
+        address = get_mesh_local_eid(border_router_port)
+        print_note(f"Border Router mesh-local EID: {address}")
+
+        console = open_console(cli_port)
+        try:
+            runs = []
+            for payload_size in payload_sizes:
+                print_note(f"Pinging with {payload_size} byte payload ({count} packets, {interval}s interval)...")
+                rtts, transmitted, received = ping(console, address, payload_size, count, interval)
+                runs.append({
+                    "payload_size": payload_size,
+                    "transmitted": transmitted,
+                    "received": received,
+                    "loss_pct": round(100.0 * (transmitted - received) / transmitted, 1) if transmitted else 100.0,
+                    "p50_ms": percentile(rtts, 50),
+                    "p90_ms": percentile(rtts, 90),
+                    "p99_ms": percentile(rtts, 99),
+                    "max_ms": max(rtts) if rtts else None,
+                })
+            neighbors = read_neighbor_link(console)
+        finally:
+            console.close()
+    except ConsoleError as e:
+        print_error(f"ERROR: Benchmark failed: {e}")
+        return None
+    except Exception as e:
+        print_error(f"Error opening device console: {e}")
+        return None
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cli_port": cli_port,
+        "border_router_port": border_router_port,
+        "border_router_address": address,
+        "count": count,
+        "interval": interval,
+        "runs": runs,
+        "neighbors": neighbors,
+    }
+
+    print_info("\n=== Benchmark Results ===")
+    for run in runs:
+        print_note(f"{run['payload_size']:>5} B: p50 {run['p50_ms']} ms, p90 {run['p90_ms']} ms, "
+              f"p99 {run['p99_ms']} ms, loss {run['loss_pct']}%")
+    for neighbor in neighbors:
+        print_note(f"Neighbor {neighbor['rloc16']} ({neighbor['role']}): avg RSSI {neighbor['avg_rssi']} dBm, "
+              f"last RSSI {neighbor['last_rssi']} dBm, link margin {neighbor['link_margin']} dB")
+
+    previous = load_previous_result()
+    if previous:
+        regressions = find_regressions(result, previous)
+        if regressions:
+            print_warning(f"Regressions since the run of {previous['timestamp']}:")
+            for regression in regressions:
+                print_note(f"   {regression}")
+        else:
+            print_success(f"✓ No regressions since the run of {previous['timestamp']}")
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    result_path = os.path.join(BENCHMARK_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=2)
+    print_success(f"✓ Benchmark results saved to {result_path}")
+    return result
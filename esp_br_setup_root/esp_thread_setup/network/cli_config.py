@@ -4,24 +4,31 @@
 Configure the CLI device to join the Thread network.
 """
 import os
+import time
 import subprocess
 from esp_thread_setup.config.constants import ESP_IDF_PATH, ESP_THREAD_BR_PATH
+from esp_thread_setup.config.answers import ask_yes_no, pause, read_dataset_answer
 from esp_thread_setup.utils.ports import check_port
-from esp_thread_setup.network.dataset import parse_dataset
+from esp_thread_setup.utils.logs import print_success, print_error, print_info, print_warning, print_note
+from esp_thread_setup.network.dataset import parse_dataset, dataset_to_tlvs
+from esp_thread_setup.utils.metrics import record_join
+
+# Device roles that mean the CLI is attached to the Thread network
+JOINED_STATES = ("child", "router", "leader")
 
 def configure_cli(cli_port, dataset=None):
     """Configure the CLI device with the network dataset"""
-    print("\n=== Configuring OpenThread CLI to Join Network ===")
-    print("\n⚠️ IMPORTANT: Both devices should still be connected to your computer.")
-    print("We'll now configure the CLI device to join the Thread network created by the Border Router.")
+    print_note("\n=== Configuring OpenThread CLI to Join Network ===")
+    print_note("\n⚠️ IMPORTANT: Both devices should still be connected to your computer.")
+    print_note("We'll now configure the CLI device to join the Thread network created by the Border Router.")
     
     # Verify CLI device is connected
     if not check_port(cli_port):
-        print("CLI device not found at previous port. Let's detect it again.")
+        print_note("CLI device not found at previous port. Let's detect it again.")
         from esp_thread_setup.utils.ports import find_device_port
-        cli_port = find_device_port("ESP32C6 CLI")
+        cli_port = find_device_port("ESP32C6 CLI", "cli_port")
         if not cli_port:
-            print("ERROR: CLI device not found. Please reconnect and try again.")
+            print_error("ERROR: CLI device not found. Please reconnect and try again.")
             return False
 
     # Change to the CLI example directory in ESP-IDF
@@ -29,78 +36,122 @@ def configure_cli(cli_port, dataset=None):
     os.chdir(cli_example_dir)
 
     # Check if we have a dataset
+    dataset = dataset or read_dataset_answer()
     if not dataset:
         dataset_file = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router/thread_dataset.txt")
         if os.path.exists(dataset_file):
             with open(dataset_file, "r") as f:
                 dataset = f.read()
-            print("Loaded dataset from file.")
+            print_note("Loaded dataset from file.")
         else:
-            print("ERROR: No dataset available. Please run the 'Create Thread network dataset' step first.")
+            print_error("ERROR: No dataset available. Please run the 'Create Thread network dataset' step first.")
             return False
 
+    if ask_yes_no("auto_join", "\nJoin the CLI to the Thread network automatically over the serial console? (y/n): ", default=True):
+        if configure_cli_over_console(cli_port, dataset):
+            print_note("✓ OpenThread CLI configured successfully")
+            return True
+        print_warning("Automatic configuration failed. Falling back to the manual console steps.")
+
     # Parse the dataset
     dataset_params = parse_dataset(dataset)
     
-    print("\n=== CLI Console Instructions ===")
-    print("After the console opens, we'll try THREE different methods to set the dataset.")
-    print("If one method fails, try the next one.")
+    print_note("\n=== CLI Console Instructions ===")
+    print_note("After the console opens, we'll try THREE different methods to set the dataset.")
+    print_note("If one method fails, try the next one.")
     
-    print("\nMETHOD 1: Use individual commands to set each parameter")
-    print("Run these commands one by one:")
-    print(f"   dataset networkname {dataset_params['network_name']}")
-    print(f"   dataset extpanid {dataset_params['ext_pan_id']}")
-    print(f"   dataset panid {dataset_params['pan_id']}")
-    print(f"   dataset networkkey {dataset_params['network_key']}")
-    print(f"   dataset channel {dataset_params['channel']}")
+    print_note("\nMETHOD 1: Use individual commands to set each parameter")
+    print_note("Run these commands one by one:")
+    print_note(f"   dataset networkname {dataset_params['network_name']}")
+    print_note(f"   dataset extpanid {dataset_params['ext_pan_id']}")
+    print_note(f"   dataset panid {dataset_params['pan_id']}")
+    print_note(f"   dataset networkkey {dataset_params['network_key']}")
+    print_note(f"   dataset channel {dataset_params['channel']}")
     if dataset_params['mesh_local_prefix']:
-        print(f"   dataset meshlocalprefix {dataset_params['mesh_local_prefix']}")
-    print("   dataset commit active")
+        print_note(f"   dataset meshlocalprefix {dataset_params['mesh_local_prefix']}")
+    print_note("   dataset commit active")
     
-    print("\nMETHOD 2: Use the multi-line dataset input")
-    print("Run this command:")
-    print("   dataset set active -")
-    print("Then paste each line of the dataset (exactly as shown below) and press Enter after each line:")
+    print_note("\nMETHOD 2: Use the multi-line dataset input")
+    print_note("Run this command:")
+    print_note("   dataset set active -")
+    print_note("Then paste each line of the dataset (exactly as shown below) and press Enter after each line:")
     for line in dataset_params['dataset_lines']:
         if ":" in line:
-            print(f"   {line}")
-    print("   (press Enter on an empty line to finish)")
+            print_note(f"   {line}")
+    print_note("   (press Enter on an empty line to finish)")
     
-    print("\nMETHOD 3: Try to use a hex string")
-    print("Run this command:")
-    print("   dataset tlvs active")
-    print("Copy the hex string output, then try:")
-    print("   dataset set active [paste-hex-string-here]")
+    print_note("\nMETHOD 3: Try to use a hex string")
+    print_note("Run this command:")
+    print_note("   dataset tlvs active")
+    print_note("Copy the hex string output, then try:")
+    print_note("   dataset set active [paste-hex-string-here]")
     
-    print("\nAfter successfully setting the dataset with ANY method, run:")
-    print("   ifconfig up")
-    print("   thread start")
+    print_note("\nAfter successfully setting the dataset with ANY method, run:")
+    print_note("   ifconfig up")
+    print_note("   thread start")
     
-    print("\nYou should see messages indicating the device is joining the Thread network.")
-    print("Press Ctrl+] to exit the console when done")
+    print_note("\nYou should see messages indicating the device is joining the Thread network.")
+    print_note("Press Ctrl+] to exit the console when done")
 
-    input("\nPress Enter to open the CLI console...")
+    pause("\nPress Enter to open the CLI console...", needs_human=True)
 
     # Open CLI console
     subprocess.run(["idf.py", "-p", cli_port, "monitor"], check=False)
 
-    response = input("\nDid the CLI successfully join the Thread network? (y/n): ")
-    if response.lower() != 'y':
-        print("\nTroubleshooting tips:")
-        print("1. Make sure both devices are powered on and properly connected")
-        print("2. Try resetting both devices and running the commands again")
-        print("3. Try getting the active dataset from the Border Router in hex format:")
-        print("   a. Connect to the Border Router console")
-        print("   b. Run: 'dataset tlvs active'")
-        print("   c. Copy the hex string output")
-        print("   d. Connect to the CLI console")
-        print("   e. Run: 'dataset set active [paste-hex-string-here]'")
-        print("4. Check that the Border Router is functioning properly")
+    if not ask_yes_no(None, "\nDid the CLI successfully join the Thread network? (y/n): "):
+        print_note("\nTroubleshooting tips:")
+        print_note("1. Make sure both devices are powered on and properly connected")
+        print_note("2. Try resetting both devices and running the commands again")
+        print_note("3. Try getting the active dataset from the Border Router in hex format:")
+        print_note("   a. Connect to the Border Router console")
+        print_note("   b. Run: 'dataset tlvs active'")
+        print_note("   c. Copy the hex string output")
+        print_note("   d. Connect to the CLI console")
+        print_note("   e. Run: 'dataset set active [paste-hex-string-here]'")
+        print_note("4. Check that the Border Router is functioning properly")
         
-        retry = input("\nWould you like to try configuring the CLI again? (y/n): ")
-        if retry.lower() == 'y':
+        if ask_yes_no(None, "\nWould you like to try configuring the CLI again? (y/n): ", default=False):
             return configure_cli(cli_port, dataset)
         return False
 
-    print("✓ OpenThread CLI configured successfully")
-    return True
\ No newline at end of file
+    print_note("✓ OpenThread CLI configured successfully")
+    return True
+
+def configure_cli_over_console(cli_port, dataset, join_timeout=60.0, console=None):
+    """Commit the dataset on the CLI over its serial console and wait until it has joined
+
+    An already open console is used as is and left open.
+    """
+    from esp_thread_setup.utils.console import open_console, run_cli_command, ConsoleError
+
+    owns_console = console is None
+    try:
+        tlvs = dataset_to_tlvs(dataset).hex()
+        console = console or open_console(cli_port)
+    except Exception as e:
+        print_error(f"Error opening CLI console: {e}")
+        return False
+
+    try:
+        print_info("Committing the active dataset on the CLI...")
+        run_cli_command(console, f"dataset set active {tlvs}")
+        run_cli_command(console, "ifconfig up")
+        run_cli_command(console, "thread start")
+
+        started = time.monotonic()
+        deadline = started + join_timeout
+        while time.monotonic() < deadline:
+            state = run_cli_command(console, "state")
+            if state and state[0] in JOINED_STATES:
+                record_join(cli_port, time.monotonic() - started)
+                print_success(f"✓ CLI joined the Thread network as {state[0]}")
+                return True
+            time.sleep(1)
+        print_error(f"ERROR: CLI did not join the Thread network within {join_timeout:.0f}s")
+        return False
+    except ConsoleError as e:
+        print_error(f"ERROR: {e}")
+        return False
+    finally:
+        if owns_console:
+            console.close()
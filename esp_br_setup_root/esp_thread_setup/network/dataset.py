@@ -3,42 +3,56 @@
 Create and manage Thread network datasets.
 """
 import os
-import time
+import ipaddress
 import subprocess
 from esp_thread_setup.config.constants import ESP_THREAD_BR_PATH
+from esp_thread_setup.config.answers import ask, ask_yes_no, pause, read_dataset_answer
 from esp_thread_setup.utils.ports import check_port
-from esp_thread_setup.utils.logs import print_success, print_error, print_warning, print_info, color_text
+from esp_thread_setup.utils.logs import print_success, print_error, print_warning, print_info, print_note
+
+def remember_dataset(dataset, device_name=None):
+    """Record a dataset in the dataset store, so the fleet generator does not hand out its values again
+
+    Returns the name of its manifest, or None if it could not be recorded.
+    """
+    from esp_thread_setup.network.generator import record_dataset
+    try:
+        return record_dataset(dataset, device_name)["device"]
+    except (ValueError, OSError) as e:
+        print_warning(f"Could not record the dataset in the dataset store: {e}")
+        return None
 
 def create_dataset(border_router_port):
     """Create a Thread network dataset"""
     print_info("\n=== Creating Thread Network Dataset ===")
     print_warning("\n⚠️ IMPORTANT: For this step, you need to connect BOTH devices to your computer:")
-    print("1. The ESP Thread Border Router")
-    print("2. The ESP32C6 CLI device")
-    print("\nThis is necessary for creating the Thread network and configuring the CLI device.")
-    print("Please ensure both devices are connected before proceeding.")
+    print_note("1. The ESP Thread Border Router")
+    print_note("2. The ESP32C6 CLI device")
+    print_note("\nThis is necessary for creating the Thread network and configuring the CLI device.")
+    print_note("Please ensure both devices are connected before proceeding.")
     
-    input("\nConfirm that BOTH devices are connected and press Enter to continue...")
+    pause("\nConfirm that BOTH devices are connected and press Enter to continue...")
 
     # Check if border_router_port is None or not valid and get it if needed
     if border_router_port is None or not check_port(border_router_port):
-        print("Border Router port not found or not set. Let's detect it now.")
+        print_note("Border Router port not found or not set. Let's detect it now.")
         from esp_thread_setup.utils.ports import find_device_port
-        border_router_port = find_device_port("ESP Thread Border Router")
+        border_router_port = find_device_port("ESP Thread Border Router", "border_router_port")
         if not border_router_port:
-            print("ERROR: Border Router device not found. Please reconnect and try again.")
+            print_error("ERROR: Border Router device not found. Please reconnect and try again.")
             return False, None, None
-        print(f"Border Router found at port: {border_router_port}")
+        print_note(f"Border Router found at port: {border_router_port}")
 
-    # Generate a unique network name
-    network_name = f"ESP-Thread-{int(time.time()) % 10000}"
+    # Generate a network name that is not used by any dataset in the store
+    from esp_thread_setup.network.generator import generate_dataset_params, load_used_values
+    network_name = generate_dataset_params(load_used_values())["network_name"]
 
     # Connect to the border router to create a dataset
     br_example_dir = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router")
     if not os.path.exists(br_example_dir):
-        print(f"ERROR: Border Router example directory not found at {br_example_dir}")
-        print(f"Expected path: {br_example_dir}")
-        print("Please make sure you've downloaded the esp-thread-br repository.")
+        print_error(f"ERROR: Border Router example directory not found at {br_example_dir}")
+        print_note(f"Expected path: {br_example_dir}")
+        print_note("Please make sure you've downloaded the esp-thread-br repository.")
         return False, None, None
             
     os.chdir(br_example_dir)
@@ -49,52 +63,70 @@ def create_dataset(border_router_port):
     # Always delete the existing dataset file at the start
     if os.path.exists(dataset_file_path):
         os.remove(dataset_file_path)
-        print(f"Deleted existing dataset file: {dataset_file_path}")
+        print_note(f"Deleted existing dataset file: {dataset_file_path}")
 
     # Check if a dataset already exists
     if os.path.exists(dataset_file_path):
-        print(f"✓ Existing Thread network dataset found at {dataset_file_path}")
+        print_note(f"✓ Existing Thread network dataset found at {dataset_file_path}")
         with open(dataset_file_path, "r") as f:
             dataset = f.read()
         return True, dataset, border_router_port
 
-    print(f"Creating Thread network: {network_name}")
-    print(color_text("\n=== Border Router Console Instructions ===", "yellow"))
-    print("After the console opens, please run these commands:")
-    print("1. dataset init new")
-    print(f"2. dataset networkname {network_name}")
-    print("3. dataset commit active")
-    print("4. dataset")
-    print("5. Copy the entire dataset output (select all text from 'Active Timestamp:' to the end)")
-    print("\nPress Ctrl+] to exit the console when done")
+    # A dataset from the run config is used as is
+    dataset = read_dataset_answer()
+    if dataset:
+        with open(dataset_file_path, "w") as f:
+            f.write(dataset)
+        remember_dataset(dataset)
+        print_success(f"✓ Configured Thread network dataset saved to {dataset_file_path}")
+        return True, dataset, border_router_port
+
+    if ask_yes_no("auto_dataset", "\nCreate the dataset automatically over the serial console on the least congested channel? (y/n): ", default=True):
+        dataset = create_dataset_over_console(border_router_port, network_name)
+        if dataset:
+            with open(dataset_file_path, "w") as f:
+                f.write(dataset)
+            remember_dataset(dataset)
+            print_success(f"✓ Thread network dataset created and saved to {dataset_file_path}")
+            return True, dataset, border_router_port
+        print_warning("Automatic dataset creation failed. Falling back to the manual console steps.")
+
+    print_note(f"Creating Thread network: {network_name}")
+    print_info("\n=== Border Router Console Instructions ===")
+    print_note("After the console opens, please run these commands:")
+    print_note("1. dataset init new")
+    print_note(f"2. dataset networkname {network_name}")
+    print_note("3. dataset commit active")
+    print_note("4. dataset")
+    print_note("5. Copy the entire dataset output (select all text from 'Active Timestamp:' to the end)")
+    print_note("\nPress Ctrl+] to exit the console when done")
 
-    input("\nPress Enter to open the Border Router console...")
+    pause("\nPress Enter to open the Border Router console...", needs_human=True)
 
     # Open console with error handling
     try:
-        print(f"Running: idf.py -p {border_router_port} monitor")
+        print_note(f"Running: idf.py -p {border_router_port} monitor")
         subprocess.run(["idf.py", "-p", border_router_port, "monitor"], check=False)
     except Exception as e:
-        print(f"Error opening Border Router console: {e}")
-        retry = input("Would you like to manually enter the Border Router port? (y/n): ")
-        if retry.lower() == 'y':
-            border_router_port = input("Enter the Border Router port (e.g., /dev/ttyUSB0): ")
+        print_note(f"Error opening Border Router console: {e}")
+        if ask_yes_no(None, "Would you like to manually enter the Border Router port? (y/n): ", default=False):
+            border_router_port = ask(None, "Enter the Border Router port (e.g., /dev/ttyUSB0): ")
             try:
                 subprocess.run(["idf.py", "-p", border_router_port, "monitor"], check=False)
             except Exception as e:
-                print(f"Error opening Border Router console again: {e}")
+                print_note(f"Error opening Border Router console again: {e}")
                 return False, None, None
         else:
             return False, None, None
 
     # Get dataset from user
-    print(color_text("\n=== Thread Network Dataset ===", "yellow"))
-    print("Please paste the ENTIRE dataset output below.")
-    print("It should start with 'Active Timestamp:' and include all network parameters.")
-    print("Press Enter twice to finish input.")
+    print_info("\n=== Thread Network Dataset ===")
+    print_note("Please paste the ENTIRE dataset output below.")
+    print_note("It should start with 'Active Timestamp:' and include all network parameters.")
+    print_note("Press Enter twice to finish input.")
 
     # Accept multi-line input for the dataset
-    print("\nPaste the dataset output here:")
+    print_note("\nPaste the dataset output here:")
     dataset_lines = []
     while True:
         line = input()
@@ -105,10 +137,9 @@ def create_dataset(border_router_port):
     dataset = "\n".join(dataset_lines)
 
     if not dataset or "Active Timestamp:" not in dataset:
-        print("\nERROR: Invalid dataset. The dataset should start with 'Active Timestamp:'")
-        print("Please ensure you copied the entire output from the 'dataset' command.")
-        retry = input("Would you like to try entering the dataset again? (y/n): ")
-        if retry.lower() == 'y':
+        print_error("\nERROR: Invalid dataset. The dataset should start with 'Active Timestamp:'")
+        print_note("Please ensure you copied the entire output from the 'dataset' command.")
+        if ask_yes_no(None, "Would you like to try entering the dataset again? (y/n): ", default=False):
             return create_dataset(border_router_port)
         else:
             return False, None, None
@@ -117,6 +148,7 @@ def create_dataset(border_router_port):
     dataset_file_path = os.path.join(br_example_dir, "thread_dataset.txt")
     with open(dataset_file_path, "w") as f:
         f.write(dataset)
+    remember_dataset(dataset)
 
     print_success(f"✓ Thread network dataset created and saved to {dataset_file_path}")
 
@@ -127,7 +159,7 @@ def create_dataset(border_router_port):
     print_info("\n=== Parsed Dataset Parameters ===")
     for key, value in parsed_dataset.items():
         if key != "dataset_lines":  # Skip raw dataset lines
-            print(f"{key.replace('_', ' ').capitalize()}: {value}")
+            print_note(f"{key.replace('_', ' ').capitalize()}: {value}")
 
     # Save parsed parameters to a file (optional)
     parsed_dataset_file_path = os.path.join(br_example_dir, "parsed_thread_dataset.txt")
@@ -140,19 +172,19 @@ def create_dataset(border_router_port):
 
     # Display instructions for manually fetching the dataset from the Border Router
     print_info("\n=== Border Router Dataset Fetch Instructions ===")
-    print("To fetch the active dataset from the Border Router, follow these steps:")
-    print("1. Open the Border Router monitor using the following command:")
-    print(f"   idf.py -p {border_router_port} monitor")
-    print("2. Once the monitor is open, enter the following command:")
-    print("   dataset active -x")
-    print("3. Copy the entire dataset output (select all text from 'Active Timestamp:' to the end).")
-    print("4. Exit the monitor by pressing Ctrl+].")
+    print_note("To fetch the active dataset from the Border Router, follow these steps:")
+    print_note("1. Open the Border Router monitor using the following command:")
+    print_note(f"   idf.py -p {border_router_port} monitor")
+    print_note("2. Once the monitor is open, enter the following command:")
+    print_note("   dataset active -x")
+    print_note("3. Copy the entire dataset output (select all text from 'Active Timestamp:' to the end).")
+    print_note("4. Exit the monitor by pressing Ctrl+].")
 
-    input("\nPress Enter to open the Border Router monitor...")
+    pause("\nPress Enter to open the Border Router monitor...", needs_human=True)
 
     # Open the Border Router monitor
     try:
-        print(f"Running: idf.py -p {border_router_port} monitor")
+        print_note(f"Running: idf.py -p {border_router_port} monitor")
         subprocess.run(["idf.py", "-p", border_router_port, "monitor"], check=False)
     except Exception as e:
         print_error(f"Error opening Border Router monitor: {e}")
@@ -160,12 +192,12 @@ def create_dataset(border_router_port):
 
     # Prompt the user to paste the dataset
     print_info("\n=== Paste the Active Dataset ===")
-    print("Please paste the ENTIRE dataset output below.")
-    print("It should start with 'Active Timestamp:' and include all network parameters.")
-    print("Press Enter twice to finish input.")
+    print_note("Please paste the ENTIRE dataset output below.")
+    print_note("It should start with 'Active Timestamp:' and include all network parameters.")
+    print_note("Press Enter twice to finish input.")
 
     # Accept multi-line input for the dataset
-    print("\nPaste the dataset output here:")
+    print_note("\nPaste the dataset output here:")
     dataset_lines = []
     while True:
         line = input()
@@ -190,6 +222,50 @@ def create_dataset(border_router_port):
     print_success("Active dataset fetched successfully.")
     return dataset_output, None, None  # Return placeholders for the other two values
 
+def create_dataset_over_console(border_router_port, network_name, console=None):
+    """Commit a new dataset on the Border Router over its serial console and return it
+
+    The channel and PAN ID are chosen from energy and discover scans instead of
+    the random ones picked by `dataset init new`. An already open console is
+    used as is and left open.
+    """
+    from esp_thread_setup.network.scan import select_channel_and_pan
+    from esp_thread_setup.utils.console import open_console, run_cli_command, ConsoleError
+
+    owns_console = console is None
+    try:
+        console = console or open_console(border_router_port)
+    except Exception as e:
+        print_error(f"Error opening Border Router console: {e}")
+        return None
+
+    try:
+        channel, pan_id = select_channel_and_pan(console)
+        print_info(f"Creating Thread network: {network_name}")
+        run_cli_command(console, "dataset init new")
+        run_cli_command(console, f"dataset channel {channel}")
+        run_cli_command(console, f"dataset panid 0x{pan_id:04x}")
+        run_cli_command(console, f"dataset networkname {network_name}")
+        run_cli_command(console, "dataset commit active")
+        run_cli_command(console, "thread start")
+        dataset_lines = run_cli_command(console, "dataset active")
+    except ConsoleError as e:
+        print_error(f"ERROR: {e}")
+        return None
+    finally:
+        if owns_console:
+            console.close()
+
+    return "\n".join(dataset_lines)
+
+def load_saved_dataset():
+    """Return the dataset saved by a previous `create_dataset` run, or None"""
+    dataset_file = os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router/thread_dataset.txt")
+    if not os.path.exists(dataset_file):
+        return None
+    with open(dataset_file, "r") as f:
+        return f.read()
+
 def parse_dataset(dataset):
     """Parse a Thread network dataset to extract key parameters"""
     network_name = ""
@@ -198,6 +274,8 @@ def parse_dataset(dataset):
     network_key = ""
     channel = ""
     mesh_local_prefix = ""
+    pskc = ""
+    active_timestamp = ""
     
     # Parse the dataset to extract key parameters
     dataset_lines = dataset.strip().split('\n')
@@ -219,6 +297,10 @@ def parse_dataset(dataset):
                 channel = value
             elif key == "meshlocalprefix":
                 mesh_local_prefix = value.replace("/64", "").strip()
+            elif key == "pskc":
+                pskc = value
+            elif key == "activetimestamp":
+                active_timestamp = value
     
     return {
         "network_name": network_name,
@@ -227,5 +309,85 @@ def parse_dataset(dataset):
         "network_key": network_key,
         "channel": channel,
         "mesh_local_prefix": mesh_local_prefix,
+        "pskc": pskc,
+        "active_timestamp": active_timestamp,
         "dataset_lines": dataset_lines
-    }
\ No newline at end of file
+    }
+
+# Thread MeshCoP TLV types used in an active operational dataset
+TLV_CHANNEL = 0
+TLV_PAN_ID = 1
+TLV_EXT_PAN_ID = 2
+TLV_NETWORK_NAME = 3
+TLV_PSKC = 4
+TLV_NETWORK_KEY = 5
+TLV_MESH_LOCAL_PREFIX = 7
+TLV_SECURITY_POLICY = 12
+TLV_ACTIVE_TIMESTAMP = 14
+TLV_CHANNEL_MASK = 53
+
+# Defaults matching what `dataset init new` produces on the OpenThread CLI
+DEFAULT_SECURITY_POLICY = bytes.fromhex("02a0f7f8")
+DEFAULT_CHANNEL_MASK = bytes.fromhex("0004001fffe0")
+
+def encode_tlv(tlv_type, value):
+    """Encode a single MeshCoP TLV"""
+    return bytes([tlv_type, len(value)]) + value
+
+def dataset_to_tlvs(dataset):
+    """Convert a dataset (hex TLVs or the expanded `dataset` output) into raw TLV bytes"""
+    compact = "".join(dataset.split())
+    if compact and all(c in "0123456789abcdefABCDEF" for c in compact):
+        return bytes.fromhex(compact)
+
+    return params_to_tlvs(parse_dataset(dataset))
+
+def params_to_tlvs(params):
+    """Encode parsed dataset parameters (as returned by parse_dataset) into raw TLV bytes"""
+    for key in ("network_name", "ext_pan_id", "pan_id", "network_key", "channel"):
+        if not params[key]:
+            raise ValueError(f"Dataset is missing '{key.replace('_', ' ')}'")
+
+    timestamp = int(params["active_timestamp"] or 1)
+    tlvs = encode_tlv(TLV_ACTIVE_TIMESTAMP, (timestamp << 16).to_bytes(8, "big"))
+    tlvs += encode_tlv(TLV_CHANNEL, bytes([0]) + int(params["channel"]).to_bytes(2, "big"))
+    tlvs += encode_tlv(TLV_CHANNEL_MASK, DEFAULT_CHANNEL_MASK)
+    tlvs += encode_tlv(TLV_EXT_PAN_ID, bytes.fromhex(params["ext_pan_id"]))
+    if params["mesh_local_prefix"]:
+        prefix = ipaddress.IPv6Address(params["mesh_local_prefix"]).packed[:8]
+        tlvs += encode_tlv(TLV_MESH_LOCAL_PREFIX, prefix)
+    tlvs += encode_tlv(TLV_NETWORK_KEY, bytes.fromhex(params["network_key"]))
+    tlvs += encode_tlv(TLV_NETWORK_NAME, params["network_name"].encode("utf-8"))
+    tlvs += encode_tlv(TLV_PAN_ID, int(params["pan_id"], 16).to_bytes(2, "big"))
+    if params["pskc"]:
+        tlvs += encode_tlv(TLV_PSKC, bytes.fromhex(params["pskc"]))
+    tlvs += encode_tlv(TLV_SECURITY_POLICY, DEFAULT_SECURITY_POLICY)
+    return tlvs
+
+def tlvs_to_params(tlvs):
+    """Decode raw TLV bytes into dataset parameters (the inverse of params_to_tlvs)"""
+    params = {key: "" for key in ("network_name", "ext_pan_id", "pan_id", "network_key", "channel",
+                                  "mesh_local_prefix", "pskc", "active_timestamp")}
+    offset = 0
+    while offset < len(tlvs):
+        if offset + 2 > len(tlvs) or offset + 2 + tlvs[offset + 1] > len(tlvs):
+            raise ValueError("Dataset TLVs are truncated")
+        tlv_type, value = tlvs[offset], tlvs[offset + 2:offset + 2 + tlvs[offset + 1]]
+        offset += 2 + len(value)
+        if tlv_type == TLV_CHANNEL:
+            params["channel"] = str(int.from_bytes(value[1:], "big"))
+        elif tlv_type == TLV_PAN_ID:
+            params["pan_id"] = f"0x{int.from_bytes(value, 'big'):04x}"
+        elif tlv_type == TLV_EXT_PAN_ID:
+            params["ext_pan_id"] = value.hex()
+        elif tlv_type == TLV_NETWORK_NAME:
+            params["network_name"] = value.decode("utf-8")
+        elif tlv_type == TLV_PSKC:
+            params["pskc"] = value.hex()
+        elif tlv_type == TLV_NETWORK_KEY:
+            params["network_key"] = value.hex()
+        elif tlv_type == TLV_MESH_LOCAL_PREFIX:
+            params["mesh_local_prefix"] = str(ipaddress.IPv6Address(value + bytes(8)))
+        elif tlv_type == TLV_ACTIVE_TIMESTAMP:
+            params["active_timestamp"] = str(int.from_bytes(value, "big") >> 16)
+    return params
\ No newline at end of file
@@ -0,0 +1,136 @@
+﻿#!/usr/bin/env python3
+"""
+Generate unique Thread network datasets on the host, in bulk, for fleets of devices.
+"""
+import os
+import sys
+import glob
+import json
+import random
+import secrets
+import argparse
+import ipaddress
+from esp_thread_setup.config.constants import DATASET_STORE_DIR
+from esp_thread_setup.network.dataset import params_to_tlvs, tlvs_to_params, dataset_to_tlvs
+from esp_thread_setup.utils.logs import print_success, print_error, print_info
+
+# Thread network names are limited to 16 bytes
+NETWORK_NAME_PREFIX = "ESP-Thread-"
+THREAD_CHANNELS = range(11, 27)
+
+def load_used_values(store_dir=DATASET_STORE_DIR):
+    """Collect every identifier already present in the dataset store"""
+    used = {"network_name": set(), "ext_pan_id": set(), "pan_id": set(),
+            "network_key": set(), "pskc": set(), "mesh_local_prefix": set()}
+    for manifest_path in glob.glob(os.path.join(store_dir, "*.json")):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        for key in used:
+            if manifest.get(key):
+                used[key].add(manifest[key])
+    return used
+
+def unique_value(used_values, make_value):
+    """Draw values from make_value() until one is not in used_values, then reserve it"""
+    value = make_value()
+    while value in used_values:
+        value = make_value()
+    used_values.add(value)
+    return value
+
+def generate_dataset_params(used, channel=None):
+    """Generate one random dataset that does not collide with anything in `used`
+
+    The PSKc is random rather than derived from a commissioning passphrase.
+    """
+    mesh_local_prefix = unique_value(
+        used["mesh_local_prefix"],
+        lambda: str(ipaddress.IPv6Address(b"\xfd" + secrets.token_bytes(7) + bytes(8))))
+    return {
+        "network_name": unique_value(used["network_name"], lambda: NETWORK_NAME_PREFIX + secrets.token_hex(3)[:5]),
+        "ext_pan_id": unique_value(used["ext_pan_id"], lambda: secrets.token_hex(8)),
+        # 0xffff is the broadcast PAN ID
+        "pan_id": unique_value(used["pan_id"], lambda: f"0x{secrets.randbelow(0xffff):04x}"),
+        "network_key": unique_value(used["network_key"], lambda: secrets.token_hex(16)),
+        "channel": str(channel or random.choice(THREAD_CHANNELS)),
+        "mesh_local_prefix": mesh_local_prefix,
+        "pskc": unique_value(used["pskc"], lambda: secrets.token_hex(16)),
+        "active_timestamp": "1",
+    }
+
+def generate_fleet(device_names, channel=None, store_dir=DATASET_STORE_DIR):
+    """Generate a unique dataset for every device and write one manifest per device
+
+    Returns the list of manifests written to the dataset store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    used = load_used_values(store_dir)
+
+    manifests = []
+    for device_name in device_names:
+        manifest_path = os.path.join(store_dir, f"{device_name}.json")
+        if os.path.exists(manifest_path):
+            raise ValueError(f"Device '{device_name}' already has a manifest at {manifest_path}")
+
+        manifest = {"device": device_name}
+        manifest.update(generate_dataset_params(used, channel))
+        manifest["dataset_tlvs"] = params_to_tlvs(manifest).hex()
+        manifests.append((manifest_path, manifest))
+
+    for manifest_path, manifest in manifests:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    return [manifest for _, manifest in manifests]
+
+def load_manifest(device_name, store_dir=DATASET_STORE_DIR):
+    """Load a device manifest from the dataset store, or None if there is none"""
+    manifest_path = os.path.join(store_dir, f"{device_name}.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+def record_dataset(dataset, device_name=None, store_dir=DATASET_STORE_DIR):
+    """Write a manifest for a dataset created outside the generator, so generated datasets never reuse its values
+
+    The device name defaults to one derived from the Extended PAN ID. Returns the manifest.
+    """
+    tlvs = dataset_to_tlvs(dataset)
+    params = tlvs_to_params(tlvs)
+    manifest = {"device": device_name or f"network-{params['ext_pan_id']}"}
+    manifest.update(params)
+    manifest["dataset_tlvs"] = tlvs.hex()
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, f"{manifest['device']}.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def add_arguments(parser):
+    """Add the generator's command line options to an argparse parser"""
+    parser.add_argument("count", type=int, help="Number of devices to generate datasets for")
+    parser.add_argument("--prefix", default="device", help="Device name prefix (default: device)")
+    parser.add_argument("--start", type=int, default=1, help="First device number (default: 1)")
+    parser.add_argument("--channel", type=int, choices=THREAD_CHANNELS, help="Fixed channel for every dataset")
+    parser.add_argument("--store", default=DATASET_STORE_DIR, help="Dataset store directory")
+
+def run_generator(args):
+    """Generate the datasets asked for by parsed add_arguments() options; return the exit code"""
+    device_names = [f"{args.prefix}-{n:04d}" for n in range(args.start, args.start + args.count)]
+    print_info(f"Generating {args.count} datasets into {args.store}...")
+    try:
+        manifests = generate_fleet(device_names, args.channel, args.store)
+    except ValueError as e:
+        print_error(f"ERROR: {e}")
+        return 1
+
+    print_success(f"✓ Generated {len(manifests)} unique datasets")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate unique Thread datasets for a fleet of devices")
+    add_arguments(parser)
+    return run_generator(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+﻿#!/usr/bin/env python3
+"""
+Pick the least congested 802.15.4 channel and an unused PAN ID from energy and discover scans.
+"""
+import secrets
+from esp_thread_setup.utils.console import run_cli_command, parse_table
+from esp_thread_setup.utils.logs import print_info, print_success, print_note
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+THREAD_CHANNELS = list(range(11, 27))
+
+# Receiver noise floor: energy at or below this counts as an idle channel
+NOISE_FLOOR_DBM = -100
+# Score penalty for every Thread network already found on a channel
+NETWORK_PENALTY = 20
+
+def energy_scan(console, rounds=3, duration_ms=300):
+    """Run `scan energy` several times and return {channel: [rssi, ...]}"""
+    samples = {channel: [] for channel in THREAD_CHANNELS}
+    for _ in range(rounds):
+        lines = run_cli_command(console, f"scan energy {duration_ms}", timeout=30)
+        for row in parse_table(lines):
+            channel, rssi = int(row["Ch"]), int(row["RSSI"])
+            if channel in samples:
+                samples[channel].append(rssi)
+    return samples
+
+def discover_scan(console):
+    """Run `discover` and return the list of Thread networks heard on any channel"""
+    lines = run_cli_command(console, "discover", timeout=30)
+    networks = []
+    for row in parse_table(lines):
+        networks.append({
+            "network_name": row.get("Network Name", ""),
+            "ext_pan_id": row.get("Extended PAN", ""),
+            "pan_id": int(row["PAN"], 16),
+            "channel": int(row["Ch"]),
+            "rssi": int(row["dBm"]),
+        })
+    return networks
+
+def channel_scores(energy_samples, networks):
+    """Combine energy samples and discovered networks into a per-channel occupancy score (lower is better)"""
+    network_counts = {channel: 0 for channel in THREAD_CHANNELS}
+    for network in networks:
+        if network["channel"] in network_counts:
+            network_counts[network["channel"]] += 1
+
+    if np is not None:
+        width = max(1, max(len(energy_samples[c]) for c in THREAD_CHANNELS))
+        rssi = np.full((len(THREAD_CHANNELS), width), np.nan)
+        for i, channel in enumerate(THREAD_CHANNELS):
+            row = energy_samples[channel] or [NOISE_FLOOR_DBM]
+            rssi[i, :len(row)] = row
+        mean_energy = np.nanmean(rssi, axis=1) - NOISE_FLOOR_DBM
+        peak_energy = np.nanmax(rssi, axis=1) - NOISE_FLOOR_DBM
+        counts = np.array([network_counts[c] for c in THREAD_CHANNELS])
+        scores = 0.5 * mean_energy + 0.5 * peak_energy + NETWORK_PENALTY * counts
+        return dict(zip(THREAD_CHANNELS, scores.tolist()))
+
+    scores = {}
+    for channel in THREAD_CHANNELS:
+        rssi = energy_samples[channel] or [NOISE_FLOOR_DBM]
+        mean_energy = sum(rssi) / len(rssi) - NOISE_FLOOR_DBM
+        peak_energy = max(rssi) - NOISE_FLOOR_DBM
+        scores[channel] = 0.5 * mean_energy + 0.5 * peak_energy + NETWORK_PENALTY * network_counts[channel]
+    return scores
+
+def pick_pan_id(networks):
+    """Pick a random PAN ID not used by any discovered network (0xffff is broadcast)"""
+    used = {network["pan_id"] for network in networks}
+    pan_id = secrets.randbelow(0xffff)
+    while pan_id in used:
+        pan_id = secrets.randbelow(0xffff)
+    return pan_id
+
+def select_channel_and_pan(console, rounds=3):
+    """Scan from the Border Router and return (channel, pan_id) with the least contention"""
+    print_info("Scanning 802.15.4 channels for energy and existing Thread networks...")
+    run_cli_command(console, "ifconfig up")
+    energy_samples = energy_scan(console, rounds)
+    networks = discover_scan(console)
+
+    scores = channel_scores(energy_samples, networks)
+    for channel in THREAD_CHANNELS:
+        count = sum(1 for network in networks if network["channel"] == channel)
+        print_note(f"   Channel {channel}: score {scores[channel]:.1f} ({count} network(s))")
+
+    channel = min(THREAD_CHANNELS, key=lambda c: scores[c])
+    pan_id = pick_pan_id(networks)
+    print_success(f"✓ Selected channel {channel} and PAN ID 0x{pan_id:04x}")
+    return channel, pan_id
@@ -0,0 +1,219 @@
+﻿#!/usr/bin/env python3
+"""
+Export and import offline provisioning bundles.
+
+A bundle is a single .tar.gz holding the archive cache, git-backed
+repositories, built firmware images, NVS images, the dataset store and the
+repository manifest, plus a bundle.json listing the SHA-256 of every file.
+"""
+import io
+import os
+import json
+import time
+import shutil
+import tarfile
+import hashlib
+import tempfile
+from esp_thread_setup.config.constants import (
+    HOME_DIR, ESP_IDF_PATH, ESP_THREAD_BR_PATH, ARCHIVE_CACHE_DIR, NVS_CACHE_DIR,
+    DATASET_STORE_DIR, REPOSITORY_MANIFEST
+)
+from esp_thread_setup.repositories.extract import safe_relative_path, is_within
+from esp_thread_setup.repositories.manifest import load_repository_manifest
+from esp_thread_setup.utils.logs import print_success, print_error, print_info, print_note
+
+BUNDLE_FORMAT = 1
+
+# Projects whose build outputs are bundled, by name
+FIRMWARE_PROJECTS = {
+    "border_router": os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router"),
+    "cli": os.path.join(ESP_IDF_PATH, "examples/openthread/ot_cli"),
+    "rcp": os.path.join(ESP_IDF_PATH, "examples/openthread/ot_rcp"),
+}
+
+# Git repositories from a bundle are only installed below this directory
+REPOSITORIES_ROOT = os.path.join(HOME_DIR, "esp")
+
+# Cache directories copied as a whole, by their name inside the bundle
+CACHE_DIRS = {
+    "archives": ARCHIVE_CACHE_DIR,
+    "nvs": NVS_CACHE_DIR,
+    "datasets": DATASET_STORE_DIR,
+}
+
+def sha256_file(path):
+    """SHA-256 of a file on disk"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def firmware_files(build_dir):
+    """Files needed to flash a build without rebuilding it, relative to the build directory"""
+    flasher_args_path = os.path.join(build_dir, "flasher_args.json")
+    if not os.path.exists(flasher_args_path):
+        return []
+    with open(flasher_args_path, "r") as f:
+        flasher_args = json.load(f)
+    files = ["flasher_args.json"]
+    if os.path.exists(os.path.join(build_dir, "flash_args")):
+        files.append("flash_args")
+    files.extend(flasher_args.get("flash_files", {}).values())
+    return files
+
+def bundle_sources():
+    """Yield (path on disk, name inside the bundle) for everything a provisioning run needs"""
+    for name, cache_dir in CACHE_DIRS.items():
+        for root, _, files in os.walk(cache_dir):
+            for file_name in files:
+                if file_name.endswith(".part") or file_name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, file_name)
+                yield path, f"{name}/{os.path.relpath(path, cache_dir)}"
+
+    if os.path.exists(REPOSITORY_MANIFEST):
+        yield REPOSITORY_MANIFEST, "repositories.json"
+
+    # Archive-backed repositories are rebuilt from the archive cache, git ones are copied as is
+    for repository in load_repository_manifest():
+        if repository["backend"] != "git" or not os.path.isdir(repository["path"]):
+            continue
+        for root, _, files in os.walk(repository["path"]):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                yield path, f"repositories/{repository['name']}/{os.path.relpath(path, repository['path'])}"
+
+    for project, project_dir in FIRMWARE_PROJECTS.items():
+        build_dir = os.path.join(project_dir, "build")
+        for relative_path in firmware_files(build_dir):
+            yield os.path.join(build_dir, relative_path), f"firmware/{project}/{relative_path}"
+
+def export_bundle(bundle_path):
+    """Write every cached input of a provisioning run into one compressed bundle"""
+    print_info(f"Exporting provisioning bundle to {bundle_path}...")
+    manifest = {"format": BUNDLE_FORMAT, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": {}}
+    try:
+        sources = [(path, name) for path, name in bundle_sources()
+                   if os.path.isfile(path) and not os.path.islink(path)]
+        for path, name in sources:
+            manifest["files"][name] = sha256_file(path)
+
+        with tarfile.open(bundle_path, "w:gz") as bundle:
+            # bundle.json goes first so an import can check entries as they stream past
+            data = json.dumps(manifest, indent=2).encode("utf-8")
+            info = tarfile.TarInfo("bundle.json")
+            info.size = len(data)
+            info.mtime = int(time.time())
+            bundle.addfile(info, io.BytesIO(data))
+            for path, name in sources:
+                bundle.add(path, arcname=name, recursive=False)
+    except (OSError, ValueError) as e:
+        print_error(f"ERROR: Failed to export bundle: {e}")
+        return False
+
+    print_success(f"✓ Bundle with {len(manifest['files'])} files written to {bundle_path}")
+    return True
+
+def contained_path(root, relative_path):
+    """Join a path from the bundle to root, rejecting it unless the result stays inside root"""
+    relative_path = safe_relative_path(relative_path)
+    destination = os.path.join(root, relative_path)
+    if not relative_path or not is_within(root, destination):
+        raise ValueError(f"Bundle entry {relative_path} leaves {root}")
+    return destination
+
+def destination_for(name, repository_paths):
+    """Where a file from the bundle goes on this machine, or None for unknown entries
+
+    Raises ValueError for names that would be written outside their destination.
+    """
+    top, _, rest = name.partition("/")
+    if top in CACHE_DIRS and rest:
+        return contained_path(CACHE_DIRS[top], rest)
+    if top == "repositories" and rest:
+        repository_name, _, relative_path = rest.partition("/")
+        if repository_name in repository_paths and relative_path:
+            return contained_path(repository_paths[repository_name], relative_path)
+    if top == "firmware" and rest:
+        project, _, relative_path = rest.partition("/")
+        if project in FIRMWARE_PROJECTS and relative_path:
+            return contained_path(os.path.join(FIRMWARE_PROJECTS[project], "build"), relative_path)
+    return None
+
+def repository_destinations(manifest_path):
+    """Paths of the manifest's repositories, which a bundle may only place below REPOSITORIES_ROOT"""
+    paths = {}
+    for repository in load_repository_manifest(manifest_path):
+        path = os.path.abspath(repository["path"])
+        if not is_within(REPOSITORIES_ROOT, path) or os.path.realpath(path) == os.path.realpath(REPOSITORIES_ROOT):
+            raise ValueError(f"Repository '{repository['name']}' path {path} is outside {REPOSITORIES_ROOT}")
+        paths[repository["name"]] = path
+    return paths
+
+def import_bundle(bundle_path):
+    """Verify a bundle and unpack it into the local caches and build directories
+
+    Nothing is installed unless every file matches its recorded SHA-256.
+    """
+    print_info(f"Importing provisioning bundle from {bundle_path}...")
+    staging_dir = tempfile.mkdtemp(prefix="esp-thread-bundle-")
+    try:
+        with tarfile.open(bundle_path, "r:gz") as bundle:
+            first = bundle.next()
+            if first is None or first.name != "bundle.json":
+                raise ValueError("Not a provisioning bundle (bundle.json missing)")
+            manifest = json.load(bundle.extractfile(first))
+            if manifest.get("format") != BUNDLE_FORMAT:
+                raise ValueError(f"Unsupported bundle format {manifest.get('format')}")
+            staged = {}
+            for count, member in enumerate(bundle):
+                if member.name == "bundle.json":
+                    continue
+                if not member.isfile() or member.name not in manifest["files"]:
+                    raise ValueError(f"Unexpected entry in bundle: {member.name}")
+                staged_path = os.path.join(staging_dir, str(count))
+                hasher = hashlib.sha256()
+                with bundle.extractfile(member) as src, open(staged_path, "wb") as dst:
+                    for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                        hasher.update(chunk)
+                        dst.write(chunk)
+                if hasher.hexdigest() != manifest["files"][member.name]:
+                    raise ValueError(f"Checksum mismatch for {member.name}")
+                os.chmod(staged_path, member.mode & 0o777)
+                staged[member.name] = staged_path
+
+        missing = set(manifest["files"]) - set(staged)
+        if missing:
+            raise ValueError(f"Bundle is incomplete, {len(missing)} files missing")
+
+        # The bundle's own manifest decides where its git repositories go. The
+        # checksums come from the same bundle, so every destination is checked
+        # before anything is installed.
+        manifest_path = staged.pop("repositories.json", None)
+        repository_paths = {r["name"]: r["path"] for r in load_repository_manifest()}
+        if manifest_path:
+            repository_paths = repository_destinations(manifest_path)
+        destinations = {name: destination_for(name, repository_paths) for name in staged}
+
+        installed = 0
+        if manifest_path:
+            os.makedirs(os.path.dirname(REPOSITORY_MANIFEST), exist_ok=True)
+            shutil.move(manifest_path, REPOSITORY_MANIFEST)
+            installed += 1
+        for name, staged_path in staged.items():
+            destination = destinations[name]
+            if destination is None:
+                print_note(f"Skipping unknown bundle entry: {name}")
+                continue
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.move(staged_path, destination)
+            installed += 1
+    except (OSError, ValueError, KeyError, tarfile.TarError) as e:
+        print_error(f"ERROR: Failed to import bundle: {e}")
+        return False
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    print_success(f"✓ Installed {installed} files from {bundle_path}")
+    return True
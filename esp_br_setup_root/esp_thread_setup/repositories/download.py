@@ -3,64 +3,145 @@
 Download and manage repositories for ESP Thread setup.
 """
 import os
-import shutil
-import tempfile
-import urllib.request
 import zipfile
-from esp_thread_setup.config.constants import HOME_DIR, ESP_THREAD_BR_PATH
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from esp_thread_setup.config.constants import HOME_DIR, MAX_PARALLEL_FETCHES
+from esp_thread_setup.config.answers import ask_yes_no
+from esp_thread_setup.repositories.fetch import fetch_archive, cache_paths
+from esp_thread_setup.repositories.extract import extract_archive, update_tree
+from esp_thread_setup.repositories.git_fetch import git_fetch_repository
+from esp_thread_setup.repositories.manifest import load_repository_manifest
+from esp_thread_setup.repositories.store import materialize_version, collect_garbage
+from esp_thread_setup.utils.events import emit, current_context, step_context
+from esp_thread_setup.utils.logs import print_error, print_note, print_warning
+from esp_thread_setup.utils.metrics import record_cache
+
+# Print download progress every this many bytes
+PROGRESS_STEP = 5 * 1024 * 1024
+
+def report(name, message, level="note"):
+    """Emit a progress line prefixed with the repository name"""
+    emit(level, f"[{name}] {message}", repository=name)
+
+def make_progress(name):
+    """Return a fetch_archive progress callback reporting every PROGRESS_STEP bytes"""
+    state = {"bytes": 0, "reported": 0}
+
+    def progress(count):
+        state["bytes"] += count
+        if state["bytes"] - state["reported"] >= PROGRESS_STEP:
+            state["reported"] = state["bytes"]
+            report(name, f"{state['bytes'] / (1024 * 1024):.1f} MB downloaded")
+    return progress
+
+def file_mtime(path):
+    """mtime of path in nanoseconds, or None if it does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def fetch_repository(repository):
+    """Fetch one repository described by a manifest entry; return (success, message)"""
+    name, path = repository["name"], repository["path"]
+
+    if repository["backend"] == "git":
+        report(name, f"Fetching {repository['version']} from {repository['git_url']}...")
+        try:
+            commit = git_fetch_repository(repository["git_url"], path, repository["version"], repository["sparse_paths"])
+        except (subprocess.CalledProcessError, OSError) as e:
+            return False, f"ERROR: Failed to fetch {name}: {getattr(e, 'stderr', None) or e}"
+        return True, f"Checked out {name} at {commit}"
+
+    url = repository["archive_url"]
+    report(name, f"Downloading from {url}...")
+
+    # Download the ZIP file through the archive cache (resumes interrupted transfers)
+    cached_mtime = file_mtime(cache_paths(url)[0])
+    try:
+        zip_path, sha256 = fetch_archive(url, progress=make_progress(name))
+    except Exception as e:
+        return False, f"ERROR: Failed to download {name}: {e}"
+    # A reused (or revalidated) archive keeps its mtime
+    record_cache("archive", cached_mtime is not None and cached_mtime == file_mtime(zip_path))
+    if repository["sha256"] and sha256 != repository["sha256"].lower():
+        return False, f"ERROR: Checksum mismatch for {name}: expected {repository['sha256']}, got {sha256}"
+    report(name, f"Archive SHA-256: {sha256}")
+
+    # Extract the ZIP file (without its repo-main/ prefix) straight into place,
+    # or update an existing checkout in place so its build directories survive
+    try:
+        if repository["backend"] == "store":
+            new_blobs = materialize_version(zip_path, path)
+            report(name, f"Materialized {repository['version']} ({new_blobs} new files in the object store)")
+        elif os.path.exists(path):
+            changed, added, removed = update_tree(zip_path, path)
+            report(name, f"{changed} changed, {added} added, {removed} removed files")
+        else:
+            extract_archive(zip_path, path)
+    except (ValueError, OSError, zipfile.BadZipFile) as e:
+        return False, f"ERROR: Failed to extract {name}: {e}"
+
+    return True, f"Successfully downloaded and extracted {name} ({repository['version']})"
 
 def download_repositories(skip_repositories=False):
-    """Download all necessary repositories as ZIP files instead of git clone"""
+    """Fetch every repository of the manifest, several at a time"""
     if skip_repositories:
-        print("\n=== Skipping Repository Download (Using Existing Repositories) ===")
+        print_note("\n=== Skipping Repository Download (Using Existing Repositories) ===")
         return True
 
-    print("\n=== Downloading Repositories ===")
+    print_note("\n=== Downloading Repositories ===")
 
     # Create esp directory if it doesn't exist
     os.makedirs(f"{HOME_DIR}/esp", exist_ok=True)
 
-    repositories = [
-        ("esp-thread-br", "https://github.com/espressif/esp-thread-br/archive/refs/heads/main.zip", ESP_THREAD_BR_PATH)
-    ]
+    try:
+        repositories = load_repository_manifest()
+    except (ValueError, OSError) as e:
+        print_error(f"ERROR: Invalid repository manifest: {e}")
+        return False
 
-    for name, url, path in repositories:
+    # Ask all questions up front, the fetches themselves run concurrently
+    selected = []
+    for repository in repositories:
+        name, path = repository["name"], repository["path"]
         if os.path.exists(path):
-            print(f"Repository {name} already exists at {path}")
-            response = input(f"Do you want to re-download and update {name}? (y/n): ")
-            if response.lower() != 'y':
+            print_note(f"Repository {name} already exists at {path}")
+            if not ask_yes_no("redownload_repositories", f"Do you want to re-download and update {name}? (y/n): ", default=False):
                 continue
-            # Remove existing directory to prepare for fresh download
-            shutil.rmtree(path)
+        selected.append(repository)
 
-        print(f"Downloading {name} from {url}...")
+    if not selected:
+        print_note("✓ All repositories are up to date")
+        return True
 
-        # Create temporary directory for download
-        with tempfile.TemporaryDirectory() as temp_dir:
-            zip_path = os.path.join(temp_dir, f"{name}.zip")
+    context = current_context()
 
-            # Download the ZIP file
-            try:
-                urllib.request.urlretrieve(url, zip_path)
-            except Exception as e:
-                print(f"ERROR: Failed to download {name}: {e}")
-                return False
+    def fetch_in_context(repository):
+        with step_context(*context):
+            return fetch_repository(repository)
 
-            # Extract ZIP file
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_FETCHES, len(selected))) as pool:
+        results = list(pool.map(fetch_in_context, selected))
 
-            # Find the extracted directory (typically repo-main)
-            extracted_dirs = [d for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d)) and d != "__MACOSX"]
-            if not extracted_dirs:
-                print(f"ERROR: No directories found in the ZIP file for {name}")
-                return False
+    success = True
+    for repository, (ok, message) in zip(selected, results):
+        report(repository["name"], message, "note" if ok else "error")
+        success = success and ok
 
-            # Move the extracted directory to the target path
-            extracted_path = os.path.join(temp_dir, extracted_dirs[0])
-            shutil.move(extracted_path, path)
+    if any(repository["backend"] == "store" for repository in selected):
+        # Blobs of versions that were just replaced are no longer linked anywhere
+        try:
+            freed = collect_garbage()
+        except OSError as e:
+            print_warning(f"Could not clean up the object store: {e}")
+        else:
+            if freed:
+                print_note(f"Freed {freed / (1024 * 1024):.1f} MB of unused files in the object store")
 
-            print(f"Successfully downloaded and extracted {name}")
+    if not success:
+        return False
 
-    print("✓ All repositories downloaded successfully")
-    return True
\ No newline at end of file
+    print_note("✓ All repositories downloaded successfully")
+    return True
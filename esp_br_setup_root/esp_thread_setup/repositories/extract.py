@@ -0,0 +1,249 @@
+﻿#!/usr/bin/env python3
+"""
+Extract repository archives straight into place, in parallel.
+"""
+import os
+import json
+import stat
+import zlib
+import shutil
+import zipfile
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Below this many files the process pool costs more than it saves
+PARALLEL_MIN_MEMBERS = 200
+
+# Records the CRC and size of every file the archive put into the tree
+MANIFEST_NAME = ".archive_manifest.json"
+
+# Read once at import: os.umask can only be queried by setting it, which would race with other threads
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def safe_relative_path(name):
+    """Normalise a member name to a relative path, rejecting absolute paths and `..` components"""
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if name.startswith("/") or ".." in parts:
+        raise ValueError(f"Unsafe path in archive: {name}")
+    return "/".join(parts)
+
+def is_within(root, path):
+    """True if path, with links resolved, is root or lies below it"""
+    real_root = os.path.realpath(root)
+    return os.path.commonpath([real_root, os.path.realpath(path)]) == real_root
+
+def member_target(root, relative_path):
+    """Join a member path to root, rejecting paths whose parent directory resolves outside root"""
+    target = os.path.join(root, relative_path)
+    if not is_within(root, os.path.dirname(target)):
+        raise ValueError(f"{relative_path} resolves outside {root}")
+    return target
+
+def is_symlink(info):
+    """True if a zip member is a symbolic link"""
+    return stat.S_ISLNK(info.external_attr >> 16)
+
+def archive_members(zip_ref):
+    """Return (ZipInfo, relative path) for every entry, with the top-level `repo-main/` prefix stripped"""
+    members = []
+    for info in zip_ref.infolist():
+        parts = info.filename.split("/", 1)
+        if parts[0] == "__MACOSX" or len(parts) < 2:
+            continue
+        relative_path = safe_relative_path(parts[1])
+        if relative_path:
+            members.append((info, relative_path))
+    return members
+
+def extract_members(zip_path, members, dest_dir):
+    """Decompress the named file members of zip_path into dest_dir; runs in a worker process"""
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for name, relative_path in members:
+            info = zip_ref.getinfo(name)
+            target = member_target(dest_dir, relative_path)
+            mode = info.external_attr >> 16
+            # Never write in place: the file may be a link or a hardlinked object store blob
+            if os.path.lexists(target):
+                os.remove(target)
+            with zip_ref.open(info) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            if mode & 0o111:
+                os.chmod(target, stat.S_IMODE(mode))
+    return len(members)
+
+def create_links(zip_path, links, dest_dir):
+    """Create the symlink members once every file is written, refusing links that lead outside dest_dir"""
+    created = []
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for name, relative_path in links:
+            target = member_target(dest_dir, relative_path)
+            link = zip_ref.read(name).decode("utf-8")
+            if os.path.isabs(link) or not is_within(dest_dir, os.path.join(os.path.dirname(target), link)):
+                raise ValueError(f"Link {relative_path} -> {link} points outside the tree")
+            if os.path.lexists(target):
+                os.remove(target)
+            os.symlink(link, target)
+            created.append((relative_path, link, target))
+    # A link can be checked against links created after it only once all exist
+    for relative_path, link, target in created:
+        if not is_within(dest_dir, target):
+            raise ValueError(f"Link {relative_path} -> {link} points outside the tree")
+
+def split_batches(members, count):
+    """Split (name, path, size) members into `count` batches of similar total size"""
+    batches = [[] for _ in range(count)]
+    totals = [0] * count
+    for name, relative_path, size in sorted(members, key=lambda m: m[2], reverse=True):
+        smallest = totals.index(min(totals))
+        batches[smallest].append((name, relative_path))
+        totals[smallest] += size
+    return [batch for batch in batches if batch]
+
+def decompress_files(zip_path, files, dest_dir, workers=None, links=()):
+    """Decompress (name, path, size) members into dest_dir, across a process pool for large sets
+
+    The (name, path) symlink members in links are created last, so no file is
+    ever written through a link taken from the archive.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(files) >= PARALLEL_MIN_MEMBERS:
+        batches = split_batches(files, workers)
+        with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+            list(pool.map(extract_members, [zip_path] * len(batches), batches, [dest_dir] * len(batches)))
+    elif files:
+        extract_members(zip_path, [(name, path) for name, path, _ in files], dest_dir)
+    if links:
+        create_links(zip_path, links, dest_dir)
+
+def read_manifest(tree_dir):
+    """Load the archive manifest of a tree, or an empty dict if it has none"""
+    manifest_path = os.path.join(tree_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+def write_manifest(tree_dir, members):
+    """Record {path: {crc, size}} for every file member of the archive"""
+    manifest = {path: {"crc": info.CRC, "size": info.file_size}
+                for info, path in members if not info.is_dir()}
+    with open(os.path.join(tree_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+
+def file_crc(path):
+    """CRC-32 of a file on disk, as stored in zip entries"""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def is_unchanged(tree_dir, info, relative_path, manifest):
+    """True if the file on disk already matches the archive member"""
+    target = member_target(tree_dir, relative_path)
+    if os.path.islink(target) or not os.path.isfile(target):
+        return is_symlink(info) and os.path.islink(target) \
+            and manifest.get(relative_path) == {"crc": info.CRC, "size": info.file_size}
+    if os.path.getsize(target) != info.file_size:
+        return False
+    if relative_path in manifest:
+        return manifest[relative_path] == {"crc": info.CRC, "size": info.file_size}
+    # Tree extracted before manifests existed: compare contents once
+    return file_crc(target) == info.CRC
+
+def update_tree(zip_path, dest_path, workers=None):
+    """Bring an existing tree in line with an archive, touching only what changed
+
+    Unchanged files keep their mtimes and files the archive never contained
+    (such as build directories) are left alone, so incremental builds stay
+    incremental. Returns (changed, added, removed) counts.
+    """
+    manifest = read_manifest(dest_path)
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        members = archive_members(zip_ref)
+    if not any(not info.is_dir() for info, _ in members):
+        raise ValueError(f"No files found in {zip_path}")
+
+    changed, links, added = [], [], 0
+    archive_paths = set()
+    for info, relative_path in members:
+        target = member_target(dest_path, relative_path)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            continue
+        archive_paths.add(relative_path)
+        if is_unchanged(dest_path, info, relative_path, manifest):
+            continue
+        if not os.path.lexists(target):
+            added += 1
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if is_symlink(info):
+            links.append((info.filename, relative_path))
+        else:
+            changed.append((info.filename, relative_path, info.compress_size))
+
+    decompress_files(zip_path, changed, dest_path, workers, links)
+
+    removed = 0
+    for relative_path in set(manifest) - archive_paths:
+        # The manifest lies inside the tree, its paths are checked like archive members
+        target = member_target(dest_path, safe_relative_path(relative_path))
+        if os.path.lexists(target):
+            os.remove(target)
+            removed += 1
+
+    write_manifest(dest_path, members)
+    return len(changed) + len(links) - added, added, removed
+
+def extract_archive(zip_path, dest_path, workers=None):
+    """Extract zip_path into dest_path, dropping the archive's top-level directory
+
+    Files are written once, into a staging directory next to dest_path, which
+    then replaces dest_path with a rename.
+    """
+    staging_dir = make_staging_dir(dest_path)
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            members = archive_members(zip_ref)
+            files, links = [], []
+            for info, relative_path in members:
+                target = member_target(staging_dir, relative_path)
+                if info.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if is_symlink(info):
+                    links.append((info.filename, relative_path))
+                else:
+                    files.append((info.filename, relative_path, info.compress_size))
+        if not files and not links:
+            raise ValueError(f"No files found in {zip_path}")
+
+        decompress_files(zip_path, files, staging_dir, workers, links)
+        write_manifest(staging_dir, members)
+        replace_directory(staging_dir, dest_path)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+def make_staging_dir(dest_path):
+    """Create an empty directory next to dest_path that will later replace it
+
+    mkdtemp creates it owner-only; it gets the usual umask-based mode since it
+    becomes the tree's root directory.
+    """
+    staging_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(dest_path)}.staging-",
+                                   dir=os.path.dirname(os.path.abspath(dest_path)))
+    os.chmod(staging_dir, 0o777 & ~UMASK)
+    return staging_dir
+
+def replace_directory(new_dir, dest_path):
+    """Move new_dir to dest_path, swapping out any existing directory with renames"""
+    if not os.path.exists(dest_path):
+        os.rename(new_dir, dest_path)
+        return
+    old_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(dest_path)}.old-", dir=os.path.dirname(new_dir))
+    os.rename(dest_path, os.path.join(old_dir, "tree"))
+    os.rename(new_dir, dest_path)
+    shutil.rmtree(old_dir, ignore_errors=True)
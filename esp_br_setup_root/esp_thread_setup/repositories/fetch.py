@@ -0,0 +1,289 @@
+﻿#!/usr/bin/env python3
+"""
+Cache-backed, resumable streaming download of repository archives.
+"""
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from esp_thread_setup.config.constants import ARCHIVE_CACHE_DIR, OFFLINE_MODE
+
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = 30
+
+# Archives at least this large are fetched as parallel byte ranges when the server allows it
+SEGMENT_THRESHOLD = 16 * 1024 * 1024
+SEGMENT_SIZE = 4 * 1024 * 1024
+SEGMENT_WORKERS = 4
+
+def cache_paths(url, cache_dir=ARCHIVE_CACHE_DIR):
+    """Return (archive, metadata, partial download) paths for a URL in the cache"""
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:24]
+    base = os.path.join(cache_dir, key)
+    return f"{base}.archive", f"{base}.json", f"{base}.part"
+
+def read_metadata(path):
+    """Read a JSON metadata file, or return an empty dict if it does not exist"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_metadata(path, metadata):
+    """Atomically write a JSON metadata file"""
+    with open(path + ".tmp", "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def hash_file(path):
+    """SHA-256 of an existing file, used only to continue hashing a partial download"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher
+
+def validators(headers):
+    """Extract the cache validators of a response"""
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+def stream_to_file(response, f, hasher, progress=None):
+    """Copy a response body into an open file while hashing it; return the number of bytes written"""
+    written = 0
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            return written
+        f.write(chunk)
+        hasher.update(chunk)
+        written += len(chunk)
+        if progress:
+            progress(len(chunk))
+
+def same_validators(cached, fresh):
+    """True if a cached entry and a fresh response describe the same remote file"""
+    if cached.get("etag") and fresh.get("etag"):
+        return cached["etag"] == fresh["etag"]
+    if cached.get("last_modified") and fresh.get("last_modified"):
+        return cached["last_modified"] == fresh["last_modified"]
+    return False
+
+def probe_url(url):
+    """HEAD a URL, following redirects; return (final_url, size, accepts_ranges, validators)"""
+    request = urllib.request.Request(url, method="HEAD")
+    with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+        size = int(response.headers.get("Content-Length") or 0)
+        accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return response.geturl(), size, accepts_ranges, validators(response.headers)
+
+def open_connection(url):
+    """Open a keep-alive HTTP(S) connection to the host of url"""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.netloc, timeout=DOWNLOAD_TIMEOUT)
+    return http.client.HTTPConnection(parts.netloc, timeout=DOWNLOAD_TIMEOUT)
+
+def download_segments(url, part_path, segments, validator=None, progress=None, workers=SEGMENT_WORKERS,
+                      on_done=None):
+    """Fetch (start, end) byte ranges into a preallocated file over a pool of keep-alive connections
+
+    on_done(start) is called as each segment is written. Returns (completed segment starts, errors).
+    """
+    parts = urllib.parse.urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    pending = queue.Queue()
+    for segment in segments:
+        pending.put(segment)
+    completed = []
+    lock = threading.Lock()
+
+    def worker():
+        connection = open_connection(url)
+        try:
+            with open(part_path, "r+b") as f:
+                while True:
+                    try:
+                        start, end = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    headers = {"Range": f"bytes={start}-{end}"}
+                    if validator:
+                        headers["If-Range"] = validator
+                    connection.request("GET", target, headers=headers)
+                    response = connection.getresponse()
+                    if response.status != 206:
+                        response.read()
+                        raise OSError(f"Server answered {response.status} to a range request")
+                    f.seek(start)
+                    written = 0
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        f.write(chunk)
+                        written += len(chunk)
+                        if progress:
+                            progress(len(chunk))
+                    if written != end - start + 1:
+                        raise OSError(f"Short read for bytes {start}-{end}")
+                    # The data must be on disk before the segment is recorded as done
+                    f.flush()
+                    with lock:
+                        completed.append(start)
+                        if on_done:
+                            on_done(start)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker) for _ in range(min(workers, len(segments)))]
+    errors = [future.exception() for future in futures if future.exception()]
+    return completed, errors
+
+def fetch_segmented(url, cache_dir=ARCHIVE_CACHE_DIR, progress=None):
+    """Download a large archive as parallel byte ranges; return None when a single stream should be used
+
+    Completed ranges are recorded next to the partial file, so a failed
+    segmented download continues with only the missing ranges.
+    """
+    archive_path, metadata_path, part_path = cache_paths(url, cache_dir)
+    part_metadata_path = part_path + ".json"
+    try:
+        final_url, size, accepts_ranges, fresh_metadata = probe_url(url)
+    except (urllib.error.URLError, http.client.HTTPException, OSError):
+        return None
+
+    metadata = read_metadata(metadata_path) if os.path.exists(archive_path) else {}
+    if metadata and same_validators(metadata, fresh_metadata):
+        return archive_path, metadata["sha256"]
+    if not accepts_ranges or size < SEGMENT_THRESHOLD:
+        return None
+
+    part_metadata = read_metadata(part_metadata_path)
+    if "done" not in part_metadata or part_metadata.get("size") != size \
+            or not same_validators(part_metadata, fresh_metadata):
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+        part_metadata = dict(fresh_metadata, size=size, done=[])
+        write_metadata(part_metadata_path, part_metadata)
+    elif progress:
+        progress(len(part_metadata["done"]) * SEGMENT_SIZE)
+
+    segments = [(start, min(start + SEGMENT_SIZE, size) - 1)
+                for start in range(0, size, SEGMENT_SIZE) if start not in part_metadata["done"]]
+    validator = fresh_metadata.get("etag") or fresh_metadata.get("last_modified")
+
+    def record_segment(start):
+        # Written as each range completes, so an interrupted process resumes from here too
+        part_metadata["done"].append(start)
+        write_metadata(part_metadata_path, part_metadata)
+
+    _, errors = download_segments(final_url, part_path, segments, validator, progress, on_done=record_segment)
+    if errors:
+        raise errors[0]
+
+    # Ranges arrive out of order, so the digest is taken once the file is complete
+    sha256 = hash_file(part_path).hexdigest()
+    os.replace(part_path, archive_path)
+    os.remove(part_metadata_path)
+    metadata = dict(fresh_metadata, url=url, sha256=sha256, size=size)
+    write_metadata(metadata_path, metadata)
+    return archive_path, sha256
+
+def fetch_archive(url, cache_dir=ARCHIVE_CACHE_DIR, progress=None, retries=DOWNLOAD_RETRIES):
+    """Download url into the archive cache and return (archive_path, sha256)
+
+    A cached copy is revalidated with If-None-Match/If-Modified-Since and reused
+    on 304. An interrupted transfer is continued with an HTTP Range request as
+    long as the server still reports the same ETag/Last-Modified. Large archives
+    are split into parallel ranges when the server supports it.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    archive_path, metadata_path, part_path = cache_paths(url, cache_dir)
+    part_metadata_path = part_path + ".json"
+
+    if OFFLINE_MODE:
+        if os.path.exists(archive_path) and os.path.exists(metadata_path):
+            return archive_path, read_metadata(metadata_path)["sha256"]
+        raise OSError(f"{url} is not in the archive cache (offline mode)")
+
+    # A failed segmented download continues with its missing ranges on the next attempt
+    for attempt in range(retries + 1):
+        try:
+            result = fetch_segmented(url, cache_dir, progress)
+            break
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            if attempt == retries:
+                raise
+            time.sleep(2 ** attempt)
+    if result:
+        return result
+    if "done" in read_metadata(part_metadata_path):
+        # A segmented partial file is preallocated, it cannot be continued as a single stream
+        os.remove(part_path)
+        os.remove(part_metadata_path)
+
+    metadata = read_metadata(metadata_path) if os.path.exists(archive_path) else {}
+
+    for attempt in range(retries + 1):
+        request = urllib.request.Request(url)
+        if metadata.get("etag"):
+            request.add_header("If-None-Match", metadata["etag"])
+        if metadata.get("last_modified"):
+            request.add_header("If-Modified-Since", metadata["last_modified"])
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part_metadata = read_metadata(part_metadata_path)
+        validator = part_metadata.get("etag") or part_metadata.get("last_modified")
+        if offset and validator:
+            request.add_header("Range", f"bytes={offset}-")
+            request.add_header("If-Range", validator)
+
+        try:
+            with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status == 206:
+                    hasher = hash_file(part_path)
+                    mode = "ab"
+                    if progress:
+                        progress(offset)
+                else:
+                    hasher = hashlib.sha256()
+                    mode = "wb"
+                    write_metadata(part_metadata_path, validators(response.headers))
+                with open(part_path, mode) as f:
+                    written = stream_to_file(response, f, hasher, progress)
+                # read() reports a connection dropped mid-body as a normal end of stream
+                expected = response.headers.get("Content-Length")
+                if expected is not None and written != int(expected):
+                    raise http.client.IncompleteRead(b"", int(expected) - written)
+                # A 206 may omit the validators, which then come from the original response
+                fresh_metadata = validators(response.headers)
+                if not any(fresh_metadata.values()):
+                    fresh_metadata = read_metadata(part_metadata_path)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return archive_path, metadata["sha256"]
+            if e.code == 416:
+                # Stale partial download that no longer matches the remote file
+                os.remove(part_path)
+                continue
+            raise
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            if attempt == retries:
+                raise
+            time.sleep(2 ** attempt)
+            continue
+
+        os.replace(part_path, archive_path)
+        os.remove(part_metadata_path)
+        metadata = {"url": url, "sha256": hasher.hexdigest(), "size": os.path.getsize(archive_path)}
+        metadata.update(fresh_metadata)
+        write_metadata(metadata_path, metadata)
+        return archive_path, metadata["sha256"]
+
+    raise OSError(f"Failed to download {url} after {retries + 1} attempts")
@@ -0,0 +1,58 @@
+﻿#!/usr/bin/env python3
+"""
+Shallow, blob-filtered, sparse git checkouts of repositories.
+"""
+import os
+import shutil
+import tempfile
+import subprocess
+from esp_thread_setup.repositories.extract import replace_directory
+
+def run_git(args, cwd=None):
+    """Run a git command and return its stdout"""
+    result = subprocess.run(["git"] + args, cwd=cwd, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return result.stdout.strip()
+
+def is_git_checkout(path):
+    """True if path is the top of a git working tree"""
+    return os.path.isdir(os.path.join(path, ".git"))
+
+def init_sparse_repository(path, url, sparse_paths):
+    """Create an empty partial-clone repository that only checks out sparse_paths"""
+    run_git(["init", "-q", path])
+    run_git(["remote", "add", "origin", url], cwd=path)
+    # Blobs outside the sparse paths are fetched lazily, if ever
+    run_git(["config", "remote.origin.promisor", "true"], cwd=path)
+    run_git(["config", "remote.origin.partialclonefilter", "blob:none"], cwd=path)
+    run_git(["sparse-checkout", "init", "--cone"], cwd=path)
+    run_git(["sparse-checkout", "set"] + list(sparse_paths), cwd=path)
+
+def fetch_ref(path, ref):
+    """Fetch a single branch, tag or commit at depth 1 and check it out"""
+    run_git(["fetch", "-q", "--depth", "1", "--filter=blob:none", "origin", ref], cwd=path)
+    run_git(["-c", "advice.detachedHead=false", "checkout", "-q", "--detach", "FETCH_HEAD"], cwd=path)
+    return run_git(["rev-parse", "HEAD"], cwd=path)
+
+def git_fetch_repository(url, path, ref, sparse_paths):
+    """Create or update a sparse shallow checkout of url at ref; return the checked out commit
+
+    An existing checkout is updated with an incremental depth-1 fetch. A tree
+    that was extracted from an archive is replaced by a fresh checkout.
+    """
+    if is_git_checkout(path):
+        run_git(["remote", "set-url", "origin", url], cwd=path)
+        run_git(["sparse-checkout", "set"] + list(sparse_paths), cwd=path)
+        return fetch_ref(path, ref)
+
+    parent_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.git-", dir=parent_dir)
+    try:
+        init_sparse_repository(staging_dir, url, sparse_paths)
+        commit = fetch_ref(staging_dir, ref)
+        replace_directory(staging_dir, path)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    return commit
@@ -0,0 +1,62 @@
+﻿#!/usr/bin/env python3
+"""
+Declarative manifest of the repositories to fetch, with pinned versions.
+"""
+import os
+import json
+from esp_thread_setup.config.constants import (
+    HOME_DIR, REPOSITORY_MANIFEST, REPOSITORY_FETCH_BACKEND, ESP_THREAD_BR_PATH, ESP_THREAD_BR_VERSION,
+    ESP_THREAD_BR_GIT_URL, ESP_THREAD_BR_REF, ESP_THREAD_BR_SPARSE_PATHS
+)
+
+# Used when no manifest file exists. `archive_url` may contain {version}.
+DEFAULT_REPOSITORIES = [
+    {
+        "name": "esp-thread-br",
+        "path": ESP_THREAD_BR_PATH,
+        "version": ESP_THREAD_BR_VERSION or ESP_THREAD_BR_REF,
+        "archive_url": "https://github.com/espressif/esp-thread-br/archive/{version}.zip",
+        "git_url": ESP_THREAD_BR_GIT_URL,
+        "sparse_paths": ESP_THREAD_BR_SPARSE_PATHS,
+    }
+]
+
+def normalize_repository(entry):
+    """Validate one manifest entry and fill in its defaults"""
+    if not entry.get("name"):
+        raise ValueError("Repository manifest entry without a name")
+    name = entry["name"]
+    if not entry.get("archive_url") and not entry.get("git_url"):
+        raise ValueError(f"Repository '{name}' needs an archive_url or a git_url")
+
+    repository = {
+        "name": name,
+        "path": os.path.expanduser(entry.get("path", f"{HOME_DIR}/esp/{name}")),
+        "version": entry.get("version", "main"),
+        "git_url": entry.get("git_url"),
+        "sparse_paths": entry.get("sparse_paths", []),
+        "sha256": entry.get("sha256"),
+        "backend": entry.get("backend") or (REPOSITORY_FETCH_BACKEND if entry.get("archive_url") else "git"),
+    }
+    if entry.get("archive_url"):
+        repository["archive_url"] = entry["archive_url"].format(version=repository["version"])
+    if repository["backend"] == "git" and not repository["git_url"]:
+        raise ValueError(f"Repository '{name}' uses the git backend but has no git_url")
+    if repository["backend"] in ("archive", "store") and not entry.get("archive_url"):
+        raise ValueError(f"Repository '{name}' uses the archive backend but has no archive_url")
+    return repository
+
+def load_repository_manifest(manifest_path=REPOSITORY_MANIFEST):
+    """Load the repository manifest (a JSON list of entries), falling back to the defaults"""
+    entries = DEFAULT_REPOSITORIES
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = entries.get("repositories", [])
+
+    repositories = [normalize_repository(entry) for entry in entries]
+    names = [repository["name"] for repository in repositories]
+    if len(names) != len(set(names)):
+        raise ValueError("Repository manifest contains duplicate names")
+    return repositories
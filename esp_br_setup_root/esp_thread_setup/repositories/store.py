@@ -0,0 +1,158 @@
+﻿#!/usr/bin/env python3
+"""
+Content-addressed storage of repository versions.
+
+Every file is stored once as a read-only blob named after its SHA-256. A
+version is a tree of hardlinks (or reflinks/copies across filesystems) to
+those blobs, so versions that share files share disk space.
+"""
+import os
+import json
+import errno
+import shutil
+import hashlib
+import zipfile
+import tempfile
+from esp_thread_setup.config.constants import OBJECT_STORE_DIR, ESP_THREAD_BR_VERSIONS_DIR
+from esp_thread_setup.repositories.extract import (archive_members, create_links, is_symlink, make_staging_dir,
+                                                   member_target, replace_directory, write_manifest)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Linux ioctl that clones file extents (reflink) on btrfs/xfs
+FICLONE = 0x40049409
+
+def blob_path(sha256, executable, store_dir=OBJECT_STORE_DIR):
+    """Path of a blob; executables are kept apart because links share permissions"""
+    suffix = ".x" if executable else ""
+    return os.path.join(store_dir, sha256[:2], sha256[2:] + suffix)
+
+def load_index(store_dir=OBJECT_STORE_DIR):
+    """Map of zip entry 'crc-size' keys to the blob digests last stored for them"""
+    index_path = os.path.join(store_dir, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, "r") as f:
+        return json.load(f)
+
+def save_index(index, store_dir=OBJECT_STORE_DIR):
+    """Atomically write the blob index"""
+    index_path = os.path.join(store_dir, "index.json")
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+
+def member_digest(zip_ref, info):
+    """SHA-256 of a zip member's content"""
+    hasher = hashlib.sha256()
+    with zip_ref.open(info) as src:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def store_member(zip_ref, info, executable, index, store_dir=OBJECT_STORE_DIR):
+    """Make sure a zip member is in the store; return (blob path, True if the blob is new)"""
+    key = f"{info.CRC:08x}-{info.file_size}"
+    # CRC-32 and size only find a candidate, files of the same size can share a CRC
+    if key in index and os.path.exists(blob_path(index[key], executable, store_dir)) \
+            and member_digest(zip_ref, info) == index[key]:
+        return blob_path(index[key], executable, store_dir), False
+
+    os.makedirs(store_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=store_dir)
+    try:
+        with zip_ref.open(info) as src, os.fdopen(fd, "wb") as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                hasher.update(chunk)
+                dst.write(chunk)
+        digest = hasher.hexdigest()
+        path = blob_path(digest, executable, store_dir)
+        created = not os.path.exists(path)
+        if not created:
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(temp_path, 0o555 if executable else 0o444)
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    index[key] = digest
+    return path, created
+
+def link_blob(blob, target):
+    """Hardlink a blob into a tree, falling back to a reflink or a plain copy"""
+    try:
+        os.link(blob, target)
+        return
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM):
+            raise
+    with open(blob, "rb") as src, open(target, "wb") as dst:
+        try:
+            if fcntl is None:
+                raise OSError(errno.ENOTSUP, "reflinks are not supported here")
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    shutil.copymode(blob, target)
+
+def materialize_version(zip_path, dest_path, store_dir=OBJECT_STORE_DIR):
+    """Build dest_path from an archive as links into the object store; return the number of new blobs"""
+    index = load_index(store_dir)
+    new_blobs = 0
+    parent_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(parent_dir, exist_ok=True)
+    staging_dir = make_staging_dir(dest_path)
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            members = archive_members(zip_ref)
+            links = []
+            for info, relative_path in members:
+                target = member_target(staging_dir, relative_path)
+                if info.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if is_symlink(info):
+                    links.append((info.filename, relative_path))
+                    continue
+                blob, created = store_member(zip_ref, info, bool((info.external_attr >> 16) & 0o111), index, store_dir)
+                link_blob(blob, target)
+                new_blobs += created
+        # Links are created last, so no blob is ever linked through one
+        create_links(zip_path, links, staging_dir)
+        write_manifest(staging_dir, members)
+        replace_directory(staging_dir, dest_path)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    finally:
+        save_index(index, store_dir)
+    return new_blobs
+
+def list_versions(versions_dir=ESP_THREAD_BR_VERSIONS_DIR):
+    """Names of the materialized versions"""
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(d for d in os.listdir(versions_dir) if not d.startswith("."))
+
+def collect_garbage(store_dir=OBJECT_STORE_DIR):
+    """Delete blobs no version links to any more; return the number of bytes freed"""
+    freed = 0
+    for root, _, files in os.walk(store_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if name == "index.json" or root == store_dir:
+                continue
+            info = os.stat(path)
+            if info.st_nlink == 1:
+                freed += info.st_size
+                os.remove(path)
+    return freed
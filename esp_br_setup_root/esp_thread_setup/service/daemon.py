@@ -0,0 +1,290 @@
+﻿#!/usr/bin/env python3
+"""
+Long-running provisioning daemon with a job queue and a local HTTP/JSON API.
+
+    POST   /jobs              {"kind": "provision", "params": {"port": ..., "profile": ...}}
+    GET    /jobs              all jobs
+    GET    /jobs/<id>         one job
+    GET    /jobs/<id>/events  progress events as JSON lines, streamed until the job ends
+    DELETE /jobs/<id>         cancel a queued job
+    GET    /health            daemon and ESP-IDF environment status
+    GET    /metrics           Prometheus metrics of the jobs run so far
+
+The ESP-IDF environment, esptool and serial consoles are loaded once and kept
+across jobs. Jobs run on a bounded worker pool, one job per serial port at a
+time: a job is only handed to the pool once its ports are free, so jobs
+waiting for a busy board never hold a worker.
+"""
+import json
+import time
+import uuid
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from concurrent.futures import ThreadPoolExecutor
+from esp_thread_setup.config.constants import DAEMON_HOST, DAEMON_PORT, DAEMON_WORKERS, METRICS_TEXTFILE
+from esp_thread_setup.service.jobs import JOB_KINDS, JobError, resolve_params
+from esp_thread_setup.utils.console import ConsoleSessions
+from esp_thread_setup.utils.events import emit as emit_event, step_context
+from esp_thread_setup.utils.metrics import record_step, render_metrics, write_textfile
+from esp_thread_setup.setup.timings import record_timing
+from esp_thread_setup.utils.logs import print_success, print_error, print_info, print_note
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+# Job parameters and results that are never returned by the API
+SECRET_KEYS = ("wifi_password", "network_key", "pskc", "dataset", "dataset_tlvs")
+
+def job_ports(params):
+    """Serial ports a job needs to itself"""
+    return {params[key] for key in ("port", "border_router_port") if params.get(key)}
+
+class JobQueue:
+    """Jobs, their progress events and the worker pool running them"""
+
+    def __init__(self, workers=DAEMON_WORKERS, metrics_file=METRICS_TEXTFILE):
+        self.jobs = {}
+        self.metrics_file = metrics_file
+        self.sessions = ConsoleSessions()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._changed = threading.Condition()
+        # Jobs waiting for their ports, oldest first, and the ports of dispatched jobs
+        self._waiting = []
+        self._busy_ports = set()
+        self._closed = False
+
+    def submit(self, kind, params):
+        """Queue a job and return it"""
+        if kind not in JOB_KINDS:
+            raise JobError(f"Unknown job kind '{kind}', expected one of {', '.join(JOB_KINDS)}")
+        if not isinstance(params, dict):
+            raise JobError("'params' must be a JSON object")
+        try:
+            resolved = resolve_params(params)
+        except (OSError, ValueError) as e:
+            raise JobError(f"Cannot resolve the job parameters: {e}")
+        job = {"id": uuid.uuid4().hex[:12], "kind": kind, "params": params, "resolved": resolved,
+               "ports": job_ports(resolved), "status": "queued", "created": time.time(),
+               "result": None, "error": None, "events": [], "future": None}
+        with self._changed:
+            self.jobs[job["id"]] = job
+            self._waiting.append(job)
+            self.emit(job, "queued", f"{kind} job queued")
+        self._dispatch()
+        return job
+
+    def _dispatch(self):
+        """Hand every waiting job whose ports are free to the worker pool, oldest first"""
+        with self._changed:
+            if self._closed:
+                return
+            for job in list(self._waiting):
+                if job["ports"] & self._busy_ports:
+                    continue
+                self._waiting.remove(job)
+                self._busy_ports |= job["ports"]
+                job["future"] = self._pool.submit(self._run, job)
+
+    def _release(self, job):
+        """Free a job's ports and dispatch the jobs waiting for them"""
+        with self._changed:
+            self._busy_ports -= job["ports"]
+        self._dispatch()
+
+    def emit(self, job, event, message, **fields):
+        """Append a progress event to a job, wake up event streams and log it"""
+        with self._changed:
+            job["events"].append(dict(fields, seq=len(job["events"]), time=time.time(),
+                                      event=event, message=message))
+            self._changed.notify_all()
+        level = {"failed": "error", "succeeded": "success"}.get(event, "info")
+        emit_event(level, message, **dict(fields, job=job["id"], device=job["resolved"].get("port")))
+
+    def _set_status(self, job, status, message, **fields):
+        job["status"] = status
+        self.emit(job, status, message, **fields)
+
+    def _run(self, job):
+        try:
+            self._run_job(job)
+        finally:
+            self._release(job)
+
+    def _run_job(self, job):
+        with self._changed:
+            if job["status"] == "cancelled":
+                return
+            self._set_status(job, "running", f"{job['kind']} job started")
+        started = time.monotonic()
+        params = job["resolved"]
+        try:
+            with step_context(job["kind"], params.get("port")):
+                emit = lambda event, message, **fields: self.emit(job, event, message, **fields)
+                job["result"] = JOB_KINDS[job["kind"]](params, emit, self.sessions)
+            self._set_status(job, "succeeded", f"{job['kind']} job finished")
+        except Exception as e:
+            job["error"] = str(e)
+            self._set_status(job, "failed", f"{job['kind']} job failed: {e}")
+        elapsed, succeeded = time.monotonic() - started, job["status"] == "succeeded"
+        record_step(job["kind"], job["params"].get("port"), elapsed, succeeded)
+        record_timing(job["kind"], elapsed, succeeded, job["params"].get("port"))
+        try:
+            write_textfile(self.metrics_file)
+        except OSError as e:
+            emit_event("warning", f"Cannot write the metrics textfile: {e}")
+
+    def cancel(self, job):
+        """Cancel a job that has not started yet; return False if it is already running"""
+        with self._changed:
+            if job["status"] != "queued":
+                return False
+            if job in self._waiting:
+                self._waiting.remove(job)
+            elif job["future"].cancel():
+                self._busy_ports -= job["ports"]
+            else:
+                return False
+            self._set_status(job, "cancelled", "Job cancelled")
+        self._dispatch()
+        return True
+
+    def wait_for_events(self, job, after, timeout=30.0):
+        """Events with seq >= after, waiting up to timeout for new ones while the job runs"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: len(job["events"]) > after or job["status"] in FINISHED_STATES, timeout)
+            return job["events"][after:]
+
+    def shutdown(self):
+        """Stop accepting work, finish running jobs and close the serial consoles"""
+        with self._changed:
+            self._closed = True
+        self._pool.shutdown(wait=True)
+        self.sessions.close_all()
+
+def redact(value):
+    """Copy of job parameters or results with Wi-Fi passwords, network keys and datasets masked"""
+    if isinstance(value, dict):
+        return {key: "***" if key in SECRET_KEYS and item else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+def job_summary(job, with_events=False):
+    """JSON-safe view of a job, without secrets"""
+    summary = {key: redact(job[key]) for key in ("id", "kind", "params", "status", "created", "result", "error")}
+    if with_events:
+        summary["events"] = job["events"]
+    return summary
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/JSON front end of the job queue"""
+    queue = None
+    environment = None
+
+    def send_json(self, status, body):
+        self.send_text(status, json.dumps(body), "application/json")
+
+    def send_text(self, status, text, content_type):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def find_job(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        job = self.queue.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job is None:
+            self.send_json(404, {"error": "No such job"})
+        return job, parts[2:]
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/health":
+            self.send_json(200, {"status": "ok", "environment": self.environment,
+                                 "jobs": len(self.queue.jobs)})
+        elif path == "/metrics":
+            self.send_text(200, render_metrics(), "text/plain; version=0.0.4")
+        elif path == "/jobs":
+            self.send_json(200, [job_summary(job) for job in list(self.queue.jobs.values())])
+        elif path.startswith("/jobs/"):
+            job, rest = self.find_job()
+            if job is None:
+                return
+            if rest == ["events"]:
+                self.stream_events(job)
+            else:
+                self.send_json(200, job_summary(job, with_events=True))
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def stream_events(self, job):
+        """Write events as JSON lines until the job has finished; the connection close ends the stream"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        sent = 0
+        while True:
+            events = self.queue.wait_for_events(job, sent)
+            for event in events:
+                self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            sent += len(events)
+            if job["status"] in FINISHED_STATES and sent == len(job["events"]):
+                break
+        self.close_connection = True
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self.send_json(404, {"error": "Not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            job = self.queue.submit(request.get("kind"), request.get("params", {}))
+        except (ValueError, AttributeError, JobError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        self.send_json(202, job_summary(job))
+
+    def do_DELETE(self):
+        job, _ = self.find_job()
+        if job is None:
+            return
+        if not self.queue.cancel(job):
+            self.send_json(409, {"error": f"Job is {job['status']}, only queued jobs can be cancelled"})
+            return
+        self.send_json(200, job_summary(job))
+
+    def log_message(self, format, *args):
+        pass
+
+class DaemonServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def serve_daemon(host=DAEMON_HOST, port=DAEMON_PORT, workers=DAEMON_WORKERS, metrics_file=METRICS_TEXTFILE):
+    """Warm up the environment and serve the job API until interrupted"""
+    from esp_thread_setup.setup.environment import activate_idf_environment, probe_environment
+    from esp_thread_setup.firmware.flasher import load_esptool
+
+    print_info("Loading the ESP-IDF environment...")
+    activate_idf_environment()
+    environment = probe_environment()
+    if environment is None:
+        print_error("ESP-IDF not found; build and provision jobs will fail until it is installed")
+    load_esptool()
+
+    queue = JobQueue(workers, metrics_file)
+    handler = type("Handler", (DaemonRequestHandler,), {"queue": queue, "environment": environment})
+    server = DaemonServer((host, port), handler)
+    print_success(f"✓ Provisioning daemon listening on http://{host}:{port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print_note("\nShutting down, waiting for running jobs...")
+    finally:
+        server.server_close()
+        queue.shutdown()
+    return True
@@ -0,0 +1,185 @@
+﻿#!/usr/bin/env python3
+"""
+Provisioning jobs that run without prompts: fetch, build, provision, create_dataset, join and benchmark.
+
+A job is a kind plus a dict of parameters. Parameters can come from a named
+profile (a JSON file in the profiles directory) and from a device manifest
+written by the dataset generator; explicit parameters win.
+"""
+import os
+import json
+import threading
+from esp_thread_setup.config.constants import ESP_IDF_PATH, ESP_THREAD_BR_PATH, PROFILES_DIR
+
+# Firmware projects by name: (project directory, chip target or None for the project default)
+PROJECTS = {
+    "border_router": (os.path.join(ESP_THREAD_BR_PATH, "examples/basic_thread_border_router"), None),
+    "cli": (os.path.join(ESP_IDF_PATH, "examples/openthread/ot_cli"), "esp32c6"),
+    "rcp": (os.path.join(ESP_IDF_PATH, "examples/openthread/ot_rcp"), "esp32h2"),
+}
+
+# One build at a time per project; different projects build in parallel
+_build_locks = {name: threading.Lock() for name in PROJECTS}
+
+class JobError(Exception):
+    """Raised when a job cannot run or one of its steps fails"""
+
+def load_profile(name, profiles_dir=PROFILES_DIR):
+    """Load a provisioning profile (JSON object of job parameters) by name"""
+    profile_path = os.path.join(profiles_dir, f"{name}.json")
+    if not os.path.exists(profile_path):
+        raise JobError(f"Unknown profile '{name}'")
+    with open(profile_path, "r") as f:
+        return json.load(f)
+
+def resolve_params(params):
+    """Merge a job's profile and device manifest into its parameters"""
+    from esp_thread_setup.network.generator import load_manifest
+
+    resolved = {}
+    if params.get("profile"):
+        resolved.update(load_profile(params["profile"]))
+    resolved.update(params)
+    if resolved.get("device") and not resolved.get("dataset"):
+        manifest = load_manifest(resolved["device"])
+        if manifest is None:
+            raise JobError(f"No dataset manifest for device '{resolved['device']}'")
+        resolved["dataset"] = manifest["dataset_tlvs"]
+    return resolved
+
+def project_of(params):
+    """(name, directory, target) of the project a job works on"""
+    name = params.get("project")
+    if name not in PROJECTS:
+        raise JobError(f"'project' must be one of {', '.join(PROJECTS)}")
+    project_dir, target = PROJECTS[name]
+    return name, project_dir, target
+
+def require(params, *keys):
+    """Raise JobError unless every key has a value"""
+    missing = [key for key in keys if not params.get(key)]
+    if missing:
+        raise JobError(f"Missing parameters: {', '.join(missing)}")
+
+def run_fetch(params, emit, sessions):
+    """Fetch the repositories of the manifest that are missing, or all of them with 'update'"""
+    from esp_thread_setup.repositories.download import fetch_repository
+    from esp_thread_setup.repositories.manifest import load_repository_manifest
+
+    try:
+        repositories = load_repository_manifest()
+    except (ValueError, OSError) as e:
+        raise JobError(f"Invalid repository manifest: {e}")
+    names = params.get("repositories")
+    fetched = []
+    for repository in repositories:
+        if names and repository["name"] not in names:
+            continue
+        if os.path.exists(repository["path"]) and not params.get("update"):
+            continue
+        emit("step", f"Fetching {repository['name']}", step="fetch")
+        ok, message = fetch_repository(repository)
+        if not ok:
+            raise JobError(message)
+        fetched.append(repository["name"])
+    return {"fetched": fetched}
+
+def run_build(params, emit, sessions):
+    """Build a firmware project incrementally"""
+    from esp_thread_setup.firmware.br import configure_sdkconfig
+    from esp_thread_setup.firmware.build import build_project
+
+    name, project_dir, target = project_of(params)
+    emit("step", f"Building {name}", step="build")
+    with _build_locks[name]:
+        # Same firmware as the interactive setup: RCP auto-update off, Web GUI on
+        if name == "border_router":
+            configure_sdkconfig(project_dir)
+        if not build_project(project_dir, target):
+            raise JobError(f"Building {name} failed")
+    return {"build_dir": os.path.join(project_dir, "build")}
+
+def run_provision(params, emit, sessions):
+    """Build a project if needed, then flash it with an NVS image holding the dataset and Wi-Fi credentials"""
+    from esp_thread_setup.firmware.nvs import generate_nvs_image, flash_with_nvs
+
+    require(params, "port")
+    port = params["port"]
+    name, project_dir, _ = project_of(params)
+    result = run_build(params, emit, sessions) if params.get("build", True) else {}
+
+    nvs_image, nvs_offset = None, None
+    if params.get("dataset") or params.get("wifi_ssid"):
+        emit("step", "Generating NVS image", step="nvs")
+        device_name = params.get("device") or f"{name}-{os.path.basename(port)}"
+        nvs_image, nvs_offset = generate_nvs_image(device_name, project_dir, params.get("dataset"),
+                                                   params.get("wifi_ssid"), params.get("wifi_password"))
+        if not nvs_image:
+            raise JobError("Generating the NVS image failed")
+
+    # esptool needs the port to itself
+    sessions.close(port)
+    emit("step", f"Flashing {name} on {port}", step="flash")
+    if not flash_with_nvs(port, os.path.join(project_dir, "build"), nvs_image, nvs_offset):
+        raise JobError(f"Flashing {port} failed")
+    result.update(port=port, nvs_image=nvs_image)
+    return result
+
+def run_create_dataset(params, emit, sessions):
+    """Create and commit a new dataset on a Border Router over its console"""
+    from esp_thread_setup.network.dataset import create_dataset_over_console, remember_dataset
+    from esp_thread_setup.network.generator import generate_dataset_params, load_used_values
+
+    require(params, "port")
+    network_name = params.get("network_name") or generate_dataset_params(load_used_values())["network_name"]
+    emit("step", f"Creating Thread network {network_name}", step="dataset")
+    dataset = create_dataset_over_console(params["port"], network_name, sessions.get(params["port"]))
+    if not dataset:
+        raise JobError("Creating the dataset failed")
+    # Later jobs can refer to the dataset by its manifest name ("device") instead of passing it around
+    device = remember_dataset(dataset)
+    return {"port": params["port"], "network_name": network_name, "dataset": dataset, "device": device}
+
+def run_join(params, emit, sessions):
+    """Join a CLI device to a Thread network over its console"""
+    from esp_thread_setup.network.cli_config import configure_cli_over_console
+
+    require(params, "port", "dataset")
+    emit("step", f"Joining {params['port']} to the Thread network", step="join")
+    if not configure_cli_over_console(params["port"], params["dataset"], float(params.get("timeout", 60)),
+                                      sessions.get(params["port"])):
+        raise JobError(f"{params['port']} did not join the Thread network")
+    return {"port": params["port"]}
+
+def run_benchmark(params, emit, sessions):
+    """Ping a Border Router from a joined CLI device and store the latency and loss statistics
+
+    Optional parameters: payload_sizes (list of bytes), count and interval (seconds).
+    """
+    from esp_thread_setup.network.benchmark import (run_link_benchmark, DEFAULT_PAYLOAD_SIZES,
+                                                    DEFAULT_PING_COUNT, DEFAULT_PING_INTERVAL)
+
+    require(params, "port", "border_router_port")
+    try:
+        payload_sizes = tuple(int(size) for size in params.get("payload_sizes") or DEFAULT_PAYLOAD_SIZES)
+        count = int(params.get("count") or DEFAULT_PING_COUNT)
+        interval = float(params.get("interval") or DEFAULT_PING_INTERVAL)
+    except (TypeError, ValueError):
+        raise JobError("'payload_sizes' must be a list of integers, 'count' an integer and 'interval' a number")
+    # The benchmark opens both consoles itself
+    sessions.close(params["port"])
+    sessions.close(params["border_router_port"])
+    emit("step", f"Benchmarking {params['port']} -> {params['border_router_port']}", step="benchmark")
+    result = run_link_benchmark(params["port"], params["border_router_port"], payload_sizes, count, interval)
+    if result is None:
+        raise JobError("Benchmarking the Thread link failed")
+    return result
+
+JOB_KINDS = {
+    "fetch": run_fetch,
+    "build": run_build,
+    "provision": run_provision,
+    "create_dataset": run_create_dataset,
+    "join": run_join,
+    "benchmark": run_benchmark,
+}
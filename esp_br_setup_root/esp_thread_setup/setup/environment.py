@@ -0,0 +1,243 @@
+﻿#!/usr/bin/env python3
+"""
+Probe the ESP-IDF environment once and cache the result.
+
+The probe records the IDF path, version, toolchain directories, Python
+environment and supported targets. It is reused until the mtimes of
+$IDF_PATH or the tool directories change.
+
+The variables $IDF_PATH/export.sh sets are captured once as well and put
+into os.environ, so every subprocess sees them without a sourced shell.
+"""
+import os
+import re
+import sys
+import glob
+import json
+import shutil
+import subprocess
+from esp_thread_setup.config.constants import IDF_TOOLS_PATH, ENVIRONMENT_CACHE_FILE, IDF_EXPORT_CACHE_FILE
+from esp_thread_setup.utils.metrics import record_cache
+
+# Prints the environment as JSON once export.sh has been sourced
+DUMP_ENVIRONMENT = "import json, os; print(json.dumps(dict(os.environ)))"
+
+def detect_esp_idf_path():
+    """Attempt to detect the ESP-IDF installation path."""
+    # Check if IDF_PATH is already set
+    if 'IDF_PATH' in os.environ:
+        return os.environ['IDF_PATH']
+
+    # Common installation paths to check
+    common_paths = [
+        os.path.expanduser("~/esp-idf"),  # Direct esp-idf directory
+        os.path.expanduser("~/esp/esp-idf"),
+        "/opt/esp/esp-idf",
+        "/usr/local/esp/esp-idf"
+    ]
+
+    for path in common_paths:
+        if os.path.exists(path):
+            return path
+
+    # Attempt to locate idf.py in PATH
+    idf_py_path = shutil.which("idf.py")
+    if idf_py_path:
+        return os.path.dirname(os.path.dirname(idf_py_path))
+
+    return None
+
+def mtime(path):
+    """mtime of a path, or None if it does not exist"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def cache_key(idf_path, tools_path=IDF_TOOLS_PATH):
+    """Everything the cached probe depends on; a change in any of it invalidates the cache"""
+    tools_dir = os.path.join(tools_path, "tools")
+    watched = [idf_path, os.path.join(idf_path, ".git", "HEAD"), tools_dir, os.path.join(tools_path, "python_env")]
+    watched += sorted(glob.glob(os.path.join(tools_dir, "*")))
+    return {
+        "idf_path": idf_path,
+        "idf_py": shutil.which("idf.py"),
+        "python_env": os.environ.get("IDF_PYTHON_ENV_PATH"),
+        "mtimes": {path: mtime(path) for path in watched},
+    }
+
+def read_header_version(idf_path):
+    """ESP-IDF version from esp_idf_version.h, for when idf.py is not on PATH"""
+    header = os.path.join(idf_path, "components", "esp_common", "include", "esp_idf_version.h")
+    try:
+        with open(header, "r") as f:
+            text = f.read()
+    except OSError:
+        return None
+    parts = [re.search(rf"#define\s+ESP_IDF_VERSION_{part}\s+(\d+)", text) for part in ("MAJOR", "MINOR", "PATCH")]
+    if not all(parts):
+        return None
+    return "v" + ".".join(match.group(1) for match in parts)
+
+def read_supported_targets(idf_path):
+    """Chip targets idf.py accepts, read from its constants instead of running --list-targets"""
+    constants_path = os.path.join(idf_path, "tools", "idf_py_actions", "constants.py")
+    try:
+        with open(constants_path, "r") as f:
+            text = f.read()
+    except OSError:
+        return []
+    targets = []
+    for name in ("SUPPORTED_TARGETS", "PREVIEW_TARGETS"):
+        match = re.search(rf"^{name}\s*=\s*\[([^\]]*)\]", text, re.MULTILINE)
+        if match:
+            targets += re.findall(r"['\"]([\w-]+)['\"]", match.group(1))
+    return targets
+
+def find_toolchain_paths(tools_path=IDF_TOOLS_PATH):
+    """Map of installed tool name to the bin directories of its installed versions"""
+    toolchains = {}
+    for bin_dir in sorted(glob.glob(os.path.join(tools_path, "tools", "*", "*", "*", "bin"))):
+        tool = os.path.relpath(bin_dir, os.path.join(tools_path, "tools")).split(os.sep)[0]
+        toolchains.setdefault(tool, []).append(bin_dir)
+    return toolchains
+
+def find_python_env(version, tools_path=IDF_TOOLS_PATH):
+    """The ESP-IDF Python virtualenv, from IDF_PYTHON_ENV_PATH or the one matching the IDF version"""
+    if os.environ.get("IDF_PYTHON_ENV_PATH"):
+        return os.environ["IDF_PYTHON_ENV_PATH"]
+    match = re.match(r"v?(\d+\.\d+)", version or "")
+    if not match:
+        return None
+    candidates = sorted(glob.glob(os.path.join(tools_path, "python_env", f"idf{match.group(1)}_py*_env")))
+    return candidates[-1] if candidates else None
+
+def run_probe(idf_path):
+    """Inspect the ESP-IDF installation; idf.py is run once, if it is on PATH"""
+    environment = {"idf_path": idf_path, "idf_py": shutil.which("idf.py"), "version": None}
+    if environment["idf_py"]:
+        try:
+            result = subprocess.run(["idf.py", "--version"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True, check=True)
+            environment["version"] = result.stdout.strip().split()[-1] if result.stdout.strip() else None
+        except (OSError, subprocess.CalledProcessError):
+            environment["idf_py"] = None
+    if not environment["version"]:
+        environment["version"] = read_header_version(idf_path)
+
+    environment["toolchains"] = find_toolchain_paths()
+    environment["python_env"] = find_python_env(environment["version"])
+    environment["targets"] = read_supported_targets(idf_path)
+    return environment
+
+def probe_environment(refresh=False, cache_file=ENVIRONMENT_CACHE_FILE):
+    """Return the ESP-IDF environment, probing only when the cached result is stale
+
+    Returns None if no ESP-IDF installation can be found. `idf_py` is None
+    when idf.py is not runnable (export.sh has not been sourced).
+    """
+    idf_path = detect_esp_idf_path()
+    if not idf_path or not os.path.isdir(idf_path):
+        return None
+
+    key = cache_key(idf_path)
+    if not refresh and os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r") as f:
+                cached = json.load(f)
+            if cached.get("key") == key:
+                record_cache("environment", True)
+                return cached["environment"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    record_cache("environment", False)
+    environment = run_probe(idf_path)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file + ".tmp", "w") as f:
+            json.dump({"key": key, "environment": environment}, f, indent=2)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError:
+        pass
+    return environment
+
+def capture_export_environment(idf_path):
+    """Source export.sh in a child shell and return what it changed, as a snapshot dict"""
+    shell = shutil.which("bash") or "/bin/sh"
+    script = '. "$1/export.sh" >/dev/null 2>&1 && "$2" -c "$3"'
+    env = dict(os.environ, IDF_PATH=idf_path)
+    # Keep shell startup files out of the snapshot
+    env.pop("BASH_ENV", None)
+    env.pop("ENV", None)
+    result = subprocess.run([shell, "-c", script, "export", idf_path, sys.executable, DUMP_ENVIRONMENT],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env, check=True)
+    exported = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # PATH is stored as the entries export.sh prepended, so the caller's own PATH is kept
+    current_path = env.get("PATH", "").split(os.pathsep)
+    path_prepend = [entry for entry in exported.get("PATH", "").split(os.pathsep)
+                    if entry and entry not in current_path]
+    variables = {name: value for name, value in exported.items()
+                 if name not in ("PATH", "PWD", "SHLVL", "_", "OLDPWD") and env.get(name) != value}
+    variables["IDF_PATH"] = idf_path
+    return {
+        "idf_path": idf_path,
+        "version": read_header_version(idf_path),
+        "path_prepend": path_prepend,
+        "variables": variables,
+    }
+
+def is_valid_snapshot(snapshot, idf_path):
+    """True if a captured export.sh snapshot still matches this ESP-IDF checkout"""
+    if snapshot.get("idf_path") != idf_path or snapshot.get("version") != read_header_version(idf_path):
+        return False
+    python_env = snapshot["variables"].get("IDF_PYTHON_ENV_PATH")
+    if python_env and not os.path.isdir(python_env):
+        return False
+    return all(os.path.isdir(entry) for entry in snapshot["path_prepend"])
+
+def load_export_environment(idf_path, refresh=False, cache_file=IDF_EXPORT_CACHE_FILE):
+    """Return the cached export.sh snapshot for idf_path, capturing a new one when it is stale"""
+    if not refresh and os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r") as f:
+                snapshot = json.load(f)
+            if is_valid_snapshot(snapshot, idf_path):
+                record_cache("idf_export", True)
+                return snapshot
+        except (OSError, ValueError, KeyError):
+            pass
+
+    record_cache("idf_export", False)
+    snapshot = capture_export_environment(idf_path)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file + ".tmp", "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError:
+        pass
+    return snapshot
+
+def activate_idf_environment(refresh=False):
+    """Put the export.sh environment into os.environ so every subprocess inherits it
+
+    Does nothing when the calling shell has already sourced export.sh.
+    Returns False if ESP-IDF cannot be found or export.sh fails.
+    """
+    if shutil.which("idf.py") and os.environ.get("IDF_PYTHON_ENV_PATH") and not refresh:
+        return True
+    idf_path = detect_esp_idf_path()
+    if not idf_path or not os.path.exists(os.path.join(idf_path, "export.sh")):
+        return False
+    try:
+        snapshot = load_export_environment(idf_path, refresh)
+    except (OSError, ValueError, IndexError, subprocess.CalledProcessError):
+        return False
+
+    os.environ.update(snapshot["variables"])
+    current_path = os.environ.get("PATH", "").split(os.pathsep)
+    os.environ["PATH"] = os.pathsep.join(
+        [entry for entry in snapshot["path_prepend"] if entry not in current_path] + current_path)
+    return True
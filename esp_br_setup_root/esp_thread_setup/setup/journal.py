@@ -0,0 +1,129 @@
+﻿#!/usr/bin/env python3
+"""
+Run-state journal for resuming a setup run from its last completed step.
+
+Each step is recorded with a fingerprint of its inputs, its outputs
+(artifact fingerprints, ports, dataset ID) and its status. A rerun skips a
+step that completed with the same inputs and whose outputs are still valid.
+"""
+import os
+import json
+import time
+import hashlib
+from esp_thread_setup.config.constants import RUN_JOURNAL_FILE
+from esp_thread_setup.utils.events import step_context
+from esp_thread_setup.utils.logs import print_note
+from esp_thread_setup.utils.metrics import record_step
+from esp_thread_setup.setup.timings import record_timing, describe_estimate
+
+# Build inputs of an ESP-IDF project, besides ESP-IDF itself
+PROJECT_INPUT_FILES = ("CMakeLists.txt", "partitions.csv", "dependencies.lock")
+PROJECT_INPUT_DIRS = ("main", "components")
+
+def fingerprint(value):
+    """Stable SHA-256 of a JSON-serializable value"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def files_fingerprint(paths):
+    """Fingerprint of the size and mtime of each path; missing files count too"""
+    state = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+            state.append([path, info.st_size, info.st_mtime_ns])
+        except OSError:
+            state.append([path, None, None])
+    return fingerprint(state)
+
+def project_fingerprint(project_dir):
+    """Fingerprint of the files an ESP-IDF project build depends on (sources, sdkconfig, partitions)"""
+    paths = []
+    if os.path.isdir(project_dir):
+        for name in sorted(os.listdir(project_dir)):
+            if name in PROJECT_INPUT_FILES or name.startswith("sdkconfig"):
+                paths.append(os.path.join(project_dir, name))
+    for input_dir in PROJECT_INPUT_DIRS:
+        for root, dirs, files in os.walk(os.path.join(project_dir, input_dir)):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files))
+    return files_fingerprint(paths)
+
+def firmware_fingerprint(build_dir):
+    """Fingerprint of the images a build would flash, or None if it has not been built"""
+    flasher_args_path = os.path.join(build_dir, "flasher_args.json")
+    try:
+        with open(flasher_args_path, "r") as f:
+            flash_files = json.load(f).get("flash_files", {})
+    except (OSError, ValueError):
+        return None
+    return files_fingerprint([flasher_args_path] + [os.path.join(build_dir, path) for path in flash_files.values()])
+
+def dataset_id(dataset):
+    """Short ID of a Thread dataset, so the journal does not store the network key"""
+    if not dataset:
+        return None
+    return hashlib.sha256(dataset.strip().encode("utf-8")).hexdigest()[:16]
+
+def load_journal(journal_path=RUN_JOURNAL_FILE):
+    """Load the run journal, or start an empty one"""
+    if os.path.exists(journal_path):
+        try:
+            with open(journal_path, "r") as f:
+                journal = json.load(f)
+            if isinstance(journal.get("steps"), dict):
+                return journal
+        except (OSError, ValueError):
+            pass
+    return {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "steps": {}}
+
+def save_journal(journal, journal_path=RUN_JOURNAL_FILE):
+    """Atomically write the run journal"""
+    os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+    with open(journal_path + ".tmp", "w") as f:
+        json.dump(journal, f, indent=2)
+    os.replace(journal_path + ".tmp", journal_path)
+
+def reset_journal(journal_path=RUN_JOURNAL_FILE):
+    """Forget every recorded step, so the next run starts from the beginning"""
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    return load_journal(journal_path)
+
+def run_checkpointed(journal, step_id, inputs, step, outputs_valid=None, journal_path=RUN_JOURNAL_FILE, upcoming=()):
+    """Run step() unless it completed before with the same inputs; return (success, outputs)
+
+    step() returns (success, outputs dict). outputs_valid(outputs) can reject
+    a recorded result whose artifacts are gone, which re-runs the step.
+    upcoming lists the steps after this one, for the remaining time estimate.
+    """
+    key = fingerprint(inputs)
+    entry = journal["steps"].get(step_id)
+    if entry and entry["status"] == "completed" and entry["fingerprint"] == key \
+            and (outputs_valid is None or outputs_valid(entry["outputs"])):
+        print_note(f"✓ Skipping '{step_id}': completed in an earlier run with the same inputs")
+        return True, entry["outputs"]
+
+    estimate = describe_estimate([step_id] + list(upcoming))
+    if estimate:
+        print_note(f"Running '{step_id}', predicted time left: {estimate}")
+    journal["steps"][step_id] = {"status": "running", "fingerprint": key, "outputs": {}, "started": time.time()}
+    save_journal(journal, journal_path)
+    started = time.monotonic()
+    try:
+        with step_context(step_id):
+            success, outputs = step()
+    except BaseException:
+        elapsed = time.monotonic() - started
+        record_step(step_id, None, elapsed, False)
+        record_timing(step_id, elapsed, False)
+        journal["steps"][step_id]["status"] = "failed"
+        save_journal(journal, journal_path)
+        raise
+    elapsed = time.monotonic() - started
+    record_step(step_id, None, elapsed, success)
+    record_timing(step_id, elapsed, success)
+
+    journal["steps"][step_id].update(status="completed" if success else "failed",
+                                     outputs=outputs or {}, finished=time.time())
+    save_journal(journal, journal_path)
+    return success, outputs or {}
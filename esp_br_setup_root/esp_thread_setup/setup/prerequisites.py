@@ -2,74 +2,34 @@
 """
 Check prerequisites for ESP Thread setup.
 """
-
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../..")))
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..", "esp_br_setup_root")))
-
 import os
-import subprocess
 from esp_thread_setup.config.constants import ESP_THREAD_BR_PATH
-from esp_thread_setup.utils.logs import print_success, print_error, print_warning, print_info, run_command_with_minimal_output
+from esp_thread_setup.setup.environment import probe_environment, activate_idf_environment
+from esp_thread_setup.config.answers import ask_yes_no
+from esp_thread_setup.utils.logs import print_success, print_error, print_warning, print_info, print_note
 
 # Define the global flag for repository checks
 repositories_checked = False
 
-ESP_IDF_PATH = "/home/jakub/esp-idf"
-
-def detect_esp_idf_path():
-    """Attempt to detect the ESP-IDF installation path."""
-    import shutil
-
-    # Check if IDF_PATH is already set
-    if 'IDF_PATH' in os.environ:
-        return os.environ['IDF_PATH']
-
-    # Common installation paths to check
-    common_paths = [
-        os.path.expanduser("~/esp-idf"),  # Direct esp-idf directory
-        os.path.expanduser("~/esp/esp-idf"),
-        "/opt/esp/esp-idf",
-        "/usr/local/esp/esp-idf"
-    ]
-
-    for path in common_paths:
-        if os.path.exists(path):
-            return path
-
-    # Attempt to locate idf.py in PATH
-    idf_py_path = shutil.which("idf.py")
-    if idf_py_path:
-        return os.path.dirname(os.path.dirname(idf_py_path))
-
-    return None
-
-# Update the check_prerequisites function to use detect_esp_idf_path
-ESP_IDF_PATH = detect_esp_idf_path()
-
-if not ESP_IDF_PATH:
-    print_error("ERROR: Unable to detect ESP-IDF installation.")
-    print("Please install ESP-IDF and set the IDF_PATH environment variable.")
-    exit(1)
-
 def check_prerequisites():
     """Check if ESP-IDF environment is properly set up"""
     print_info("Checking prerequisites...")
     skip_repositories = False
 
-    # Check if ESP-IDF is installed and sourced
-    if not os.path.exists(ESP_IDF_PATH):
-        print_error("ERROR: ESP-IDF not found at:", ESP_IDF_PATH)
-        print("Please install ESP-IDF and set IDF_PATH environment variable")
+    # Load the cached export.sh environment, so a fresh shell (cron, systemd) works too
+    activate_idf_environment()
+
+    # Check if ESP-IDF is installed and sourced; the probe is cached between runs
+    environment = probe_environment()
+    if environment is None:
+        print_error("ERROR: ESP-IDF not found")
+        print_note("Please install ESP-IDF and set IDF_PATH environment variable")
         return False, skip_repositories
 
     # Check if required ESP-IDF tools are available
-    try:
-        run_command_with_minimal_output(["idf.py", "--version"], "Verifying ESP-IDF version")
-    except Exception as e:
+    if not verify_esp_idf_version(environment):
         print_error("ESP-IDF tools not found. Have you sourced export.sh?")
-        print("Run: . $IDF_PATH/export.sh")
+        print_note("Run: . $IDF_PATH/export.sh")
         return False, skip_repositories
 
     print_success("✓ ESP-IDF environment is properly set up")
@@ -85,32 +45,29 @@ def check_prerequisites():
     br_exists = os.path.exists(ESP_THREAD_BR_PATH)
 
     if br_exists:
-        print("\nDetected existing repositories:")
-        print(f"- ESP Thread Border Router found at: {ESP_THREAD_BR_PATH}")
+        print_note("\nDetected existing repositories:")
+        print_note(f"- ESP Thread Border Router found at: {ESP_THREAD_BR_PATH}")
 
-        response = input("\nDo you want to skip repository setup and use existing ones? (y/n): ")
-        if response.lower() == 'y':
+        if ask_yes_no("skip_repositories", "\nDo you want to skip repository setup and use existing ones? (y/n): ", default=False):
             skip_repositories = True
-            print("✓ Will use existing repositories")
+            print_note("✓ Will use existing repositories")
             return True, skip_repositories  # Exit early if skipping repositories
         else:
-            print("Will download/update repositories...")
+            print_note("Will download/update repositories...")
 
     return True, skip_repositories
 
-def verify_esp_idf_version():
-    """Verify that the detected ESP-IDF version is compatible."""
-    try:
-        result = subprocess.run(["idf.py", "--version"], capture_output=True, text=True, check=True)
-        version = result.stdout.strip()
-        print(f"Detected ESP-IDF version: {version}")
+def verify_esp_idf_version(environment=None):
+    """Verify that the detected ESP-IDF version is compatible; return False if idf.py cannot run."""
+    environment = environment or probe_environment()
+    if environment is None or not environment["idf_py"]:
+        print_error("ERROR: Unable to verify ESP-IDF version: idf.py is not available")
+        return False
 
-        # Ensure the version matches the expected format and is compatible
-        if not version.startswith("v5.2.4"):
-            print_warning("WARNING: Detected ESP-IDF version may not be compatible. Expected v5.2.4.")
-    except Exception as e:
-        print_error(f"ERROR: Unable to verify ESP-IDF version: {e}")
-        exit(1)
+    version = environment["version"] or ""
+    print_note(f"Detected ESP-IDF version: {version}")
 
-# Call the version verification function
-verify_esp_idf_version()
\ No newline at end of file
+    # Ensure the version matches the expected format and is compatible
+    if not version.startswith("v5.2.4") and "v5.2.4" not in version:
+        print_warning("WARNING: Detected ESP-IDF version may not be compatible. Expected v5.2.4.")
+    return True
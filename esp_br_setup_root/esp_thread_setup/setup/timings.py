@@ -0,0 +1,162 @@
+﻿#!/usr/bin/env python3
+"""
+History of step durations in a local SQLite database.
+
+Every finished step is recorded with its context (chip target, build cache
+hit or miss, board, host). The history predicts how long steps will take and
+flags a step as regressed when it runs slower than its rolling p95.
+"""
+import os
+import time
+import socket
+import sqlite3
+import threading
+from esp_thread_setup.config.constants import TIMINGS_DB
+from esp_thread_setup.utils.logs import print_warning
+
+# Recent successful runs of a step that predictions and the p95 are based on
+ROLLING_WINDOW = 20
+# Runs needed before a step can be flagged as regressed
+MIN_SAMPLES = 10
+# Runs in the same context needed before a prediction ignores the other contexts
+MIN_CONTEXT_SAMPLES = 3
+# Recorded context a run is compared within: a cold build is not a slow incremental one
+CONTEXT_FIELDS = ("target", "cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS step_timings (
+    step TEXT NOT NULL,
+    finished REAL NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    target TEXT,
+    cache TEXT,
+    board TEXT,
+    host TEXT,
+    regressed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS step_timings_step ON step_timings (step, finished);
+"""
+
+_context = threading.local()
+
+def connect(db_path=TIMINGS_DB):
+    """Open the timing database, creating it if needed"""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=10)
+    connection.executescript(SCHEMA)
+    return connection
+
+def note_timing_context(**fields):
+    """Attach context (target, cache) to the step this thread is running"""
+    if not hasattr(_context, "fields"):
+        _context.fields = {}
+    _context.fields.update({key: value for key, value in fields.items() if value is not None})
+
+def nearest_rank(values, pct):
+    """The pct-th percentile of values by the nearest-rank method"""
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)]
+
+def recent_durations(connection, step, host=None, context=None, min_samples=1, widen_context=True):
+    """Durations of the step's latest successful runs, newest first
+
+    Runs on this host and in the same context (target, cache) are preferred.
+    With fewer than min_samples of them the history widens to other hosts,
+    then (if widen_context) to other contexts.
+    """
+    context = {key: value for key, value in (context or {}).items() if key in CONTEXT_FIELDS and value is not None}
+    attempts = [dict(context, host=host), context]
+    if widen_context or not context:
+        attempts += [{"host": host}, {}]
+    query = "SELECT duration FROM step_timings WHERE step = ? AND success = 1{} ORDER BY finished DESC LIMIT ?"
+    durations = []
+    for filters in attempts:
+        filters = {key: value for key, value in filters.items() if value is not None}
+        conditions = "".join(f" AND {key} = ?" for key in filters)
+        rows = connection.execute(query.format(conditions), (step, *filters.values(), ROLLING_WINDOW)).fetchall()
+        durations = [row[0] for row in rows]
+        if len(durations) >= min_samples:
+            break
+    return durations
+
+def last_context(connection, step, host=None):
+    """Context of the step's latest successful run, preferring this host; the next run most likely shares it"""
+    query = f"SELECT {', '.join(CONTEXT_FIELDS)} FROM step_timings WHERE step = ? AND success = 1{{}} " \
+            "ORDER BY finished DESC LIMIT 1"
+    row = connection.execute(query.format(" AND host = ?"), (step, host)).fetchone() if host else None
+    row = row or connection.execute(query.format(""), (step,)).fetchone()
+    return dict(zip(CONTEXT_FIELDS, row)) if row else {}
+
+def record_timing(step, seconds, success, board=None, db_path=TIMINGS_DB):
+    """Store a finished step with its context; warn and return True if it regressed"""
+    fields = getattr(_context, "fields", {})
+    _context.fields = {}
+    host = socket.gethostname()
+    try:
+        connection = connect(db_path)
+        try:
+            # Only runs of the same context are compared, or every cold build would regress
+            history = recent_durations(connection, step, host, fields, MIN_SAMPLES, widen_context=False)
+            p95 = nearest_rank(history, 95) if len(history) >= MIN_SAMPLES else None
+            regressed = bool(success and p95 is not None and seconds > p95)
+            with connection:
+                connection.execute(
+                    "INSERT INTO step_timings (step, finished, duration, success, target, cache, board, host, regressed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (step, time.time(), seconds, int(bool(success)), fields.get("target"), fields.get("cache"),
+                     board, host, int(regressed)))
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print_warning(f"Cannot record the timing of '{step}': {e}")
+        return False
+
+    if regressed:
+        print_warning(f"Step '{step}' took {format_duration(seconds)}, slower than its rolling p95 of "
+                      f"{format_duration(p95)} over the last {len(history)} runs")
+    return regressed
+
+def predict_durations(steps, db_path=TIMINGS_DB):
+    """Predicted seconds (median of recent runs) per step; steps without history are left out"""
+    if not os.path.exists(db_path):
+        return {}
+    host = socket.gethostname()
+    predictions = {}
+    try:
+        connection = connect(db_path)
+        try:
+            for step in steps:
+                context = last_context(connection, step, host)
+                history = recent_durations(connection, step, host, context, MIN_CONTEXT_SAMPLES)
+                if history:
+                    predictions[step] = nearest_rank(history, 50)
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return {}
+    return predictions
+
+def format_duration(seconds):
+    """Human readable duration, e.g. '4m 05s'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+def estimate_remaining(steps, db_path=TIMINGS_DB):
+    """(predicted seconds, steps without history) for running steps in order"""
+    predictions = predict_durations(steps, db_path)
+    return sum(predictions.values()), [step for step in steps if step not in predictions]
+
+def describe_estimate(steps, db_path=TIMINGS_DB):
+    """'~4m 05s' for the steps, noting those without history; None if there is no history at all"""
+    seconds, unknown = estimate_remaining(steps, db_path)
+    if len(unknown) == len(steps):
+        return None
+    text = f"~{format_duration(seconds)}"
+    if unknown:
+        text += f" (+ {len(unknown)} step{'s' if len(unknown) > 1 else ''} without timing history)"
+    return text
@@ -0,0 +1,506 @@
+﻿#!/usr/bin/env python3
+"""
+Simulate ESP OpenThread CLI boards (ot_cli, or a Border Router console) on pseudo-terminals.
+
+Each simulated device is a PTY that answers OpenThread CLI commands the way
+a board does: echo, output lines, "Done" or "Error N: ...", and the "> "
+prompt. Devices of one simulator share a simulated radio, so a CLI that
+commits the dataset of a simulated Border Router attaches to it, can ping it
+and shows up in its neighbor table.
+
+A link to every PTY is kept in SIMULATOR_DIR while the simulator runs;
+find_device_port() offers those links like real ESP ports. Command latency,
+failures and dropped responses can be injected to test the automation.
+"""
+import os
+import pty
+import time
+import tty
+import random
+import signal
+import select
+import secrets
+import threading
+import ipaddress
+from esp_thread_setup.config.constants import SIMULATOR_DIR
+from esp_thread_setup.network.dataset import params_to_tlvs, tlvs_to_params
+from esp_thread_setup.utils.logs import print_info, print_note, print_success
+
+THREAD_CHANNELS = range(11, 27)
+JOINED_STATES = ("child", "router", "leader")
+
+# Simulation knobs; times are in seconds and scaled by time_scale where a real board takes time
+DEFAULT_OPTIONS = {
+    "latency": 0.01,          # delay before a command's response
+    "jitter": 0.005,          # random extra delay, up to this much
+    "error_rate": 0.0,        # probability that a command fails with "Error 1: Failed"
+    "drop_rate": 0.0,         # probability that a command gets no response at all
+    "ping_rtt_ms": 15.0,      # median ping round trip
+    "ping_loss": 0.0,         # probability that a ping reply is lost
+    "attach_time": 2.0,       # time from `thread start` until the device has a role
+    "time_scale": 1.0,        # factor for scan, ping and attach times (< 1 runs faster than a board)
+}
+
+def new_dataset_params():
+    """Random parameters like `dataset init new` creates"""
+    return {
+        "network_name": f"OpenThread-{secrets.randbelow(0x10000):04x}",
+        "ext_pan_id": secrets.token_hex(8),
+        "pan_id": f"0x{secrets.randbelow(0xffff):04x}",
+        "network_key": secrets.token_hex(16),
+        "channel": str(random.choice(THREAD_CHANNELS)),
+        "mesh_local_prefix": str(ipaddress.IPv6Address(b"\xfd" + secrets.token_bytes(5) + bytes(10))),
+        "pskc": secrets.token_hex(16),
+        "active_timestamp": "1",
+    }
+
+def format_dataset(params):
+    """Dataset parameters as printed by `dataset active`"""
+    return [
+        f"Active Timestamp: {params['active_timestamp'] or 1}",
+        f"Channel: {params['channel']}",
+        "Channel Mask: 0x07fff800",
+        f"Ext PAN ID: {params['ext_pan_id']}",
+        f"Mesh Local Prefix: {ipaddress.IPv6Network(params['mesh_local_prefix'] + '/64', strict=False)}",
+        f"Network Key: {params['network_key']}",
+        f"Network Name: {params['network_name']}",
+        f"PAN ID: {params['pan_id']}",
+        f"PSKc: {params['pskc']}",
+        "Security Policy: 672 onrc 0",
+    ]
+
+def format_table(header, rows):
+    """An OpenThread CLI table"""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    line = lambda cells: "| " + " | ".join(str(cell).ljust(width) for cell, width in zip(cells, widths)) + " |"
+    return [line(header), "+" + "+".join("-" * (width + 2) for width in widths) + "+"] + [line(row) for row in rows]
+
+class CommandError(Exception):
+    """An OpenThread error, printed as 'Error <code>: <name>'"""
+
+    def __init__(self, code, name):
+        super().__init__(f"Error {code}: {name}")
+
+INVALID_ARGS = CommandError(7, "InvalidArgs")
+INVALID_STATE = CommandError(13, "InvalidState")
+INVALID_COMMAND = CommandError(35, "InvalidCommand")
+
+class SimulatedRadio:
+    """The 802.15.4 medium shared by the devices of one simulator"""
+
+    def __init__(self):
+        self.devices = []
+        # Reentrant: a device settling its role looks at the roles of its peers
+        self.lock = threading.RLock()
+        # Background energy per channel, in dBm
+        self.channel_energy = {channel: random.randint(-100, -70) for channel in THREAD_CHANNELS}
+
+    def peers(self, device):
+        """Attached devices in the same Thread network as device"""
+        with self.lock:
+            return [peer for peer in self.devices if peer is not device and peer.attached()
+                    and peer.network_id() == device.network_id()]
+
+    def networks(self, exclude=None):
+        """One attached device per Thread network heard on the air"""
+        found = {}
+        with self.lock:
+            for device in self.devices:
+                if device is not exclude and device.attached():
+                    found.setdefault(device.network_id(), device)
+        return list(found.values())
+
+class SimulatedDevice:
+    """One simulated board behind a pseudo-terminal"""
+
+    def __init__(self, name, radio, options=None):
+        self.name = name
+        self.radio = radio
+        self.options = dict(DEFAULT_OPTIONS, **(options or {}))
+        self.ext_addr = secrets.token_hex(8)
+        self.mleid_iid = secrets.token_bytes(8)
+        self.started = time.monotonic()
+        self.factory_reset()
+        self.master_fd = self.slave_fd = None
+        self.port = self.link = None
+        self.running = False
+        self.thread = None
+        with radio.lock:
+            radio.devices.append(self)
+
+    def factory_reset(self):
+        self.active = None
+        self.pending = None
+        self.interface_up = False
+        self.thread_started = False
+        self.attach_at = None
+        self.role = "disabled"
+        self.rloc16 = 0xfffe
+
+    # --- pseudo-terminal ---
+
+    def open(self, link_dir=SIMULATOR_DIR):
+        """Create the PTY and a stable link to it; return the link path"""
+        self.master_fd, self.slave_fd = pty.openpty()
+        # The simulator echoes itself, the line discipline must pass bytes through unchanged
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        os.makedirs(link_dir, exist_ok=True)
+        self.link = os.path.join(link_dir, f"tty{self.name}")
+        if os.path.lexists(self.link):
+            os.remove(self.link)
+        os.symlink(self.port, self.link)
+        return self.link
+
+    def close(self):
+        self.running = False
+        # The PTY may only be closed once the serving thread stopped reading it
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        if self.link and os.path.islink(self.link):
+            os.remove(self.link)
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self.master_fd = self.slave_fd = None
+
+    def write(self, *lines):
+        os.write(self.master_fd, "".join(f"{line}\r\n" for line in lines).encode("utf-8"))
+
+    def log(self, message):
+        """An ESP-IDF log line, which the console helpers must skip"""
+        self.write(f"I ({int((time.monotonic() - self.started) * 1000)}) OPENTHREAD: {message}")
+
+    def serve(self):
+        """Answer commands until close()"""
+        buffer = b""
+        self.write("", "> ")
+        while self.running:
+            try:
+                readable, _, _ = select.select([self.master_fd], [], [], 0.2)
+                if not readable:
+                    continue
+                data = os.read(self.master_fd, 1024)
+            except (OSError, ValueError):
+                break
+            # Terminals send "\r", scripts "\n" or "\r\n"; empty lines only print a prompt
+            buffer += data.replace(b"\r", b"\n")
+            while b"\n" in buffer:
+                line, _, buffer = buffer.partition(b"\n")
+                self.respond(line.decode("utf-8", errors="replace").strip())
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, name=f"simulator-{self.name}", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def respond(self, command):
+        """Echo a command, run it with the configured latency and faults, then print the prompt"""
+        if not command:
+            self.write("> ")
+            return
+        self.write(command)
+        options = self.options
+        time.sleep(options["latency"] + random.uniform(0, options["jitter"]))
+        if random.random() < options["drop_rate"]:
+            return
+        if random.random() < options["error_rate"]:
+            self.write("Error 1: Failed", "> ")
+            return
+        try:
+            lines = self.run(command.split())
+        except CommandError as e:
+            self.write(str(e), "> ")
+            return
+        if lines is not None:
+            self.write(*(list(lines) + ["Done", "> "]))
+
+    # --- Thread state ---
+
+    def network_id(self):
+        if not self.active:
+            return None
+        return (self.active["ext_pan_id"], self.active["network_key"], self.active["channel"])
+
+    def attached(self):
+        return self.update_role() in JOINED_STATES
+
+    def update_role(self):
+        """Advance from detached to a role once the attach time has passed"""
+        with self.radio.lock:
+            if self.role == "detached" and self.attach_at is not None and time.monotonic() >= self.attach_at:
+                self.attach_at = None
+                parents = [peer for peer in self.radio.peers(self) if peer.role in ("leader", "router")]
+                if parents:
+                    self.role = "child"
+                    self.rloc16 = parents[0].rloc16 | random.randint(1, 0x1ff)
+                else:
+                    self.role = "leader"
+                    self.rloc16 = random.randint(0, 62) << 10
+                self.log(f"Role detached -> {self.role}")
+            return self.role
+
+    def mesh_local_eid(self):
+        prefix = ipaddress.IPv6Address(self.active["mesh_local_prefix"]).packed[:8]
+        return str(ipaddress.IPv6Address(prefix + self.mleid_iid))
+
+    def addresses(self):
+        link_local = str(ipaddress.IPv6Address(bytes.fromhex("fe80000000000000") + bytes.fromhex(self.ext_addr)))
+        if not self.attached():
+            return {"linklocal": link_local}
+        prefix = ipaddress.IPv6Address(self.active["mesh_local_prefix"]).packed[:8]
+        rloc = str(ipaddress.IPv6Address(prefix + bytes.fromhex(f"000000fffe00{self.rloc16:04x}")))
+        return {"mleid": self.mesh_local_eid(), "rloc": rloc, "linklocal": link_local}
+
+    # --- commands ---
+
+    def run(self, args):
+        """Run one command; return its output lines, or None if it prints no Done"""
+        name = args[0]
+        handler = getattr(self, f"cmd_{name}", None)
+        if handler is None:
+            raise INVALID_COMMAND
+        return handler(args[1:])
+
+    def cmd_help(self, args):
+        return sorted(name[4:] for name in dir(self) if name.startswith("cmd_"))
+
+    def cmd_version(self, args):
+        return ["OPENTHREAD/simulated; ESP32; " + time.strftime("%b %d %Y")]
+
+    def cmd_factoryreset(self, args):
+        self.factory_reset()
+        self.write("", "> ")
+        return None
+
+    cmd_reset = cmd_factoryreset
+
+    def cmd_state(self, args):
+        if args:
+            raise INVALID_ARGS
+        return [self.update_role()]
+
+    def cmd_ifconfig(self, args):
+        if not args:
+            return ["up" if self.interface_up else "down"]
+        if args[0] == "up":
+            self.interface_up = True
+        elif args[0] == "down":
+            if self.thread_started:
+                raise INVALID_STATE
+            self.interface_up = False
+        else:
+            raise INVALID_ARGS
+        return []
+
+    def cmd_thread(self, args):
+        if args == ["start"]:
+            if not self.interface_up or not self.active:
+                raise INVALID_STATE
+            if not self.thread_started:
+                self.thread_started = True
+                self.role = "detached"
+                self.attach_at = time.monotonic() + self.options["attach_time"] * self.options["time_scale"]
+                self.log("Role disabled -> detached")
+            return []
+        if args == ["stop"]:
+            self.thread_started = False
+            self.role, self.attach_at, self.rloc16 = "disabled", None, 0xfffe
+            return []
+        raise INVALID_ARGS
+
+    def cmd_dataset(self, args):
+        if not args:
+            if self.pending is None:
+                raise INVALID_STATE
+            return format_dataset(self.pending)
+        action, rest = args[0], args[1:]
+        if action == "init":
+            if rest == ["new"]:
+                self.pending = new_dataset_params()
+            elif rest == ["active"]:
+                if not self.active:
+                    raise INVALID_STATE
+                self.pending = dict(self.active)
+            else:
+                raise INVALID_ARGS
+            return []
+        if action == "active":
+            if not self.active:
+                raise INVALID_STATE
+            if rest == ["-x"]:
+                return [params_to_tlvs(self.active).hex()]
+            return format_dataset(self.active)
+        if action == "commit" and rest == ["active"]:
+            if self.pending is None:
+                raise INVALID_STATE
+            self.active = dict(self.pending)
+            return []
+        if action == "set" and len(rest) == 2 and rest[0] == "active":
+            try:
+                params = tlvs_to_params(bytes.fromhex(rest[1]))
+                params_to_tlvs(params)
+            except ValueError:
+                raise INVALID_ARGS
+            self.active = params
+            return []
+        if action == "clear":
+            self.pending = None
+            return []
+        fields = {"channel": "channel", "panid": "pan_id", "networkname": "network_name", "extpanid": "ext_pan_id",
+                  "networkkey": "network_key", "meshlocalprefix": "mesh_local_prefix", "pskc": "pskc",
+                  "activetimestamp": "active_timestamp"}
+        if action in fields:
+            if self.pending is None:
+                self.pending = new_dataset_params()
+            if not rest:
+                return [self.pending[fields[action]]]
+            value = " ".join(rest) if action == "networkname" else rest[0]
+            if action == "channel" and not (value.isdigit() and int(value) in THREAD_CHANNELS):
+                raise INVALID_ARGS
+            if action == "meshlocalprefix":
+                value = value.split("/")[0]
+            self.pending[fields[action]] = value
+            return []
+        raise INVALID_ARGS
+
+    def network_value(self, key):
+        if not self.active:
+            raise INVALID_STATE
+        return [self.active[key]]
+
+    def cmd_channel(self, args):
+        return self.network_value("channel")
+
+    def cmd_panid(self, args):
+        return self.network_value("pan_id")
+
+    def cmd_networkname(self, args):
+        return self.network_value("network_name")
+
+    def cmd_extpanid(self, args):
+        return self.network_value("ext_pan_id")
+
+    def cmd_networkkey(self, args):
+        return self.network_value("network_key")
+
+    def cmd_extaddr(self, args):
+        return [self.ext_addr]
+
+    def cmd_rloc16(self, args):
+        return [f"{self.rloc16:04x}"]
+
+    def cmd_ipaddr(self, args):
+        addresses = self.addresses()
+        if not args:
+            return list(addresses.values())
+        if args[0] not in ("mleid", "rloc", "linklocal"):
+            raise INVALID_ARGS
+        return [addresses[args[0]]] if args[0] in addresses else []
+
+    def cmd_scan(self, args):
+        if not args or args[0] != "energy":
+            # An active scan lists networks like discover
+            return self.cmd_discover(args)
+        if not self.interface_up:
+            raise INVALID_STATE
+        duration = int(args[1]) / 1000.0 if len(args) > 1 and args[1].isdigit() else 0.3
+        time.sleep(duration * len(THREAD_CHANNELS) * self.options["time_scale"])
+        occupied = {int(device.active["channel"]) for device in self.radio.networks(exclude=self)}
+        rows = []
+        for channel in THREAD_CHANNELS:
+            energy = self.radio.channel_energy[channel] + random.randint(-3, 3)
+            if channel in occupied:
+                energy = max(energy, random.randint(-65, -45))
+            rows.append([channel, energy])
+        return format_table(["Ch", "RSSI"], rows)
+
+    def cmd_discover(self, args):
+        if not self.interface_up:
+            raise INVALID_STATE
+        time.sleep(0.3 * len(THREAD_CHANNELS) * self.options["time_scale"])
+        rows = []
+        for device in self.radio.networks(exclude=self):
+            rows.append([device.active["network_name"], device.active["ext_pan_id"],
+                         f"{int(device.active['pan_id'], 16):04x}", device.ext_addr, device.active["channel"],
+                         random.randint(-80, -40), random.randint(0, 255)])
+        return format_table(["Network Name", "Extended PAN", "PAN", "MAC Address", "Ch", "dBm", "LQI"], rows)
+
+    def cmd_neighbor(self, args):
+        if args != ["table"]:
+            raise INVALID_ARGS
+        rows = []
+        if self.attached():
+            for peer in self.radio.peers(self):
+                rssi = random.randint(-60, -35)
+                rows.append(["C" if peer.role == "child" else "R", f"0x{peer.rloc16:04x}", random.randint(0, 120),
+                             rssi, rssi + random.randint(-3, 3), 1, 1, 1, peer.ext_addr])
+        return format_table(["Role", "RLOC16", "Age", "Avg RSSI", "Last RSSI", "R", "D", "N", "Extended MAC"], rows)
+
+    def cmd_ping(self, args):
+        """ping <address> [size] [count] [interval], replies streamed as they arrive"""
+        if not args:
+            raise INVALID_ARGS
+        try:
+            address = str(ipaddress.IPv6Address(args[0]))
+            size = int(args[1]) if len(args) > 1 else 8
+            count = int(args[2]) if len(args) > 2 else 1
+            interval = float(args[3]) if len(args) > 3 else 1.0
+        except ValueError:
+            raise INVALID_ARGS
+        if not self.attached():
+            raise INVALID_STATE
+        target = next((peer for peer in self.radio.peers(self) if address in peer.addresses().values()), None)
+
+        scale = self.options["time_scale"]
+        rtts = []
+        for sequence in range(1, count + 1):
+            # Larger payloads need more 802.15.4 fragments
+            rtt = self.options["ping_rtt_ms"] * (1 + size / 128.0) * random.uniform(0.7, 1.5)
+            if target is not None and random.random() >= self.options["ping_loss"]:
+                time.sleep(rtt / 1000.0 * scale)
+                rtts.append(rtt)
+                self.write(f"{size} bytes from {address}: icmp_seq={sequence} hlim=64 time={rtt:.0f}ms")
+            if sequence < count:
+                time.sleep(interval * scale)
+        summary = f"{count} packets transmitted, {len(rtts)} packets received."
+        if count:
+            summary += f" Packet loss = {100.0 * (count - len(rtts)) / count:.1f}%."
+        if rtts:
+            summary += f" Round-trip min/avg/max = {min(rtts):.0f}/{sum(rtts) / len(rtts):.1f}/{max(rtts):.0f} ms."
+        return [summary]
+
+def start_simulator(names, options=None, link_dir=SIMULATOR_DIR):
+    """Start one simulated device per name on a shared radio; return the running devices"""
+    radio = SimulatedRadio()
+    devices = []
+    for name in names:
+        device = SimulatedDevice(name, radio, options)
+        device.open(link_dir)
+        device.start()
+        devices.append(device)
+    return devices
+
+def stop_simulator(devices):
+    """Stop the devices and remove their links"""
+    for device in devices:
+        device.close()
+
+def run_simulator(names, options=None, link_dir=SIMULATOR_DIR):
+    """Run simulated devices until interrupted"""
+    devices = start_simulator(names, options, link_dir)
+    # Stop on SIGTERM like on Ctrl+C, so the links are removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print_info("OpenThread CLI simulator running:")
+    for device in devices:
+        print_note(f"   {device.name}: {device.link} -> {device.port}")
+    print_success("✓ Use these ports as --border-router-port / --cli-port, or pick them when asked. Ctrl+C stops.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print_note("\nStopping the simulator...")
+    finally:
+        stop_simulator(devices)
+    return True
@@ -0,0 +1,100 @@
+﻿#!/usr/bin/env python3
+"""
+Drive the OpenThread CLI of a connected device over its serial console.
+"""
+import re
+import time
+import threading
+import serial
+from esp_thread_setup.utils.metrics import record_serial_command
+
+# ANSI color codes and ESP-IDF log lines such as "I (1234) OPENTHREAD: ..." are not command output
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+ESP_LOG_LINE = re.compile(r"^[EWIDV] \(\d+\) ")
+
+class ConsoleError(Exception):
+    """Raised when an OpenThread CLI command fails or times out"""
+
+def open_console(port, baudrate=115200):
+    """Open the serial console without toggling DTR/RTS, which would reset the board"""
+    console = serial.Serial()
+    console.port = port
+    console.baudrate = baudrate
+    console.timeout = 0.1
+    console.dtr = False
+    console.rts = False
+    console.open()
+    console.reset_input_buffer()
+    return console
+
+class ConsoleSessions:
+    """Serial consoles kept open across commands and jobs, one per port"""
+
+    def __init__(self):
+        self._consoles = {}
+        self._lock = threading.Lock()
+
+    def get(self, port):
+        """Return the open console of port, opening it on first use"""
+        with self._lock:
+            console = self._consoles.get(port)
+            if console is None or not console.is_open:
+                console = open_console(port)
+                self._consoles[port] = console
+            return console
+
+    def close(self, port):
+        """Close the console of port, e.g. before esptool needs the port"""
+        with self._lock:
+            console = self._consoles.pop(port, None)
+        if console is not None:
+            console.close()
+
+    def close_all(self):
+        """Close every open console"""
+        for port in list(self._consoles):
+            self.close(port)
+
+def clean_line(raw_line):
+    """Decode a console line and strip colors, the prompt and surrounding whitespace"""
+    line = ANSI_ESCAPE.sub("", raw_line.decode("utf-8", errors="replace")).strip()
+    if line.startswith(">"):
+        line = line[1:].strip()
+    return line
+
+def run_cli_command(console, command, timeout=10.0):
+    """Run one OpenThread CLI command and return its output lines (without the echo and 'Done')"""
+    console.reset_input_buffer()
+    console.write(f"{command}\n".encode("utf-8"))
+
+    output = []
+    started = time.monotonic()
+    deadline = started + timeout
+    while time.monotonic() < deadline:
+        raw_line = console.readline()
+        if not raw_line:
+            continue
+        line = clean_line(raw_line)
+        if not line or line == command or ESP_LOG_LINE.match(line):
+            continue
+        if line == "Done":
+            record_serial_command(getattr(console, "port", None), command, time.monotonic() - started)
+            return output
+        if line.startswith("Error"):
+            raise ConsoleError(f"'{command}' failed: {line}")
+        output.append(line)
+
+    raise ConsoleError(f"'{command}' timed out after {timeout:.0f}s")
+
+def parse_table(lines):
+    """Parse an OpenThread CLI table (| a | b |) into a list of row dicts"""
+    rows = [line for line in lines if line.startswith("|")]
+    if not rows:
+        return []
+    header = [cell.strip() for cell in rows[0].strip("|").split("|")]
+    table = []
+    for row in rows[1:]:
+        cells = [cell.strip() for cell in row.strip("|").split("|")]
+        if len(cells) == len(header):
+            table.append(dict(zip(header, cells)))
+    return table
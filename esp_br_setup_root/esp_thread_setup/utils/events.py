@@ -0,0 +1,219 @@
+﻿#!/usr/bin/env python3
+"""
+Structured status events for the ESP Thread Setup.
+
+Every status line is an event with a level, a message, a timestamp and the
+step and device it belongs to. Events go to the configured sinks: a pretty
+TTY output, a JSON-lines file or stream, or a quiet output showing only
+warnings and errors.
+"""
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+LEVELS = ("debug", "note", "info", "success", "warning", "error")
+
+# TTY rendering per level: (ANSI color, icon); notes are plain text
+TTY_STYLES = {
+    "debug": ("\033[90m", None),
+    "note": (None, None),
+    "info": ("\033[94m", "ℹ"),
+    "success": ("\033[92m", "✔"),
+    "warning": ("\033[93m", "⚠"),
+    "error": ("\033[91m", "✖"),
+}
+
+class TtySink:
+    """Human readable output, colored when the stream is a terminal"""
+
+    def __init__(self, stream=None, min_level="note"):
+        self.stream = stream
+        self.min_level = LEVELS.index(min_level)
+
+    def write(self, event):
+        if LEVELS.index(event["level"]) < self.min_level:
+            return
+        stream = self.stream or sys.stdout
+        color, icon = TTY_STYLES[event["level"]]
+        text = f"{icon} {event['message']}" if icon else event["message"]
+        if event.get("device"):
+            text = f"[{event['device']}] {text}"
+        if color and stream.isatty():
+            text = f"{color}{text}\033[0m"
+        stream.write(text + "\n")
+        stream.flush()
+
+    def close(self):
+        pass
+
+class QuietSink(TtySink):
+    """Only warnings and errors, on stderr"""
+
+    def __init__(self):
+        super().__init__(sys.stderr, "warning")
+
+class JsonLinesSink:
+    """One JSON object per event, to a file path or an open stream"""
+
+    def __init__(self, target=None):
+        if isinstance(target, str):
+            self.stream = open(target, "a", buffering=1, encoding="utf-8")
+            self.owned = True
+        else:
+            self.stream = target or sys.stdout
+            self.owned = False
+
+    def write(self, event):
+        event = dict(event, message=event["message"].strip("\n"))
+        self.stream.write(json.dumps(event, default=str) + "\n")
+        if not self.owned:
+            self.stream.flush()
+
+    def close(self):
+        if self.owned:
+            self.stream.close()
+
+OUTPUTS = {
+    "pretty": TtySink,
+    "json": JsonLinesSink,
+    "quiet": QuietSink,
+}
+
+_sinks = [TtySink()]
+# (match, sink) pairs that take matching events away from the configured sinks
+_routes = []
+_lock = threading.Lock()
+_context = threading.local()
+
+def set_sinks(sinks):
+    """Replace the sinks events are written to, closing the old ones"""
+    global _sinks
+    with _lock:
+        for sink in _sinks:
+            sink.close()
+        _sinks = list(sinks)
+
+def add_sink(sink):
+    """Write events to one more sink"""
+    with _lock:
+        _sinks.append(sink)
+
+@contextmanager
+def route_events(match, sink):
+    """Inside the block, send the events match(event) accepts to sink instead of the configured sinks"""
+    route = (match, sink)
+    with _lock:
+        _routes.append(route)
+    try:
+        yield
+    finally:
+        with _lock:
+            _routes.remove(route)
+
+def configure_output(output="pretty", event_log=None):
+    """Set up the console output ('pretty', 'json' or 'quiet') and an optional JSON-lines event log file"""
+    if output not in OUTPUTS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUTS)}")
+    sinks = [OUTPUTS[output]()]
+    if event_log:
+        sinks.append(JsonLinesSink(event_log))
+    set_sinks(sinks)
+
+def current_context():
+    """(step, device) of this thread, to carry over into worker threads"""
+    return getattr(_context, "step", None), getattr(_context, "device", None)
+
+@contextmanager
+def step_context(step=None, device=None):
+    """Tag the events emitted by this thread inside the block with a step and/or device ID"""
+    previous = (getattr(_context, "step", None), getattr(_context, "device", None))
+    _context.step = step or previous[0]
+    _context.device = device or previous[1]
+    try:
+        yield
+    finally:
+        _context.step, _context.device = previous
+
+class ThreadOutput:
+    """Stand-in for sys.stdout/sys.stderr that turns the writes of capturing threads into events"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        capture = getattr(_context, "capture", None)
+        if capture is None:
+            return self.stream.write(text)
+        capture.write(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(_context, "capture", None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class LineCapture:
+    """Collects printed text of one thread and emits it line by line"""
+
+    def __init__(self, level):
+        self.level = level
+        self.buffer = ""
+
+    def write(self, text):
+        # Progress output rewrites its line with "\r"
+        self.buffer += text.replace("\r\n", "\n").replace("\r", "\n")
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self.emit_line(line)
+
+    def emit_line(self, line):
+        if not line.strip():
+            return
+        # A sink printing to sys.stdout must reach the real stream
+        _context.capture = None
+        try:
+            emit(self.level, line.rstrip())
+        finally:
+            _context.capture = self
+
+    def close(self):
+        self.emit_line(self.buffer)
+        self.buffer = ""
+
+@contextmanager
+def capture_output(level="note"):
+    """Turn what this thread prints to sys.stdout/sys.stderr inside the block into events
+
+    Used for libraries such as esptool that print instead of logging, so their
+    output neither breaks the JSON-lines output nor escapes an event stream.
+    """
+    with _lock:
+        for name in ("stdout", "stderr"):
+            if not isinstance(getattr(sys, name), ThreadOutput):
+                setattr(sys, name, ThreadOutput(getattr(sys, name)))
+    previous = getattr(_context, "capture", None)
+    capture = _context.capture = LineCapture(level)
+    try:
+        yield
+    finally:
+        capture.close()
+        _context.capture = previous
+
+def emit(level, message, step=None, device=None, **fields):
+    """Write an event to every sink; step and device default to the current step_context()"""
+    event = {
+        "time": time.time(),
+        "level": level,
+        "message": message,
+        "step": step or getattr(_context, "step", None),
+        "device": device or getattr(_context, "device", None),
+    }
+    event.update(fields)
+    with _lock:
+        routed = [sink for match, sink in _routes if match(event)]
+        for sink in routed or _sinks:
+            sink.write(event)
@@ -5,15 +5,16 @@ Logging utilities for the ESP Thread Setup.
 import os
 import glob
 import subprocess
+from esp_thread_setup.utils.events import emit
 
 def show_build_logs(build_dir):
     """Display relevant build logs when failures occur"""
     log_dir = os.path.join(build_dir, "log")
     if not os.path.exists(log_dir):
-        print("No log directory found")
+        print_note("No log directory found")
         return
 
-    print("\n=== Last 20 lines of build logs ===")
+    print_note("\n=== Last 20 lines of build logs ===")
     try:
         # Show stderr log
         stderr_log = os.path.join(log_dir, "idf_py_stderr_output_*")
@@ -21,9 +22,9 @@ def show_build_logs(build_dir):
         if stderr_files:
             with open(stderr_files[0], "r") as f:
                 stderr_content = f.readlines()
-                print("STDERR (last 20 lines):")
+                print_note("STDERR (last 20 lines):")
                 for line in stderr_content[-20:]:
-                    print(line.strip())
+                    print_note(line.strip())
 
         # Show stdout log
         stdout_log = os.path.join(log_dir, "idf_py_stdout_output_*")
@@ -31,11 +32,11 @@ def show_build_logs(build_dir):
         if stdout_files:
             with open(stdout_files[0], "r") as f:
                 stdout_content = f.readlines()
-                print("STDOUT (last 20 lines):")
+                print_note("STDOUT (last 20 lines):")
                 for line in stdout_content[-20:]:
-                    print(line.strip())
+                    print_note(line.strip())
     except Exception as e:
-        print(f"Couldn't read log files: {e}")
+        print_note(f"Couldn't read log files: {e}")
 
 def color_text(text, color):
     """Utility function to colorize text output."""
@@ -60,16 +61,34 @@ def color_text_with_icon(text, color, icon):
     return f"{colors.get(color, colors['reset'])}{icon} {text}{colors['reset']}"
 
 def print_success(message):
-    print(color_text_with_icon(message, "green", "✔"))  # Checkmark
+    emit("success", message)
 
 def print_error(message):
-    print(color_text_with_icon(message, "red", "✖"))  # Crossmark
+    emit("error", message)
 
 def print_warning(message):
-    print(color_text_with_icon(message, "yellow", "⚠"))  # Warning triangle
+    emit("warning", message)
 
 def print_info(message):
-    print(color_text_with_icon(message, "blue", "ℹ"))  # Info icon
+    emit("info", message)
+
+def print_note(message):
+    """Plain progress text without an icon"""
+    emit("note", message)
+
+def run_logged(command, cwd=None, check=True):
+    """Run a command, forwarding each line of its output as a note event; return the exit code
+
+    Raises CalledProcessError on failure when check is set, like subprocess.run().
+    """
+    with subprocess.Popen(command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, text=True, errors="replace") as process:
+        for line in process.stdout:
+            if line.strip():
+                print_note(line.rstrip())
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return process.returncode
 
 def run_command_with_minimal_output(command, description):
     """Run a shell command with minimal output, showing only key progress updates."""
@@ -80,5 +99,5 @@ def run_command_with_minimal_output(command, description):
     except subprocess.CalledProcessError as e:
         print_error(f"✖ {description} failed.")
         print_warning("Error details:")
-        print(e.stderr.strip())
+        print_note(e.stderr.strip())
         raise
@@ -0,0 +1,142 @@
+﻿#!/usr/bin/env python3
+"""
+Prometheus metrics of provisioning runs.
+
+Counters, gauges and histograms are kept in memory and rendered in the
+Prometheus text format, either to a node-exporter textfile (written
+atomically) or by the daemon's GET /metrics.
+"""
+import os
+import threading
+from esp_thread_setup.config.constants import METRICS_TEXTFILE
+
+# Histogram buckets in seconds
+STEP_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800)
+SERIAL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_registry = []
+
+def format_labels(names, values, extra=()):
+    """Render a label set as {name="value",...}"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Metric:
+    """A metric family with a fixed list of label names"""
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels.get(name) or "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        with _lock:
+            key = self.key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self.values[self.key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STEP_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        with _lock:
+            key = self.key(labels)
+            counts, total, observations = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self.values[key] = (counts, total + value, observations + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, observations) in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', f'{bound:g}')])} {count}")
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', '+Inf')])} {observations}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {observations}")
+        return lines
+
+STEP_DURATION = Histogram("esp_thread_step_duration_seconds", "Duration of setup and provisioning steps",
+                          ("step", "device", "result"))
+STEP_FAILURES = Counter("esp_thread_step_failures_total", "Failed setup and provisioning steps", ("step", "device"))
+CACHE_REQUESTS = Counter("esp_thread_cache_requests_total", "Cache lookups (build, environment, archive) by result",
+                         ("cache", "result"))
+FLASH_BYTES = Counter("esp_thread_flash_bytes_total", "Image bytes written to flash", ("device",))
+FLASH_DURATION = Histogram("esp_thread_flash_duration_seconds", "Duration of flashing one board", ("device",))
+FLASH_THROUGHPUT = Gauge("esp_thread_flash_throughput_bytes_per_second", "Throughput of the last flash of a board",
+                         ("device",))
+SERIAL_LATENCY = Histogram("esp_thread_serial_command_duration_seconds", "Round trip of OpenThread CLI commands",
+                           ("device", "command"), SERIAL_BUCKETS)
+JOIN_DURATION = Histogram("esp_thread_join_duration_seconds", "Time from 'thread start' until a device attached",
+                          ("device",))
+
+def record_step(step, device, seconds, success):
+    """Record the duration and outcome of one step"""
+    STEP_DURATION.observe(seconds, step=step, device=device, result="success" if success else "failure")
+    if not success:
+        STEP_FAILURES.inc(step=step, device=device)
+
+def record_cache(cache, hit):
+    """Record a cache hit or miss"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def record_flash(device, size, seconds):
+    """Record one successful flash of size bytes"""
+    FLASH_BYTES.inc(size, device=device)
+    FLASH_DURATION.observe(seconds, device=device)
+    if seconds > 0:
+        FLASH_THROUGHPUT.set(size / seconds, device=device)
+
+def record_serial_command(device, command, seconds):
+    """Record the latency of a CLI command, labelled by its leading keywords (no addresses or keys)"""
+    keywords = " ".join(word for word in command.split()[:2] if word.isalpha())
+    SERIAL_LATENCY.observe(seconds, device=device, command=keywords)
+
+def record_join(device, seconds):
+    """Record how long a device took to attach to a Thread network"""
+    JOIN_DURATION.observe(seconds, device=device)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        lines = [line for metric in _registry if metric.values for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path=METRICS_TEXTFILE):
+    """Atomically write the metrics for the node-exporter textfile collector; no-op without a path"""
+    if not path:
+        return False
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(render_metrics())
+    os.replace(path + ".tmp", path)
+    return True
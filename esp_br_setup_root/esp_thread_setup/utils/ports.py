@@ -4,45 +4,67 @@
 Utilities for detecting and managing serial ports.
 """
 import os
-import serial.tools.list_ports
+import glob
+from collections import namedtuple
+from esp_thread_setup.config.constants import SIMULATOR_DIR
+from esp_thread_setup.config.answers import ask, get_answer, NonInteractiveError
+from esp_thread_setup.utils.logs import print_note
+
+SimulatedPort = namedtuple("SimulatedPort", ["device", "description"])
+
+def simulated_ports(link_dir=SIMULATOR_DIR):
+    """Ports of running OpenThread CLI simulators (esp-thread-setup simulate)"""
+    return [SimulatedPort(path, f"OpenThread CLI simulator ({os.path.basename(path)[3:]})")
+            for path in sorted(glob.glob(os.path.join(link_dir, "tty*"))) if os.path.exists(path)]
+
+def find_device_port(device_type, answer_key=None):
+    """Improved device port detection using pySerial
+
+    A port configured under answer_key in the run config is used as is.
+    """
+    if answer_key and get_answer(answer_key):
+        return get_answer(answer_key)
 
-def find_device_port(device_type):
-    """Improved device port detection using pySerial"""
     try:
+        import serial.tools.list_ports
+
         # Get all serial ports
-        ports = serial.tools.list_ports.comports()
+        ports = list(serial.tools.list_ports.comports()) + simulated_ports()
 
         if not ports:
-            return input(f"No serial ports found. Please manually enter port for {device_type} (e.g., /dev/ttyUSB0): ")
+            return ask(answer_key, f"No serial ports found. Please manually enter port for {device_type} (e.g., /dev/ttyUSB0): ")
 
-        # Filter for likely ESP32 ports (CP210x, CH340, FTDI)
+        # Filter for likely ESP32 ports (CP210x, CH340, FTDI) and simulated boards
         esp_ports = [
             p for p in ports
             if 'CP210' in p.description or
                'CH340' in p.description or
-               'FTDI' in p.description
+               'FTDI' in p.description or
+               'simulator' in p.description
         ]
 
         if not esp_ports:
-            print("No ESP32-like devices found. Available ports:")
+            print_note("No ESP32-like devices found. Available ports:")
             for i, p in enumerate(ports):
-                print(f"{i+1}. {p.device} ({p.description})")
-            choice = int(input(f"Select port for {device_type} (1-{len(ports)}): ")) - 1
+                print_note(f"{i+1}. {p.device} ({p.description})")
+            choice = int(ask(answer_key, f"Select port for {device_type} (1-{len(ports)}): ")) - 1
             return ports[choice].device
 
         if len(esp_ports) == 1:
             return esp_ports[0].device
 
         # Multiple ESP-like devices found
-        print(f"Multiple ESP32-like devices found. Please select port for {device_type}:")
+        print_note(f"Multiple ESP32-like devices found. Please select port for {device_type}:")
         for i, p in enumerate(esp_ports):
-            print(f"{i+1}. {p.device} ({p.description})")
-        choice = int(input(f"Enter number (1-{len(esp_ports)}): ")) - 1
+            print_note(f"{i+1}. {p.device} ({p.description})")
+        choice = int(ask(answer_key, f"Enter number (1-{len(esp_ports)}): ")) - 1
         return esp_ports[choice].device
 
+    except NonInteractiveError:
+        raise
     except Exception as e:
-        print(f"Error detecting device port: {e}")
-        return input(f"Please manually enter the port for {device_type} (e.g., /dev/ttyUSB0): ")
+        print_note(f"Error detecting device port: {e}")
+        return ask(answer_key, f"Please manually enter the port for {device_type} (e.g., /dev/ttyUSB0): ")
 
 def check_port(port):
     """Check if a port exists"""
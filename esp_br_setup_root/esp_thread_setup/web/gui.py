@@ -5,74 +5,75 @@ Setup and manage the Web GUI for the Border Router.
 import urllib.request
 import time
 import subprocess
-from esp_thread_setup.utils.logs import print_error
-
-def print_info(message):
-    """Prints an informational message."""
-    print(f"[INFO] {message}")
-
-def print_success(message):
-    """Prints a success message."""
-    print(f"[SUCCESS] {message}")
+from esp_thread_setup.config.answers import ask, ask_wifi_credentials, get_answer, is_non_interactive, pause
+from esp_thread_setup.utils.logs import print_success, print_error, print_info, print_note
 
 def setup_web_gui(border_router_port):
     """Setup the Web GUI for the Border Router and display its IP address"""
-    print("\n=== Setting up Web GUI ===")
-    print("The Border Router provides a web interface for configuration and monitoring.")
+    print_note("\n=== Setting up Web GUI ===")
+    print_note("The Border Router provides a web interface for configuration and monitoring.")
 
     # Prompt for Wi-Fi SSID and password
-    print("\n=== Wi-Fi Configuration ===")
-    ssid = input("Enter Wi-Fi SSID: ")
-    password = input("Enter Wi-Fi Password: ")
-
-    # Simulate connecting to Wi-Fi (replace with actual implementation if needed)
-    print_info(f"Connecting to Wi-Fi network '{ssid}'...")
-    # Here you would add the actual code to connect to Wi-Fi using the SSID and password
-    time.sleep(2)  # Simulate connection delay
-    print_success("Connected to Wi-Fi successfully.")
+    print_note("\n=== Wi-Fi Configuration ===")
+    ssid, password = ask_wifi_credentials("Enter Wi-Fi SSID (leave empty to skip): ")
+    if not ssid:
+        print_note("No Wi-Fi SSID given, the Web GUI is reachable once the Border Router is on Wi-Fi.")
+    else:
+        # Simulate connecting to Wi-Fi (replace with actual implementation if needed)
+        print_info(f"Connecting to Wi-Fi network '{ssid}'...")
+        # Here you would add the actual code to connect to Wi-Fi using the SSID and password
+        time.sleep(2)  # Simulate connection delay
+        print_success("Connected to Wi-Fi successfully.")
 
     # Validate that border_router_port is not None
     if not border_router_port:
         print_error("Border Router port is not set. Please enter it manually.")
-        border_router_port = input("Enter the Border Router port (e.g., /dev/ttyUSB0): ")
+        border_router_port = ask("border_router_port", "Enter the Border Router port (e.g., /dev/ttyUSB0): ")
         if not border_router_port:
             print_error("No port entered. Exiting Web GUI setup.")
             return False
 
     # Display instructions for manually fetching the IP address
-    print("\n=== Web GUI IP Address Fetch Instructions ===")
-    print("To fetch the IP address of the Web GUI, follow these steps:")
-    print("1. Open the Border Router monitor using the following command:")
-    print(f"   idf.py -p {border_router_port} monitor")
-    print("2. Look for a line containing 'IP Address:' in the monitor output.")
-    print("3. Copy the IP address and exit the monitor by pressing Ctrl+].")
+    print_note("\n=== Web GUI IP Address Fetch Instructions ===")
+    print_note("To fetch the IP address of the Web GUI, follow these steps:")
+    print_note("1. Open the Border Router monitor using the following command:")
+    print_note(f"   idf.py -p {border_router_port} monitor")
+    print_note("2. Look for a line containing 'IP Address:' in the monitor output.")
+    print_note("3. Copy the IP address and exit the monitor by pressing Ctrl+].")
 
-    input("\nPress Enter to open the Border Router monitor...")
+    # The monitor needs a terminal, unattended runs take the address from the run config
+    if not get_answer("web_gui_ip") and not is_non_interactive():
+        pause("\nPress Enter to open the Border Router monitor...")
 
-    # Open the Border Router monitor
-    try:
-        print(f"Running: idf.py -p {border_router_port} monitor")
-        subprocess.run(["idf.py", "-p", border_router_port, "monitor"], check=False)
-    except Exception as e:
-        print_error(f"Error opening Border Router monitor: {e}")
-        return False
+        # Open the Border Router monitor
+        try:
+            print_note(f"Running: idf.py -p {border_router_port} monitor")
+            subprocess.run(["idf.py", "-p", border_router_port, "monitor"], check=False)
+        except Exception as e:
+            print_error(f"Error opening Border Router monitor: {e}")
+            return False
+
+        print_success("Monitor closed. Please ensure you copied the IP address.")
 
-    print_success("Monitor closed. Please ensure you copied the IP address.")
+    ip_address = ask("web_gui_ip", "Enter the Web GUI IP address (leave empty to skip): ", default="").strip()
+    if not ip_address:
+        print_note("No IP address given, skipping the Web GUI check.")
+        return True
 
     # Display the Web GUI access information
     print_success(f"\nYou can access the Web GUI at http://{ip_address}")
-    print("Use the web interface to:")
-    print("1. Monitor the Thread network status")
-    print("2. Configure network settings")
-    print("3. View connected devices")
+    print_note("Use the web interface to:")
+    print_note("1. Monitor the Thread network status")
+    print_note("2. Configure network settings")
+    print_note("3. View connected devices")
 
     # Basic verification (can be expanded)
-    print("\nVerifying basic web GUI access...")
+    print_note("\nVerifying basic web GUI access...")
     try:
         # Try to open the web page
         urllib.request.urlopen("http://"+ip_address)
-        print("✓ Web GUI is accessible!")
+        print_note("✓ Web GUI is accessible!")
     except:
-        print("ERROR: Web GUI might not be accessible at this IP. Please double-check the IP address and ensure the Border Router is connected to the network.")
+        print_error("ERROR: Web GUI might not be accessible at this IP. Please double-check the IP address and ensure the Border Router is connected to the network.")
     
     return True
\ No newline at end of file
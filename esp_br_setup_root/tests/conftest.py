@@ -0,0 +1,135 @@
+﻿import os
+import sys
+import shutil
+import tempfile
+
+# Caches, journals and stores live below the home directory; keep the tests out of the real one
+TEST_HOME = tempfile.mkdtemp(prefix="esp-thread-setup-tests-")
+os.environ["HOME"] = TEST_HOME
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+import pytest
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_HOME, ignore_errors=True)
+
+class ArchiveServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in for a file host: ETags, conditional and range requests, and injected failures"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ArchiveRequestHandler)
+        self.files = {}
+        self.etags = {}
+        self.accept_ranges = True
+        # Some hosts answer HEAD with 405, leaving revalidation to a conditional GET
+        self.allow_head = True
+        # Requests to fail: path -> number of GETs cut off after truncate_at bytes
+        self.truncate = {}
+        self.truncate_at = 0
+        # Range starts that answer 500 once
+        self.failing_ranges = set()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def publish(self, path, data, etag):
+        self.files[path] = data
+        self.etags[path] = etag
+
+class ArchiveRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def record(self):
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, dict(self.headers)))
+
+    def send_body(self, status, data, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        return data
+
+    def common_headers(self, path):
+        headers = [("ETag", self.server.etags[path])]
+        if self.server.accept_ranges:
+            headers.append(("Accept-Ranges", "bytes"))
+        return headers
+
+    def do_HEAD(self):
+        self.record()
+        if not self.server.allow_head:
+            self.send_body(405, b"")
+            return
+        if self.path not in self.server.files:
+            self.send_body(404, b"")
+            return
+        data = self.server.files[self.path]
+        self.send_response(200)
+        for name, value in self.common_headers(self.path):
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.record()
+        path = self.path
+        if path not in self.server.files:
+            self.wfile.write(self.send_body(404, b""))
+            return
+        data, etag = self.server.files[path], self.server.etags[path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_body(304, b"", [("ETag", etag)])
+            return
+
+        range_header = self.headers.get("Range")
+        if range_header and self.server.accept_ranges and self.headers.get("If-Range", etag) == etag:
+            start, _, end = range_header[len("bytes="):].partition("-")
+            start = int(start)
+            end = int(end) if end else len(data) - 1
+            if start >= len(data):
+                self.wfile.write(self.send_body(416, b"", [("Content-Range", f"bytes */{len(data)}")]))
+                return
+            with self.server.lock:
+                failing = start in self.server.failing_ranges
+                self.server.failing_ranges.discard(start)
+            if failing:
+                self.wfile.write(self.send_body(500, b""))
+                return
+            body = data[start:end + 1]
+            headers = self.common_headers(path) + [("Content-Range", f"bytes {start}-{end}/{len(data)}")]
+            self.wfile.write(self.send_body(206, body, headers))
+            return
+
+        body = self.send_body(200, data, self.common_headers(path))
+        with self.server.lock:
+            truncate = self.server.truncate.get(path, 0)
+            if truncate:
+                self.server.truncate[path] = truncate - 1
+        if truncate:
+            # Announce the full length, send only the start and drop the connection
+            self.wfile.write(body[:self.server.truncate_at])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+@pytest.fixture
+def archive_server():
+    server = ArchiveServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,37 @@
+﻿import pytest
+
+from esp_thread_setup.config.answers import configure_answers, ask_wifi_credentials, NonInteractiveError
+from esp_thread_setup.main import RUN_ALL_STEPS, missing_answers, planned_steps
+
+@pytest.fixture(autouse=True)
+def reset_answers():
+    yield
+    configure_answers({})
+
+def test_all_steps_need_no_answers():
+    configure_answers({}, non_interactive=True)
+    assert planned_steps() == list(RUN_ALL_STEPS)
+    assert missing_answers(planned_steps()) == []
+
+def test_problems_are_found_before_any_step_runs():
+    configure_answers({"mode": "steps", "steps": "3,6,12", "wifi_ssid": "home", "auto_join": "false"},
+                      non_interactive=True)
+    assert planned_steps() == ["border_router", "cli_join", "12"]
+    assert missing_answers(planned_steps()) == [
+        "invalid step in run config: 12",
+        "'wifi_ssid' is set without 'wifi_password'",
+        "'auto_join' is off, joining the CLI by hand needs the console",
+    ]
+
+def test_manual_dataset_needs_a_configured_dataset():
+    configure_answers({"auto_dataset": False}, non_interactive=True)
+    assert len(missing_answers(["dataset"])) == 1
+    configure_answers({"auto_dataset": False, "dataset": "0e080000000000010000"}, non_interactive=True)
+    assert missing_answers(["dataset"]) == []
+
+def test_wifi_is_optional_without_a_terminal():
+    configure_answers({}, non_interactive=True)
+    assert ask_wifi_credentials("SSID: ") == ("", None)
+    configure_answers({"wifi_ssid": "home"}, non_interactive=True)
+    with pytest.raises(NonInteractiveError):
+        ask_wifi_credentials("SSID: ")
@@ -0,0 +1,36 @@
+﻿import sys
+import json
+import asyncio
+
+from esp_thread_setup import api
+from esp_thread_setup.service import jobs
+from esp_thread_setup.utils.logs import print_warning, run_logged
+
+def fake_build(params, emit, sessions):
+    emit("step", f"Building {params['project']}", step="build")
+    run_logged([sys.executable, "-c", f"print('[1/1] Linking {params['project']}.elf')"])
+    print_warning(f"{params['project']} has no sdkconfig")
+    return {"project": params["project"]}
+
+def test_step_events_and_command_output_reach_the_stream(monkeypatch, capsys):
+    monkeypatch.setitem(jobs.JOB_KINDS, "build", fake_build)
+    monkeypatch.setattr(api, "_idf_activated", True)
+    monkeypatch.setattr(api, "console_sessions", lambda: None)
+
+    async def build_both():
+        events = api.EventStream()
+        await asyncio.gather(api.run_step("build", {"project": "cli"}, events),
+                             api.run_step("build", {"project": "rcp"}, events))
+        events.close()
+        return [event async for event in events]
+
+    received = asyncio.new_event_loop().run_until_complete(build_both())
+
+    for project in ("cli", "rcp"):
+        assert [(event.kind, event.message) for event in received if project in event.message] == [
+            ("step", f"Building {project}"),
+            ("note", f"[1/1] Linking {project}.elf"),
+            ("warning", f"{project} has no sdkconfig"),
+        ]
+    # Nothing of the steps went to the console
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,20 @@
+﻿import pytest
+
+pytest.importorskip("serial")
+
+from esp_thread_setup.network.benchmark import percentile
+from esp_thread_setup.setup.timings import nearest_rank
+
+def test_percentile_is_nearest_rank():
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 90) == 9
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 99) == 10
+    assert percentile(list(range(1, 101)), 7) == 7
+    assert percentile([7], 1) == 7
+    assert percentile([], 50) is None
+
+def test_percentile_matches_the_timing_history():
+    values = [12.0, 15.5, 9.1, 30.2, 14.8, 15.0, 11.9, 13.3, 16.4, 21.0, 10.7]
+    for pct in (1, 25, 50, 75, 90, 95, 99, 100):
+        assert percentile(values, pct) == nearest_rank(values, pct)
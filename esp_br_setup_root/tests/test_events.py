@@ -0,0 +1,41 @@
+﻿import io
+import sys
+import json
+import threading
+
+import pytest
+
+from esp_thread_setup.utils import events
+from esp_thread_setup.utils.logs import run_logged
+
+@pytest.fixture
+def json_stream():
+    stream = io.StringIO()
+    events.set_sinks([events.JsonLinesSink(stream)])
+    yield stream
+    events.configure_output("pretty")
+
+def read_events(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_printed_output_of_capturing_threads_becomes_events(json_stream):
+    def flash(port):
+        with events.step_context("flash", port), events.capture_output():
+            print("Writing at 0x10000 (50 %)\r", end="")
+            print("Hard resetting via RTS pin...", file=sys.stderr)
+
+    threads = [threading.Thread(target=flash, args=(port,)) for port in ("ttyA", "ttyB")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    messages = sorted((event["device"], event["message"]) for event in read_events(json_stream))
+    assert messages == [("ttyA", "Hard resetting via RTS pin..."), ("ttyA", "Writing at 0x10000 (50 %)"),
+                        ("ttyB", "Hard resetting via RTS pin..."), ("ttyB", "Writing at 0x10000 (50 %)")]
+
+def test_subprocess_output_becomes_note_events(json_stream):
+    assert run_logged([sys.executable, "-c", "import sys; print('ninja: no work to do.'); sys.exit(3)"],
+                      check=False) == 3
+    assert [(event["level"], event["message"]) for event in read_events(json_stream)] == \
+        [("note", "ninja: no work to do.")]
@@ -0,0 +1,31 @@
+﻿import os
+import stat
+import zipfile
+
+import pytest
+
+from esp_thread_setup.repositories import extract, store
+
+@pytest.fixture
+def archive(tmp_path):
+    zip_path = str(tmp_path / "repo.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.writestr("esp-thread-br-main/README.md", "readme")
+    return zip_path
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_extracted_tree_root_follows_the_umask(archive, tmp_path):
+    dest_path = str(tmp_path / "esp-thread-br")
+    extract.extract_archive(archive, dest_path)
+
+    assert mode(dest_path) == 0o777 & ~extract.UMASK
+    with open(os.path.join(dest_path, "README.md")) as f:
+        assert f.read() == "readme"
+
+def test_materialized_version_root_follows_the_umask(archive, tmp_path):
+    dest_path = str(tmp_path / "versions" / "main")
+    store.materialize_version(archive, dest_path, store_dir=str(tmp_path / "store"))
+
+    assert mode(dest_path) == 0o777 & ~extract.UMASK
@@ -0,0 +1,165 @@
+﻿import os
+import hashlib
+
+import pytest
+
+from esp_thread_setup.repositories import fetch
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(fetch.time, "sleep", lambda seconds: None)
+
+def gets(server):
+    return [headers for command, _, headers in server.requests if command == "GET"]
+
+def test_download_is_cached_and_hashed(archive_server, tmp_path):
+    data = os.urandom(300 * 1024)
+    archive_server.publish("/repo.zip", data, '"v1"')
+    url = archive_server.url("/repo.zip")
+
+    archive_path, sha256 = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    with open(archive_path, "rb") as f:
+        assert f.read() == data
+    assert fetch.read_metadata(fetch.cache_paths(url, str(tmp_path))[1])["etag"] == '"v1"'
+
+def test_unchanged_archive_is_revalidated_not_downloaded(archive_server, tmp_path):
+    archive_server.publish("/repo.zip", b"archive", '"v1"')
+    url = archive_server.url("/repo.zip")
+    first = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+    archive_server.requests.clear()
+
+    assert fetch.fetch_archive(url, cache_dir=str(tmp_path)) == first
+    assert gets(archive_server) == []
+
+def test_not_modified_answer_reuses_the_cache(archive_server, tmp_path):
+    archive_server.allow_head = False
+    archive_server.publish("/repo.zip", b"archive", '"v1"')
+    url = archive_server.url("/repo.zip")
+    first = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+    archive_server.requests.clear()
+
+    assert fetch.fetch_archive(url, cache_dir=str(tmp_path)) == first
+    assert [headers.get("If-None-Match") for headers in gets(archive_server)] == ['"v1"']
+
+def test_changed_archive_is_downloaded_again(archive_server, tmp_path):
+    archive_server.publish("/repo.zip", b"old archive", '"v1"')
+    url = archive_server.url("/repo.zip")
+    fetch.fetch_archive(url, cache_dir=str(tmp_path))
+
+    archive_server.publish("/repo.zip", b"new archive", '"v2"')
+    archive_path, sha256 = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(b"new archive").hexdigest()
+    with open(archive_path, "rb") as f:
+        assert f.read() == b"new archive"
+
+def test_interrupted_download_resumes_with_range(archive_server, tmp_path):
+    data = os.urandom(1024 * 1024)
+    archive_server.publish("/repo.zip", data, '"v1"')
+    archive_server.truncate["/repo.zip"] = 1
+    archive_server.truncate_at = 400 * 1024
+    url = archive_server.url("/repo.zip")
+
+    archive_path, sha256 = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    with open(archive_path, "rb") as f:
+        assert f.read() == data
+    resumed = gets(archive_server)[-1]
+    assert resumed["Range"].startswith("bytes=") and resumed["Range"] != "bytes=0-"
+    assert resumed["If-Range"] == '"v1"'
+
+def test_stale_partial_download_is_discarded_on_416(archive_server, tmp_path):
+    archive_server.publish("/repo.zip", b"short archive", '"v1"')
+    url = archive_server.url("/repo.zip")
+    _, _, part_path = fetch.cache_paths(url, str(tmp_path))
+    os.makedirs(str(tmp_path), exist_ok=True)
+    with open(part_path, "wb") as f:
+        f.write(b"x" * 1000)
+    fetch.write_metadata(part_path + ".json", {"etag": '"v1"', "last_modified": None})
+
+    archive_path, sha256 = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(b"short archive").hexdigest()
+    with open(archive_path, "rb") as f:
+        assert f.read() == b"short archive"
+
+def test_offline_mode_uses_only_the_cache(archive_server, tmp_path, monkeypatch):
+    archive_server.publish("/repo.zip", b"archive", '"v1"')
+    url = archive_server.url("/repo.zip")
+    first = fetch.fetch_archive(url, cache_dir=str(tmp_path))
+    monkeypatch.setattr(fetch, "OFFLINE_MODE", True)
+    archive_server.requests.clear()
+
+    assert fetch.fetch_archive(url, cache_dir=str(tmp_path)) == first
+    assert archive_server.requests == []
+    with pytest.raises(OSError):
+        fetch.fetch_archive(archive_server.url("/other.zip"), cache_dir=str(tmp_path))
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(fetch, "SEGMENT_THRESHOLD", 64 * 1024)
+    monkeypatch.setattr(fetch, "SEGMENT_SIZE", 16 * 1024)
+
+def range_starts(server):
+    return sorted(int(headers["Range"][len("bytes="):].split("-")[0])
+                  for headers in gets(server) if "Range" in headers)
+
+def test_large_archive_is_fetched_in_segments(archive_server, tmp_path, small_segments):
+    data = os.urandom(100 * 1024)
+    archive_server.publish("/repo.zip", data, '"v1"')
+
+    archive_path, sha256 = fetch.fetch_archive(archive_server.url("/repo.zip"), cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    with open(archive_path, "rb") as f:
+        assert f.read() == data
+    assert range_starts(archive_server) == list(range(0, len(data), 16 * 1024))
+    assert all(headers["If-Range"] == '"v1"' for headers in gets(archive_server))
+
+def test_failed_segments_are_retried_alone(archive_server, tmp_path, small_segments):
+    data = os.urandom(100 * 1024)
+    archive_server.publish("/repo.zip", data, '"v1"')
+    archive_server.failing_ranges = {32 * 1024}
+
+    archive_path, sha256 = fetch.fetch_archive(archive_server.url("/repo.zip"), cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    with open(archive_path, "rb") as f:
+        assert f.read() == data
+    starts = range_starts(archive_server)
+    assert starts.count(32 * 1024) == 2
+    assert sorted(set(starts)) == list(range(0, len(data), 16 * 1024))
+
+def test_completed_segments_are_recorded_as_they_finish(archive_server, tmp_path, small_segments, monkeypatch):
+    data = os.urandom(100 * 1024)
+    archive_server.publish("/repo.zip", data, '"v1"')
+    archive_server.failing_ranges = {32 * 1024}
+    url = archive_server.url("/repo.zip")
+    part_metadata_path = fetch.cache_paths(url, str(tmp_path))[2] + ".json"
+    recorded = []
+    write_metadata = fetch.write_metadata
+    def spy(path, metadata):
+        if path == part_metadata_path:
+            recorded.append(list(metadata["done"]))
+        write_metadata(path, metadata)
+    monkeypatch.setattr(fetch, "write_metadata", spy)
+
+    with pytest.raises(OSError):
+        fetch.fetch_segmented(url, cache_dir=str(tmp_path))
+
+    done = fetch.read_metadata(part_metadata_path)["done"]
+    assert 32 * 1024 not in done and len(done) == 6
+    assert [len(entry) for entry in recorded] == list(range(7))
+
+def test_server_without_ranges_uses_a_single_stream(archive_server, tmp_path, small_segments):
+    data = os.urandom(100 * 1024)
+    archive_server.accept_ranges = False
+    archive_server.publish("/repo.zip", data, '"v1"')
+
+    _, sha256 = fetch.fetch_archive(archive_server.url("/repo.zip"), cache_dir=str(tmp_path))
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert [headers.get("Range") for headers in gets(archive_server)] == [None]
@@ -0,0 +1,117 @@
+﻿import os
+import subprocess
+
+import pytest
+
+from esp_thread_setup.repositories.git_fetch import git_fetch_repository, run_git
+
+SPARSE_PATHS = ["examples/basic_thread_border_router"]
+
+def write_file(root, relative_path, content):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def commit_all(work_dir, message):
+    run_git(["add", "-A"], cwd=work_dir)
+    run_git(["commit", "-q", "-m", message], cwd=work_dir)
+    run_git(["push", "-q", "origin", "HEAD:main", "--tags"], cwd=work_dir)
+    return run_git(["rev-parse", "HEAD"], cwd=work_dir)
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """A bare repository served over file:// and a work tree that pushes to it"""
+    for name in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{name}_NAME", "Test")
+        monkeypatch.setenv(f"GIT_{name}_EMAIL", "test@example.com")
+    bare_dir = str(tmp_path / "remote.git")
+    work_dir = str(tmp_path / "work")
+    run_git(["init", "-q", "--bare", bare_dir])
+    # Partial clone filters and fetching a commit by id are opt-in on the serving side
+    run_git(["config", "uploadpack.allowFilter", "true"], cwd=bare_dir)
+    run_git(["config", "uploadpack.allowAnySHA1InWant", "true"], cwd=bare_dir)
+    run_git(["init", "-q", work_dir])
+    run_git(["remote", "add", "origin", bare_dir], cwd=work_dir)
+
+    write_file(work_dir, "README.md", "readme\n")
+    write_file(work_dir, "examples/basic_thread_border_router/main/main.c", "v1\n")
+    write_file(work_dir, "examples/ot_cli/main/main.c", "cli\n")
+    write_file(work_dir, "docs/guide.md", "guide\n")
+    commit_all(work_dir, "first")
+    return "file://" + bare_dir, work_dir
+
+def read_file(root, relative_path):
+    with open(os.path.join(root, relative_path)) as f:
+        return f.read()
+
+def test_checkout_contains_only_the_sparse_paths(remote, tmp_path):
+    url, work_dir = remote
+    path = str(tmp_path / "checkout")
+
+    commit = git_fetch_repository(url, path, "main", SPARSE_PATHS)
+
+    assert commit == run_git(["rev-parse", "HEAD"], cwd=work_dir)
+    assert read_file(path, "examples/basic_thread_border_router/main/main.c") == "v1\n"
+    assert os.path.exists(os.path.join(path, "README.md"))
+    assert not os.path.exists(os.path.join(path, "examples/ot_cli"))
+    assert not os.path.exists(os.path.join(path, "docs"))
+    # Shallow, and the blobs outside the sparse paths were never downloaded
+    assert run_git(["rev-list", "--count", "HEAD"], cwd=path) == "1"
+    missing = run_git(["rev-list", "--objects", "--missing=print", "HEAD"], cwd=path)
+    assert len([line for line in missing.splitlines() if line.startswith("?")]) == 2
+
+def test_existing_checkout_is_updated_in_place(remote, tmp_path):
+    url, work_dir = remote
+    path = str(tmp_path / "checkout")
+    git_fetch_repository(url, path, "main", SPARSE_PATHS)
+
+    write_file(work_dir, "examples/basic_thread_border_router/main/main.c", "v2\n")
+    second = commit_all(work_dir, "second")
+    commit = git_fetch_repository(url, path, "main", SPARSE_PATHS)
+
+    assert commit == second
+    assert read_file(path, "examples/basic_thread_border_router/main/main.c") == "v2\n"
+    assert run_git(["rev-list", "--count", "HEAD"], cwd=path) == "1"
+
+def test_sparse_paths_can_change_on_update(remote, tmp_path):
+    url, _ = remote
+    path = str(tmp_path / "checkout")
+    git_fetch_repository(url, path, "main", SPARSE_PATHS)
+
+    git_fetch_repository(url, path, "main", SPARSE_PATHS + ["examples/ot_cli"])
+
+    assert read_file(path, "examples/ot_cli/main/main.c") == "cli\n"
+
+def test_tags_and_commits_can_be_pinned(remote, tmp_path):
+    url, work_dir = remote
+    first = run_git(["rev-parse", "HEAD"], cwd=work_dir)
+    run_git(["tag", "v1.0"], cwd=work_dir)
+    write_file(work_dir, "examples/basic_thread_border_router/main/main.c", "v2\n")
+    commit_all(work_dir, "second")
+
+    tag_path = str(tmp_path / "tag")
+    commit_path = str(tmp_path / "commit")
+
+    assert git_fetch_repository(url, tag_path, "v1.0", SPARSE_PATHS) == first
+    assert git_fetch_repository(url, commit_path, first, SPARSE_PATHS) == first
+    assert read_file(commit_path, "examples/basic_thread_border_router/main/main.c") == "v1\n"
+
+def test_extracted_tree_is_replaced_by_a_checkout(remote, tmp_path):
+    url, _ = remote
+    path = str(tmp_path / "checkout")
+    write_file(path, "stale.txt", "from an archive\n")
+
+    git_fetch_repository(url, path, "main", SPARSE_PATHS)
+
+    assert not os.path.exists(os.path.join(path, "stale.txt"))
+    assert os.path.isdir(os.path.join(path, ".git"))
+
+def test_unknown_ref_leaves_nothing_behind(remote, tmp_path):
+    url, _ = remote
+    path = str(tmp_path / "checkout")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        git_fetch_repository(url, path, "no-such-branch", SPARSE_PATHS)
+
+    assert sorted(os.listdir(str(tmp_path))) == ["remote.git", "work"]
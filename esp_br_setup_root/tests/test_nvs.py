@@ -0,0 +1,103 @@
+﻿import os
+import csv
+import json
+
+import pytest
+
+from esp_thread_setup.firmware import nvs
+from esp_thread_setup.network.dataset import dataset_to_tlvs, params_to_tlvs, parse_dataset, tlvs_to_params
+
+PARAMS = {
+    "network_name": "OpenThread-5f2a",
+    "ext_pan_id": "dead00beef00cafe",
+    "pan_id": "0x1a2b",
+    "network_key": "00112233445566778899aabbccddeeff",
+    "channel": "15",
+    "mesh_local_prefix": "fd11:2233:4455:6677::",
+    "pskc": "0123456789abcdef0123456789abcdef",
+    "active_timestamp": "3",
+}
+
+EXPANDED = """Active Timestamp: 3
+Channel: 15
+Channel Mask: 0x07fff800
+Ext PAN ID: dead00beef00cafe
+Mesh Local Prefix: fd11:2233:4455:6677::/64
+Network Key: 00112233445566778899aabbccddeeff
+Network Name: OpenThread-5f2a
+PAN ID: 0x1a2b
+PSKc: 0123456789abcdef0123456789abcdef
+Security Policy: 672 onrc 0
+Done"""
+
+def test_tlvs_round_trip():
+    assert tlvs_to_params(params_to_tlvs(PARAMS)) == PARAMS
+
+def test_expanded_dataset_encodes_like_its_parameters():
+    assert parse_dataset(EXPANDED)["network_name"] == "OpenThread-5f2a"
+    assert tlvs_to_params(dataset_to_tlvs(EXPANDED)) == PARAMS
+
+def test_hex_dataset_is_used_as_is():
+    tlvs = params_to_tlvs(PARAMS)
+    assert dataset_to_tlvs(tlvs.hex()) == tlvs
+    assert dataset_to_tlvs(" ".join([tlvs.hex()[:20], tlvs.hex()[20:]])) == tlvs
+
+def test_incomplete_dataset_is_rejected():
+    with pytest.raises(ValueError):
+        params_to_tlvs(dict(PARAMS, network_key=""))
+    with pytest.raises(ValueError):
+        tlvs_to_params(params_to_tlvs(PARAMS)[:-1])
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+def test_nvs_csv_holds_the_dataset_and_wifi_credentials(tmp_path):
+    csv_path = str(tmp_path / "device.csv")
+    nvs.write_nvs_csv(csv_path, EXPANDED, "home", "secret")
+
+    rows = read_csv(csv_path)
+    assert rows[0] == ["key", "type", "encoding", "value"]
+    assert rows[1] == ["openthread", "namespace", "", ""]
+    assert rows[2][:3] == ["OT0100", "data", "hex2bin"]
+    assert tlvs_to_params(bytes.fromhex(rows[2][3])) == PARAMS
+    assert rows[3:] == [["wifi_config", "namespace", "", ""], ["ssid", "data", "string", "home"],
+                        ["password", "data", "string", "secret"]]
+
+def test_nvs_csv_without_wifi(tmp_path):
+    csv_path = str(tmp_path / "device.csv")
+    nvs.write_nvs_csv(csv_path, params_to_tlvs(PARAMS).hex())
+    assert [row[0] for row in read_csv(csv_path)] == ["key", "openthread", "OT0100"]
+
+@pytest.fixture
+def build_dir(tmp_path):
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    (build_dir / "app.bin").write_bytes(b"app")
+    (build_dir / "flasher_args.json").write_text(json.dumps({"flash_files": {"0x10000": "app.bin"}}))
+    return str(build_dir)
+
+def test_current_firmware_gets_only_nvs(monkeypatch, tmp_path, build_dir):
+    flashed = []
+    monkeypatch.setattr(nvs, "flash_device",
+                        lambda port, build_dir=None, extra_images=(): flashed.append((port, build_dir)) or True)
+    flashed_file = str(tmp_path / "flashed.json")
+    flash = lambda port: nvs.flash_with_nvs(port, build_dir, "nvs.bin", 0x9000, flashed_file=flashed_file)
+
+    assert flash("/dev/ttyA") and flash("/dev/ttyA") and flash("/dev/ttyB")
+    assert flashed == [("/dev/ttyA", build_dir), ("/dev/ttyA", None), ("/dev/ttyB", build_dir)]
+
+    # A rebuilt image is flashed completely again
+    os.utime(os.path.join(build_dir, "app.bin"), (0, 0))
+    assert flash("/dev/ttyA")
+    assert flashed[-1] == ("/dev/ttyA", build_dir)
+
+def test_failed_flash_forgets_the_firmware(monkeypatch, tmp_path, build_dir):
+    flashed_file = str(tmp_path / "flashed.json")
+    monkeypatch.setattr(nvs, "flash_device", lambda *args, **kwargs: True)
+    nvs.flash_with_nvs("/dev/ttyA", build_dir, "nvs.bin", 0x9000, flashed_file=flashed_file)
+
+    monkeypatch.setattr(nvs, "flash_device", lambda *args, **kwargs: False)
+    os.utime(os.path.join(build_dir, "app.bin"), (0, 0))
+    assert not nvs.flash_with_nvs("/dev/ttyA", build_dir, "nvs.bin", 0x9000, flashed_file=flashed_file)
+    assert nvs.read_flashed_firmware(flashed_file) == {}
@@ -0,0 +1,72 @@
+﻿import os
+
+import pytest
+
+pytest.importorskip("serial")
+
+from esp_thread_setup.network import benchmark
+from esp_thread_setup.network.benchmark import run_link_benchmark
+from esp_thread_setup.network.cli_config import configure_cli_over_console
+from esp_thread_setup.network.dataset import create_dataset_over_console, parse_dataset
+from esp_thread_setup.simulator.otcli import start_simulator, stop_simulator
+from esp_thread_setup.utils.console import ConsoleError, open_console, run_cli_command
+from esp_thread_setup.utils.ports import check_port, simulated_ports
+
+# Attach, scans and pings at a hundredth of board time
+FAST_OPTIONS = {"latency": 0.0, "jitter": 0.0, "attach_time": 0.5, "time_scale": 0.01}
+
+@pytest.fixture
+def devices(tmp_path):
+    devices = start_simulator(["BR", "CLI"], FAST_OPTIONS, link_dir=str(tmp_path))
+    yield devices
+    stop_simulator(devices)
+
+@pytest.fixture
+def console(devices):
+    console = open_console(devices[0].link)
+    yield console
+    console.close()
+
+def test_simulated_ports_are_offered_until_stopped(tmp_path):
+    devices = start_simulator(["BR", "CLI"], FAST_OPTIONS, link_dir=str(tmp_path))
+    ports = simulated_ports(str(tmp_path))
+    assert [port.device for port in ports] == [device.link for device in devices]
+    assert all("simulator" in port.description for port in ports)
+    assert all(check_port(device.link) for device in devices)
+
+    stop_simulator(devices)
+
+    assert simulated_ports(str(tmp_path)) == []
+    assert not any(check_port(device.link) for device in devices)
+
+def test_commands_are_answered_like_a_board(console):
+    assert run_cli_command(console, "state") == ["disabled"]
+    with pytest.raises(ConsoleError, match="InvalidCommand"):
+        run_cli_command(console, "no-such-command")
+
+def test_network_creation_join_and_benchmark(devices):
+    border_router, cli = devices
+
+    dataset = create_dataset_over_console(border_router.link, "SimNet")
+    assert dataset is not None
+    assert parse_dataset(dataset)["network_name"] == "SimNet"
+
+    assert configure_cli_over_console(cli.link, dataset, join_timeout=10)
+    assert cli.network_id() == border_router.network_id()
+
+    result = run_link_benchmark(cli.link, border_router.link, payload_sizes=(16, 64), count=3, interval=0.1)
+    assert result is not None
+    assert [(run["payload_size"], run["received"]) for run in result["runs"]] == [(16, 3), (64, 3)]
+    assert [neighbor["rloc16"] for neighbor in result["neighbors"]] == [f"0x{border_router.rloc16:04x}"]
+    assert os.listdir(benchmark.BENCHMARK_DIR)
+
+def test_failing_commands_raise(devices, console):
+    devices[0].options["error_rate"] = 1.0
+    with pytest.raises(ConsoleError, match="Error 1: Failed"):
+        run_cli_command(console, "state")
+    assert create_dataset_over_console(devices[0].link, "SimNet", console=console) is None
+
+def test_dropped_responses_time_out(devices, console):
+    devices[0].options["drop_rate"] = 1.0
+    with pytest.raises(ConsoleError, match="timed out"):
+        run_cli_command(console, "state", timeout=0.5)
@@ -0,0 +1,30 @@
+﻿from esp_thread_setup.setup import timings
+
+def record(db_path, seconds, cache, count=1):
+    for _ in range(count):
+        timings.note_timing_context(target="esp32s3", cache=cache)
+        timings.record_timing("build", seconds, True, db_path=db_path)
+
+def test_cold_build_is_not_compared_with_incremental_builds(tmp_path):
+    db_path = str(tmp_path / "timings.db")
+    record(db_path, 20, "hit", timings.MIN_SAMPLES)
+
+    timings.note_timing_context(target="esp32s3", cache="miss")
+    assert not timings.record_timing("build", 300, True, db_path=db_path)
+    timings.note_timing_context(target="esp32s3", cache="hit")
+    assert timings.record_timing("build", 300, True, db_path=db_path)
+
+def test_prediction_follows_the_latest_context(tmp_path):
+    db_path = str(tmp_path / "timings.db")
+    record(db_path, 20, "hit", 5)
+    record(db_path, 300, "miss", timings.MIN_CONTEXT_SAMPLES)
+    assert timings.predict_durations(["build"], db_path) == {"build": 300}
+
+    record(db_path, 20, "hit")
+    assert timings.predict_durations(["build"], db_path) == {"build": 20}
+
+def test_prediction_falls_back_to_other_contexts(tmp_path):
+    db_path = str(tmp_path / "timings.db")
+    record(db_path, 20, "hit", 4)
+    record(db_path, 300, "miss")
+    assert timings.predict_durations(["build"], db_path) == {"build": 20}
@@ -7,6 +7,13 @@ from pathlib import Path
 import serial.tools.list_ports
 import glob
 
+# Share the cached ESP-IDF probe with the main tool when it is available
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "esp_br_setup_root"))
+try:
+    from esp_thread_setup.setup.environment import probe_environment
+except ImportError:
+    probe_environment = None
+
 class ESPThreadCommon:
     def __init__(self):
         self.home_dir = str(Path.home())
@@ -28,7 +35,12 @@ class ESPThreadCommon:
 
         # Check if required ESP-IDF tools are available
         try:
-            subprocess.run(["idf.py", "--version"], capture_output=True, check=True)
+            if probe_environment is not None:
+                environment = probe_environment()
+                if environment is None or not environment["idf_py"]:
+                    raise FileNotFoundError("idf.py")
+            else:
+                subprocess.run(["idf.py", "--version"], capture_output=True, check=True)
         except (subprocess.CalledProcessError, FileNotFoundError):
             print("ERROR: ESP-IDF tools not found. Have you sourced export.sh?")
             print("Run: . $IDF_PATH/export.sh")